@@ -0,0 +1,361 @@
+# Agmff.py
+#
+# ------------- File used to read and write .agmff files ----------
+# Contains the functions to read and write every .agmff version.
+# Raw maps are memory-mapped and used as the grid without any copy.
+# Contains the TiledParts class to stream the tiles of a v2 map.
+# The TiledParts class provides a LRU tile cache with a memory budget.
+#
+
+# Import all necessary library
+import collections
+import mmap
+import numpy as np
+import struct
+
+MAGIC = b"AGMF" # First bytes of every versioned .agmff file
+HEADER_FORMAT = "<4sHHIIHH" # Magic, version, layout, width, height, tile size, reserved
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+INDEX_DTYPE = np.dtype([("offset", "<u8"), ("size", "<u4")]) # Entry of the tile index table of a v2 file
+LAYOUT_CHUNKED = 0 # Layout of a v2 file with RLE compressed tiles
+LAYOUT_RAW = 1 # Layout of a v2 file with an uncompressed array of parts
+RAW_DATA_OFFSET = 4096 # Offset of the parts of a raw file, aligned on a memory page
+RLE_DTYPE = np.dtype([("number", "<u4"), ("element", "i1")]) # RLE record (same as the v1 records)
+V1_MAX_SIZE = 65535 # Maximum width and height of a v1 map (stored as unsigned shorts)
+
+def decode_rle(content, size: int) -> np.ndarray:
+    """Decode a RLE stream of 5 bytes records (unsigned number of parts, signed id of the part)
+
+    Args:
+        content: bytes of the RLE stream
+        size (int): number of parts to decode
+
+    Returns:
+        np.ndarray: 1D array of the decoded parts
+    """
+    records = np.frombuffer(content, RLE_DTYPE, len(content) // RLE_DTYPE.itemsize)
+    numbers = np.cumsum(records["number"], dtype = np.uint64)
+    records = records[:np.searchsorted(numbers, size) + 1] # Only keep the needed records
+    return np.repeat(records["element"], records["number"])[:size]
+
+def encode_rle(parts: np.ndarray) -> bytes:
+    """Encode parts into a RLE stream of 5 bytes records
+
+    Args:
+        parts (np.ndarray): parts to encode (flattened in row order)
+
+    Returns:
+        bytes: RLE stream
+    """
+    parts = np.ascontiguousarray(parts, np.int8).ravel()
+    if parts.size == 0: return b""
+    starts = np.flatnonzero(np.concatenate(([True], parts[1:] != parts[:-1]))) # Find where each run starts
+    records = np.empty(starts.size, RLE_DTYPE)
+    records["number"] = np.diff(np.append(starts, parts.size))
+    records["element"] = parts[starts]
+    return records.tobytes()
+
+def read_header(content) -> tuple:
+    """Read the header of a .agmff file
+
+    Args:
+        content: first bytes of the file
+
+    Returns:
+        tuple: version, layout, width, height and tile size of the map (version 1 has no layout nor tile size)
+    """
+    if len(content) >= HEADER_SIZE and content[:4] == MAGIC:
+        magic, version, layout, width, height, tile_size, reserved = struct.unpack(HEADER_FORMAT, content[:HEADER_SIZE])
+        return version, layout, width, height, tile_size
+    width, height = struct.unpack("HH", content[:4]) # Version 1 only stores the size
+    return 1, LAYOUT_CHUNKED, width, height, 0
+
+def load(path: str, memory_budget: int = 64 * 1024 * 1024) -> tuple:
+    """Load a .agmff file of any version
+
+    Args:
+        path (str): path of the map to load
+        memory_budget (int, optional): maximum size in bytes of the decoded tiles kept for a v2 map. Defaults to 64 MiB.
+
+    Returns:
+        tuple: width of the map, height of the map and the parts (2D array, or TiledParts for a v2 map)
+    """
+    file = open(path, "rb") # Open the map file
+    version, layout, width, height, tile_size = read_header(file.read(HEADER_SIZE))
+    if version == 1: # Version 1 is one global RLE stream, decoded up front
+        file.seek(0)
+        content = file.read()
+        file.close()
+        return width, height, decode_rle(content[4:], width * height).reshape(height, width)
+
+    if version == 2 and layout == LAYOUT_CHUNKED:
+        return width, height, TiledParts(file, width, height, tile_size, memory_budget)
+    if version == 2 and layout == LAYOUT_RAW: # The parts are used right from the OS page cache
+        content = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_COPY) # Pages stay shared between processes until written
+        file.close()
+        return width, height, np.frombuffer(content, np.uint8, width * height, RAW_DATA_OFFSET).view(np.int8).reshape(height, width)
+    file.close()
+    raise ValueError("Unsupported .agmff version " + str(version) + " (layout " + str(layout) + ") in " + path)
+
+def write_v1(path: str, parts) -> None:
+    """Write a map into a v1 .agmff file (width and height limited to 65535 parts)
+
+    Args:
+        path (str): path of the file
+        parts: 2D array of every parts
+    """
+    height, width = parts.shape
+    if width > V1_MAX_SIZE or height > V1_MAX_SIZE: # Checked before the file is opened, so no corrupted map is written
+        raise ValueError("Map of " + str(width) + "x" + str(height) + " parts too big for a v1 .agmff file (" + str(V1_MAX_SIZE) + " parts maximum by side), use the chunked format")
+    parts = np.asarray(parts[:, :] if isinstance(parts, TiledParts) else parts, np.int8)
+    file = open(path, "wb")
+    file.write(struct.pack("HH", parts.shape[1], parts.shape[0]))
+    file.write(encode_rle(parts))
+    file.close()
+
+def write_v2(path: str, parts, tile_size: int = 256) -> None:
+    """Write a map into a chunked v2 .agmff file, one RLE stream by tile
+
+    Args:
+        path (str): path of the file
+        parts: 2D array (or TiledParts) of every parts, only sliced tile by tile
+        tile_size (int, optional): width and height of a tile. Defaults to 256.
+    """
+    height, width = parts.shape
+    if not 0 < tile_size <= V1_MAX_SIZE: raise ValueError("Tile size " + str(tile_size) + " not between 1 and " + str(V1_MAX_SIZE))
+    tiles_x = -(-width // tile_size)
+    tiles_y = -(-height // tile_size)
+    index = np.zeros(tiles_x * tiles_y, INDEX_DTYPE)
+
+    file = open(path, "wb")
+    file.write(struct.pack(HEADER_FORMAT, MAGIC, 2, LAYOUT_CHUNKED, width, height, tile_size, 0))
+    file.write(index.tobytes()) # Reserve the index table
+    offset = HEADER_SIZE + index.nbytes
+    for ty in range(tiles_y):
+        for tx in range(tiles_x): # Compress each tile on its own
+            tile = parts[ty * tile_size:(ty + 1) * tile_size, tx * tile_size:(tx + 1) * tile_size]
+            content = encode_rle(tile)
+            index[ty * tiles_x + tx] = (offset, len(content))
+            file.write(content)
+            offset += len(content)
+    file.seek(HEADER_SIZE)
+    file.write(index.tobytes()) # Write the real index table
+    file.close()
+
+def write_raw(path: str, parts) -> None:
+    """Write a map into a raw v2 .agmff file, with an uncompressed uint8 array of parts
+
+    Args:
+        path (str): path of the file
+        parts: 2D array (or TiledParts) of every parts, written band by band
+    """
+    height, width = parts.shape
+    file = open(path, "wb")
+    file.write(struct.pack(HEADER_FORMAT, MAGIC, 2, LAYOUT_RAW, width, height, 0, 0))
+    file.write(bytes(RAW_DATA_OFFSET - HEADER_SIZE)) # Align the parts on a memory page
+    band_height = max(1, (16 * 1024 * 1024) // max(width, 1))
+    for y in range(0, height, band_height): # Write the parts without loading the whole map
+        file.write(np.ascontiguousarray(parts[y:y + band_height, :], np.int8).view(np.uint8).tobytes())
+    file.close()
+
+class TiledParts:
+    """Class used to stream the parts of a v2 map, tile by tile
+    """
+
+    def __init__(self, file, width: int, height: int, tile_size: int, memory_budget: int) -> None:
+        """Construct a tiled parts handler
+
+        Args:
+            file: opened v2 .agmff file
+            width (int): width of the map
+            height (int): height of the map
+            tile_size (int): width and height of a tile
+            memory_budget (int): maximum size in bytes of the decoded tiles kept in the cache
+        """
+        self.file = file
+        self.content = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ) # The OS pages the file in only when read
+        self.height = height
+        self.last_tile = None # Last tile used, to skip the cache for coherent accesses
+        self.last_tile_pos = (-1, -1)
+        self.memory_budget = memory_budget
+        self.memory_used = 0
+        self.modified_tiles = {} # Tiles changed in game, kept out of the cache so they are never evicted
+        self.tile_size = tile_size
+        self.tiles = collections.OrderedDict() # Decoded tiles, from the least to the most recently used
+        self.tiles_x = -(-width // tile_size)
+        self.tiles_y = -(-height // tile_size)
+        self.width = width
+
+        self.index = np.frombuffer(self.content, INDEX_DTYPE, self.tiles_x * self.tiles_y, HEADER_SIZE)
+
+    def __getitem__(self, key):
+        """Return a part (with a (y, x) key), a row, or a 2D array of parts (with slices)
+        """
+        if isinstance(key, tuple):
+            y, x = key
+            if isinstance(y, np.ndarray) or isinstance(x, np.ndarray):
+                return self.take(y, x)
+            if isinstance(y, slice) and isinstance(x, slice):
+                return self.get_region(y, x)
+            if isinstance(y, slice): # Column of parts
+                return self.get_region(y, slice(x, x + 1 if x != -1 else None))[:, 0]
+            if isinstance(x, slice): # Row of parts
+                return self.get_region(slice(y, y + 1 if y != -1 else None), x)[0]
+            if y < 0: y += self.height
+            if x < 0: x += self.width
+            if y < 0 or y >= self.height or x < 0 or x >= self.width: raise IndexError("part out of the map")
+            tile = self.get_tile(y // self.tile_size, x // self.tile_size)
+            return tile[y % self.tile_size, x % self.tile_size]
+        if isinstance(key, slice):
+            return self.get_region(key, slice(None))
+        return self.get_region(slice(key, key + 1 if key != -1 else None), slice(None))[0]
+
+    def __setitem__(self, key, value) -> None:
+        """Change a part (with a (y, x) key), or a 2D array of parts (with slices)
+        """
+        y, x = key
+        if not isinstance(y, slice): y = slice(y, y + 1 if y != -1 else None)
+        if not isinstance(x, slice): x = slice(x, x + 1 if x != -1 else None)
+        y_start, y_stop, y_step = y.indices(self.height)
+        x_start, x_stop, x_step = x.indices(self.width)
+        if y_step != 1 or x_step != 1: raise ValueError("Steps are not supported to change parts")
+        value = np.broadcast_to(np.asarray(value, np.int8), (max(y_stop - y_start, 0), max(x_stop - x_start, 0)))
+
+        for ty in range(y_start // self.tile_size, -(-y_stop // self.tile_size)):
+            for tx in range(x_start // self.tile_size, -(-x_stop // self.tile_size)): # Change each tile crossed
+                tile = self.get_tile(ty, tx)
+                if (ty, tx) not in self.modified_tiles: # Pin the tile
+                    self.modified_tiles[(ty, tx)] = tile
+                    if (ty, tx) in self.tiles:
+                        self.memory_used -= self.tiles.pop((ty, tx)).nbytes
+                tile_y = ty * self.tile_size
+                tile_x = tx * self.tile_size
+                y0, y1 = max(y_start, tile_y), min(y_stop, tile_y + tile.shape[0])
+                x0, x1 = max(x_start, tile_x), min(x_stop, tile_x + tile.shape[1])
+                tile[y0 - tile_y:y1 - tile_y, x0 - tile_x:x1 - tile_x] = value[y0 - y_start:y1 - y_start, x0 - x_start:x1 - x_start]
+
+    def __len__(self) -> int:
+        """Return the height of the map
+        """
+        return self.height
+
+    def close(self) -> None:
+        """Close the file of the map
+        """
+        self.index = None
+        self.content.close()
+        self.file.close()
+
+    def take(self, y: np.ndarray, x: np.ndarray) -> np.ndarray:
+        """Return the parts at many coordinates, reading each tile touched once
+
+        Args:
+            y (np.ndarray): y coordinates of the parts
+            x (np.ndarray): x coordinates of the parts
+
+        Returns:
+            np.ndarray: parts at these coordinates
+        """
+        y, x = np.broadcast_arrays(np.asarray(y, np.int64), np.asarray(x, np.int64))
+        if np.any((y < 0) | (y >= self.height) | (x < 0) | (x >= self.width)): raise IndexError("part out of the map")
+        result = np.empty(y.shape, np.int8)
+        tiles = (y // self.tile_size) * self.tiles_x + x // self.tile_size
+        for tile_id in np.unique(tiles): # Gather the parts tile by tile
+            inside = tiles == tile_id
+            tile = self.get_tile(int(tile_id) // self.tiles_x, int(tile_id) % self.tiles_x)
+            result[inside] = tile[y[inside] % self.tile_size, x[inside] % self.tile_size]
+        return result
+
+    def get_region(self, y: slice, x: slice) -> np.ndarray:
+        """Return a 2D array of parts, assembled from every tile crossed (with steps, only the tiles of the parts taken are read)
+
+        Args:
+            y (slice): rows of the region
+            x (slice): columns of the region
+
+        Returns:
+            np.ndarray: 2D array of the parts
+        """
+        y_start, y_stop, y_step = y.indices(self.height)
+        x_start, x_stop, x_step = x.indices(self.width)
+        if y_step < 0 or x_step < 0: return self.get_region(slice(None), slice(None))[y, x] # Reversed regions are rare, read the whole map
+        rows, columns = range(y_start, y_stop, y_step), range(x_start, x_stop, x_step)
+        region = np.empty((len(rows), len(columns)), np.int8)
+        for ty in range(y_start // self.tile_size, -(-y_stop // self.tile_size)):
+            tile_y = ty * self.tile_size
+            i0, i1 = max(-(-(tile_y - y_start) // y_step), 0), min(-(-(tile_y + self.tile_size - y_start) // y_step), len(rows)) # Rows taken in the tile
+            if i1 <= i0: continue
+            for tx in range(x_start // self.tile_size, -(-x_stop // self.tile_size)): # Copy the parts taken in each tile crossed
+                tile_x = tx * self.tile_size
+                j0, j1 = max(-(-(tile_x - x_start) // x_step), 0), min(-(-(tile_x + self.tile_size - x_start) // x_step), len(columns))
+                if j1 <= j0: continue
+                tile = self.get_tile(ty, tx)
+                region[i0:i1, j0:j1] = tile[rows[i0] - tile_y:rows[i1 - 1] - tile_y + 1:y_step, columns[j0] - tile_x:columns[j1 - 1] - tile_x + 1:x_step]
+        return region
+
+    def get_tile(self, ty: int, tx: int) -> np.ndarray:
+        """Return a decoded tile, loading it and evicting the least recently used tiles if needed
+
+        Args:
+            ty (int): y pos of the tile
+            tx (int): x pos of the tile
+
+        Returns:
+            np.ndarray: 2D array of the parts of the tile
+        """
+        if self.last_tile_pos == (ty, tx): return self.last_tile
+
+        tile = self.modified_tiles.get((ty, tx))
+        if tile is None: tile = self.tiles.get((ty, tx))
+        if tile is None: # Decode the tile
+            entry = self.index[ty * self.tiles_x + tx]
+            offset, size = int(entry["offset"]), int(entry["size"])
+            tile_height = min(self.tile_size, self.height - ty * self.tile_size)
+            tile_width = min(self.tile_size, self.width - tx * self.tile_size)
+            tile = decode_rle(self.content[offset:offset + size], tile_width * tile_height).reshape(tile_height, tile_width)
+
+            self.tiles[(ty, tx)] = tile
+            self.memory_used += tile.nbytes
+            while self.memory_used > self.memory_budget and len(self.tiles) > 1: # Respect the memory budget
+                evicted_pos, evicted = self.tiles.popitem(last = False)
+                self.memory_used -= evicted.nbytes
+        elif (ty, tx) in self.tiles:
+            self.tiles.move_to_end((ty, tx))
+
+        self.last_tile = tile
+        self.last_tile_pos = (ty, tx)
+        return tile
+
+    @property
+    def shape(self) -> tuple:
+        """Return the shape of the map, like a 2D array
+        """
+        return (self.height, self.width)
+
+def convert(source: str, destination: str, map_format: str = "chunked", tile_size: int = 256) -> None:
+    """Convert a .agmff file into another format
+
+    Args:
+        source (str): path of the map to convert
+        destination (str): path of the converted map
+        map_format (str, optional): format of the converted map ("v1", "chunked" or "raw"). Defaults to "chunked".
+        tile_size (int, optional): width and height of a tile for a chunked map. Defaults to 256.
+    """
+    width, height, parts = load(source)
+    if map_format == "v1": write_v1(destination, parts)
+    elif map_format == "chunked": write_v2(destination, parts, tile_size)
+    elif map_format == "raw": write_raw(destination, parts)
+    else: raise ValueError("Unsupported .agmff format " + map_format)
+    if isinstance(parts, TiledParts): parts.close()
+
+# If the user directly executes the file
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description = "Convert a .agmff map into another format")
+    parser.add_argument("source", help = "path of the map to convert")
+    parser.add_argument("destination", help = "path of the converted map")
+    parser.add_argument("--format", choices = ["v1", "chunked", "raw"], default = "chunked", help = "format of the converted map")
+    parser.add_argument("--tile-size", type = int, default = 256, help = "width and height of a tile for a chunked map")
+    arguments = parser.parse_args()
+    convert(arguments.source, arguments.destination, arguments.format, arguments.tile_size)
@@ -0,0 +1,235 @@
+# Bake.py
+#
+# ------------- File used to bake the assets of the game ------------
+# Contains the functions to bake the assets before the game runs.
+# The textures are baked into their mip levels, already decoded with
+# each column contiguous, and the maps into raw .agmff files, memory-
+# mapped by the game. A manifest keeps the content hash of the source
+# of each baked asset, so only the changed assets are baked again.
+#
+
+# Import all necessary library
+import agmff
+import base64
+import glob
+import hashlib
+import io
+import json
+import numpy as np
+import os
+import pygame
+import texture
+
+BAKED_DIRECTORY = "baked" # Directory of the baked assets
+MANIFEST_NAME = "manifest.json" # Name of the manifest in the baked directory
+MANIFEST_VERSION = 1 # Version of the manifest and of the baked formats
+
+def bake(textures: list = None, maps: list = None, directory: str = BAKED_DIRECTORY, force: bool = False) -> dict:
+    """Bake every changed asset, and write the manifest
+
+    Args:
+        textures (list, optional): path of each texture to bake. Defaults to every texture of ressources/textures.
+        maps (list, optional): path of each map to bake. Defaults to ["map.agmff"].
+        directory (str, optional): directory of the baked assets. Defaults to BAKED_DIRECTORY.
+        force (bool, optional): if every asset is baked again, changed or not. Defaults to False.
+
+    Returns:
+        dict: list of the path of the assets "baked", "unchanged" and "removed" from the manifest (their source does not exist anymore)
+    """
+    if textures is None: textures = find_textures()
+    if maps is None: maps = ["map.agmff"]
+
+    manifest = read_manifest(directory)
+    old_assets = manifest["assets"]
+    manifest["assets"] = {}
+    result = {"baked": [], "unchanged": [], "removed": []}
+    for kind, sources in (("texture", textures), ("map", maps)):
+        for path in sources:
+            key = os.path.normpath(path)
+            source = get_texture_source(path) if kind == "texture" else path
+            if source is None: continue # Nothing to bake
+
+            content_hash = hash_file(source)
+            entry = old_assets.get(key)
+            baked_path = os.path.join(directory, kind + "s", os.path.splitext(os.path.basename(path))[0] + (".npz" if kind == "texture" else ".agmff"))
+            if not force and entry is not None and entry["hash"] == content_hash and entry["kind"] == kind and os.path.exists(os.path.join(directory, entry["baked"])):
+                entry.update(stat_entry(source)) # The source may be touched without being changed
+                manifest["assets"][key] = entry
+                result["unchanged"].append(key)
+                continue
+
+            os.makedirs(os.path.dirname(baked_path), exist_ok = True)
+            if kind == "texture": bake_texture(source, baked_path)
+            else: bake_map(source, baked_path)
+            manifest["assets"][key] = {"kind": kind, "source": os.path.normpath(source), "hash": content_hash, "baked": os.path.relpath(baked_path, directory), **stat_entry(source)}
+            result["baked"].append(key)
+
+    for key, entry in old_assets.items(): # Keep the assets not asked if their source still exists, remove the others
+        if key in manifest["assets"]: continue
+        baked_path = os.path.join(directory, entry["baked"])
+        if os.path.exists(entry["source"]) and os.path.exists(baked_path):
+            manifest["assets"][key] = entry
+            continue
+        if os.path.exists(baked_path) and not any(e["baked"] == entry["baked"] for e in manifest["assets"].values()): os.remove(baked_path)
+        result["removed"].append(key)
+
+    write_manifest(directory, manifest)
+    return result
+
+def bake_map(source: str, destination: str) -> None:
+    """Bake a map into a raw .agmff file, memory-mapped by the game without decoding
+
+    Args:
+        source (str): path of the map (any .agmff version)
+        destination (str): path of the baked map
+    """
+    agmff.convert(source, destination + ".tmp", "raw")
+    os.replace(destination + ".tmp", destination) # A game never reads a half written map
+
+def bake_texture(source: str, destination: str) -> None:
+    """Bake a texture into its mip levels, each column contiguous
+
+    Args:
+        source (str): path of the texture (an image, or a .pixil file)
+        destination (str): path of the baked texture (.npz)
+    """
+    image = decode_image(source)
+    arrays = texture.levels_to_arrays(texture.mip_levels(image))
+    file = open(destination + ".tmp", "wb")
+    np.savez(file, alpha = np.array(bool(image.get_flags() & pygame.SRCALPHA)), levels = np.array(len(arrays)), **arrays) # Not compressed, so loading is only a copy
+    file.close()
+    os.replace(destination + ".tmp", destination)
+
+def decode_image(path: str) -> pygame.Surface:
+    """Decode an image, or the preview of the first frame of a .pixil file
+
+    Args:
+        path (str): path of the image
+
+    Returns:
+        pygame.Surface: decoded image
+    """
+    if os.path.splitext(path)[1] != ".pixil": return pygame.image.load(path)
+
+    file = open(path, "r")
+    content = json.load(file)
+    file.close()
+    preview = content["frames"][0]["preview"] # Data URL of the PNG of the frame, with every layer
+    return pygame.image.load(io.BytesIO(base64.b64decode(preview[preview.index("base64,") + 7:])), "frame.png")
+
+def find_baked(manifest: dict, path: str, directory: str = BAKED_DIRECTORY) -> str:
+    """Return the path of the baked asset of a source, if it is up to date
+
+    Args:
+        manifest (dict): manifest of the baked assets
+        path (str): path of the source asset, as asked by the game
+        directory (str, optional): directory of the baked assets. Defaults to BAKED_DIRECTORY.
+
+    Returns:
+        str: path of the baked asset, or None if the asset is not baked or its source changed since
+    """
+    entry = manifest["assets"].get(os.path.normpath(path))
+    if entry is None: return None
+    baked_path = os.path.join(directory, entry["baked"])
+    if not os.path.exists(baked_path): return None
+    if os.path.exists(entry["source"]) and stat_entry(entry["source"]) != {"size": entry["size"], "mtime": entry["mtime"]}: return None # Changed since the bake (checked without hashing)
+    return baked_path
+
+def find_textures(directory: str = "ressources/textures") -> list:
+    """Return the path of every texture of a directory, as asked by the game (a .pixil file alone is asked as a .png)
+
+    Args:
+        directory (str, optional): directory of the textures. Defaults to "ressources/textures".
+
+    Returns:
+        list: path of every texture
+    """
+    paths = glob.glob(os.path.join(directory, "*.png")) + [os.path.splitext(path)[0] + ".png" for path in glob.glob(os.path.join(directory, "*.pixil"))]
+    return sorted(set(paths))
+
+def get_texture_source(path: str) -> str:
+    """Return the file to bake for a texture, the image or else its .pixil file
+
+    Args:
+        path (str): path of the texture, as asked by the game
+
+    Returns:
+        str: path of the file to bake, or None if there is none
+    """
+    if os.path.exists(path): return path
+    pixil_path = os.path.splitext(path)[0] + ".pixil"
+    if os.path.exists(pixil_path): return pixil_path
+    return None
+
+def hash_file(path: str) -> str:
+    """Return the content hash of a file
+
+    Args:
+        path (str): path of the file
+
+    Returns:
+        str: SHA-256 of the content of the file, in hexadecimal
+    """
+    content_hash = hashlib.sha256()
+    file = open(path, "rb")
+    for block in iter(lambda: file.read(1024 * 1024), b""): content_hash.update(block)
+    file.close()
+    return content_hash.hexdigest()
+
+def read_manifest(directory: str = BAKED_DIRECTORY) -> dict:
+    """Read the manifest of the baked assets
+
+    Args:
+        directory (str, optional): directory of the baked assets. Defaults to BAKED_DIRECTORY.
+
+    Returns:
+        dict: manifest, empty if there is none or if it has another version
+    """
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path): return {"version": MANIFEST_VERSION, "assets": {}}
+    file = open(path, "r")
+    manifest = json.load(file)
+    file.close()
+    if manifest.get("version") != MANIFEST_VERSION: return {"version": MANIFEST_VERSION, "assets": {}}
+    return manifest
+
+def stat_entry(path: str) -> dict:
+    """Return the size and the modification time of a file, to notice a change without hashing it
+
+    Args:
+        path (str): path of the file
+
+    Returns:
+        dict: size and modification time (in ns) of the file
+    """
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+def write_manifest(directory: str, manifest: dict) -> None:
+    """Write the manifest of the baked assets
+
+    Args:
+        directory (str): directory of the baked assets
+        manifest (dict): manifest to write
+    """
+    os.makedirs(directory, exist_ok = True)
+    path = os.path.join(directory, MANIFEST_NAME)
+    file = open(path + ".tmp", "w")
+    json.dump(manifest, file, indent = 1, sort_keys = True)
+    file.close()
+    os.replace(path + ".tmp", path)
+
+# If the user directly executes the file
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description = "Bake the textures and the maps of the game, only the ones changed since the last bake")
+    parser.add_argument("--textures", nargs = "*", default = None, help = "path of each texture to bake (defaults to every texture of ressources/textures)")
+    parser.add_argument("--maps", nargs = "*", default = None, help = "path of each map to bake (defaults to map.agmff)")
+    parser.add_argument("--output", default = BAKED_DIRECTORY, help = "directory of the baked assets")
+    parser.add_argument("--force", action = "store_true", help = "bake every asset again, changed or not")
+    arguments = parser.parse_args()
+
+    result = bake(arguments.textures, arguments.maps, arguments.output, arguments.force)
+    for status in ("baked", "unchanged", "removed"):
+        for path in result[status]: print(status + ": " + path)
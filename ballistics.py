@@ -0,0 +1,209 @@
+# Ballistics.py
+#
+# ------------- File used to simulate the fired shells ------------
+# Contains the Ballistics class to simulate the shells.
+# The Ballistics class stores every shell as arrays, and moves and
+# collides them with the map and the vehicles in vectorized batches.
+#
+
+# Import all necessary library
+import math
+import mmath
+import numpy as np
+
+FREE = 0 # State of a slot without shell
+FLYING = 1 # State of a shell still flying
+HIT_GROUND = 2 # State of a shell which hit the floor
+HIT_PART = 3 # State of a shell which hit a part of the map
+HIT_VEHICLE = 4 # State of a shell which hit a vehicle
+OUT_OF_MAP = 5 # State of a shell which left the map or flew too long
+
+IMPACT_DTYPE = np.dtype([("shell", "i4"), ("state", "i1"), ("x", "f4"), ("y", "f4"), ("z", "f4"), ("direction_x", "f4"), ("direction_y", "f4"), ("direction_z", "f4"), ("part", "i1"), ("vehicle", "i4")])
+
+class Ballistics:
+    """Class used to simulate every fired shell
+    """
+
+    def __init__(self, game, capacity: int = 1024) -> None:
+        """Construct a ballistics simulation
+
+        Args:
+            game: main game object
+            capacity (int, optional): number of shells stored before the arrays grow. Defaults to 1024.
+        """
+        self.game = game
+
+        self.gravity = 9.81 # Gravity applied to the shells (in meter by second squared)
+        self.impacts = np.zeros(0, IMPACT_DTYPE) # Impacts of the last update
+        self.max_flight_time = 5 # Time before a flying shell is removed (in seconds)
+        self.max_samples = 1 << 20 # Maximum number of points tested at once
+        self.muzzle_height = 2.5 # Height of the cannon of the player tank (in meter)
+        self.muzzle_velocity = 1000 # Speed of a nerfed OFL 120 F1 (in meter by second)
+        self.samples_by_part = 2 # Number of points tested by part crossed
+
+        self.state = np.zeros(capacity, np.int8) # State of each shell
+        self.time = np.zeros(capacity, np.float32) # Flight time of each shell
+        self.x = np.zeros(capacity, np.float32) # Pos of each shell
+        self.y = np.zeros(capacity, np.float32)
+        self.z = np.zeros(capacity, np.float32)
+        self.velocity_x = np.zeros(capacity, np.float32) # Velocity of each shell
+        self.velocity_y = np.zeros(capacity, np.float32)
+        self.velocity_z = np.zeros(capacity, np.float32)
+
+    def collide(self, shells: np.ndarray, delta_time: float) -> None:
+        """Move shells for one frame, and stop them at their first collision
+
+        Args:
+            shells (np.ndarray): index of the shells to move
+            delta_time (float): time in seconds between this frame and the last frame
+        """
+        heights = self.get_parts_heights()
+
+        start = np.stack((self.x[shells], self.y[shells], self.z[shells]), 1)
+        movement = np.stack((self.velocity_x[shells], self.velocity_y[shells], self.velocity_z[shells] - self.gravity * delta_time / 2), 1) * delta_time
+        length = float(np.max(np.abs(movement[:, :2]).sum(1), initial = 0))
+        samples = max(1, math.ceil(length * self.samples_by_part))
+        t = np.arange(1, samples + 1, dtype = np.float32) / samples # Position of each tested point on the movement
+        points = start[:, None, :] + movement[:, None, :] * t[None, :, None]
+
+        part_x = np.floor(points[:, :, 0]).astype(np.int64) # Test the parts with the ray-cast convention (first index is x)
+        part_y = np.floor(points[:, :, 1]).astype(np.int64)
+        in_map = self.game.get_map().is_inside(part_x, part_y)
+        touched = np.zeros(part_x.shape, np.int8)
+        touched[in_map] = self.game.get_map().get_parts_at(part_y[in_map], part_x[in_map])
+
+        collisions = np.zeros(part_x.shape, np.int8) # Kind of collision of each point, the first one is kept
+        collisions[~in_map] = OUT_OF_MAP
+        collisions[in_map & (points[:, :, 2] <= 0)] = HIT_GROUND
+        collisions[in_map & (points[:, :, 2] < heights[touched.view(np.uint8)])] = HIT_PART
+
+        touched_vehicles = self.game.get_entities().query_points(points[:, :, 0], points[:, :, 1], points[:, :, 2]) # Test the vehicles
+        touched_vehicles[collisions != 0] = -1
+        collisions[touched_vehicles != -1] = HIT_VEHICLE
+
+        collided = collisions != 0
+        first = np.argmax(collided, 1) # First collision of each shell
+        stopped = collided[np.arange(len(shells)), first]
+        end = np.where(stopped[:, None], points[np.arange(len(shells)), first], start + movement)
+
+        self.x[shells], self.y[shells], self.z[shells] = end[:, 0], end[:, 1], end[:, 2]
+        self.velocity_z[shells] -= self.gravity * delta_time
+        self.time[shells] += delta_time
+
+        stopped_shells = shells[stopped]
+        impacts = np.zeros(len(stopped_shells), IMPACT_DTYPE)
+        impacts["shell"] = stopped_shells
+        impacts["state"] = collisions[np.arange(len(shells)), first][stopped]
+        impacts["x"], impacts["y"], impacts["z"] = end[stopped, 0], end[stopped, 1], end[stopped, 2]
+        direction = movement[stopped] / np.maximum(np.linalg.norm(movement[stopped], axis = 1), 1e-9)[:, None]
+        impacts["direction_x"], impacts["direction_y"], impacts["direction_z"] = direction[:, 0], direction[:, 1], direction[:, 2]
+        impacts["part"] = touched[np.arange(len(shells)), first][stopped]
+        impacts["vehicle"] = touched_vehicles[np.arange(len(shells)), first][stopped]
+        self.state[stopped_shells] = impacts["state"]
+        self.impacts = np.concatenate((self.impacts, impacts))
+
+    def fire(self, angle: float, elevation: float = 0) -> int:
+        """Fire a shell from the player tank cannon
+
+        Args:
+            angle (float): horizontal angle of the cannon (like the trigonometrical circle)
+            elevation (float, optional): vertical angle of the cannon. Defaults to 0.
+
+        Returns:
+            int: index of the fired shell
+        """
+        map_size = self.game.get_map().get_ray_size()
+        base_pos = (math.ceil(map_size[0] / 2), math.ceil(map_size[1] / 2)) # Same pos as the ray-cast
+        return self.fire_batch(np.array([base_pos[0]]), np.array([base_pos[1]]), np.array([self.muzzle_height]), np.array([angle]), np.array([elevation]))[0]
+
+    def fire_batch(self, x: np.ndarray, y: np.ndarray, z: np.ndarray, angle: np.ndarray, elevation: np.ndarray, velocity = None) -> np.ndarray:
+        """Fire many shells at once
+
+        Args:
+            x (np.ndarray): x pos of each shell
+            y (np.ndarray): y pos of each shell
+            z (np.ndarray): height of each shell
+            angle (np.ndarray): horizontal angle of each shell (like the trigonometrical circle)
+            elevation (np.ndarray): vertical angle of each shell
+            velocity (optional): speed of each shell. Defaults to the muzzle velocity.
+
+        Returns:
+            np.ndarray: index of each fired shell
+        """
+        if velocity is None: velocity = self.muzzle_velocity
+        x, y, z, angle, elevation, velocity = np.broadcast_arrays(x, y, z, angle, elevation, velocity)
+
+        free = np.flatnonzero(self.state == FREE)
+        if len(free) < len(x): # Grow the arrays
+            self.grow(len(self.state) + len(x) - len(free))
+            free = np.flatnonzero(self.state == FREE)
+        shells = free[:len(x)]
+
+        direction_x, direction_y = mmath.direction_vectors(angle)
+        horizontal, vertical = mmath.direction_vectors(elevation)
+        self.state[shells] = FLYING
+        self.time[shells] = 0
+        self.x[shells], self.y[shells], self.z[shells] = x, y, z
+        self.velocity_x[shells] = velocity * horizontal * direction_x # Same direction as the ray-cast
+        self.velocity_y[shells] = -velocity * horizontal * direction_y
+        self.velocity_z[shells] = velocity * vertical
+        return shells
+
+    def get_flying(self) -> np.ndarray:
+        """Return the index of every flying shell
+
+        Returns:
+            np.ndarray: index of every flying shell
+        """
+        return np.flatnonzero(self.state == FLYING)
+
+    def get_impacts(self) -> np.ndarray:
+        """Return the impacts of the last update
+
+        Returns:
+            np.ndarray: structured array of the impacts (shell, state, x, y, z, direction_x, direction_y, direction_z, part, vehicle)
+        """
+        return self.impacts
+
+    def get_parts_heights(self) -> np.ndarray:
+        """Return the height of each part stopping a shell, indexed by the byte of the part
+
+        Returns:
+            np.ndarray: height of each part
+        """
+        registry = self.game.get_map().get_element_registry()
+        return np.where(registry.get_solid(), registry.get_heights(), 0).astype(np.float32) # Same transparent parts as the ray-cast
+
+    def grow(self, capacity: int) -> None:
+        """Grow the arrays of the shells
+
+        Args:
+            capacity (int): minimum number of shells stored
+        """
+        capacity = max(capacity, len(self.state) * 2)
+        for name in ("state", "time", "x", "y", "z", "velocity_x", "velocity_y", "velocity_z"):
+            array = getattr(self, name)
+            new_array = np.zeros(capacity, array.dtype)
+            new_array[:len(array)] = array
+            setattr(self, name, new_array)
+
+    def update(self, delta_time: float) -> None:
+        """Update every shell for one frame
+
+        Args:
+            delta_time (float): time in seconds between this frame and the last frame
+        """
+        self.state[self.state > FLYING] = FREE # Free the shells stopped at the last update
+        self.impacts = np.zeros(0, IMPACT_DTYPE)
+
+        flying = self.get_flying()
+        too_old = flying[self.time[flying] > self.max_flight_time]
+        self.state[too_old] = OUT_OF_MAP
+        flying = flying[self.time[flying] <= self.max_flight_time]
+        if len(flying) == 0 or delta_time <= 0: return
+
+        speed = np.abs(self.velocity_x[flying]) + np.abs(self.velocity_y[flying])
+        samples = max(1, math.ceil(float(speed.max()) * delta_time * self.samples_by_part))
+        batch_size = max(1, self.max_samples // samples)
+        for i in range(0, len(flying), batch_size): # Move the shells by batches
+            self.collide(flying[i:i + batch_size], delta_time)
@@ -0,0 +1,221 @@
+# Damage.py
+#
+# ------------- File used to handle the vehicles damages -----------
+# Contains the VehicleModel class to describe the modules of a vehicle.
+# The VehicleModel class provides a bounding volume hierarchy of the
+# modules, shared by every vehicle of the same type.
+# Contains the DamageModel class to resolve the impacts of the shells.
+#
+
+# Import all necessary library
+import mmath
+import numpy as np
+
+MODULES = {"hull": {"box": (-1, -1, 0, 1, 1, 0.6), "armor": 60, "effect": "hull"},
+           "engine": {"box": (-0.95, -0.6, 0.1, -0.55, 0.6, 0.5), "armor": 30, "effect": "paralyzed"},
+           "ammo rack": {"box": (0.15, 0.35, 0.1, 0.6, 0.8, 0.4), "armor": 20, "effect": "destroyed"},
+           "driver": {"box": (0.6, -0.6, 0.15, 0.85, -0.1, 0.5), "armor": 10, "effect": "crew"},
+           "gunner": {"box": (-0.25, 0.05, 0.6, 0.2, 0.55, 0.9), "armor": 10, "effect": "crew"},
+           "commander": {"box": (-0.25, -0.55, 0.6, 0.2, -0.05, 0.95), "armor": 10, "effect": "crew"},
+           "turret": {"box": (-0.35, -0.6, 0.6, 0.35, 0.6, 1), "armor": 120, "effect": "hull"},
+           "left track": {"box": (-1, 0.8, 0, 1, 1, 0.3), "armor": 15, "effect": "immobilized"},
+           "right track": {"box": (-1, -1, 0, 1, -0.8, 0.3), "armor": 15, "effect": "immobilized"}} # Modules of a tank, in fraction of its half length, half width and height
+
+class VehicleModel:
+    """Class used to describe the modules of a vehicle type
+    """
+
+    def __init__(self, length: float, width: float, height: float, modules: dict = MODULES) -> None:
+        """Construct a vehicle model, with the bounding volume hierarchy of its modules
+
+        Args:
+            length (float): length of the vehicle
+            width (float): width of the vehicle
+            height (float): height of the vehicle
+            modules (dict, optional): modules of the vehicle, in fraction of its size. Defaults to the modules of a tank.
+        """
+        self.names = list(modules) # Name of each module
+        scale = np.array([length / 2, width / 2, height, length / 2, width / 2, height], np.float64)
+        self.armor = np.array([modules[n]["armor"] for n in self.names], np.float64) # Armor of each module (in mm)
+        self.boxes = np.array([modules[n]["box"] for n in self.names], np.float64) * scale # Box of each module (min x, y, z, max x, y, z), x toward the front, y toward the left
+
+        self.node_box = [] # Box of each node of the hierarchy
+        self.node_children = [] # Children of each node (-1 for a leaf)
+        self.node_module = [] # Module of each leaf (-1 for a node)
+        self.build(list(range(len(self.names))))
+        self.node_box = np.array(self.node_box, np.float64)
+
+    def build(self, modules: list) -> int:
+        """Build a node of the bounding volume hierarchy, splitting the modules on the longest axis
+
+        Args:
+            modules (list): index of the modules inside the node
+
+        Returns:
+            int: index of the node
+        """
+        boxes = self.boxes[modules]
+        node = len(self.node_box)
+        self.node_box.append(np.concatenate((boxes[:, :3].min(0), boxes[:, 3:].max(0))))
+        self.node_children.append((-1, -1))
+        self.node_module.append(-1)
+        if len(modules) == 1: # Leaf of the hierarchy
+            self.node_module[node] = modules[0]
+            return node
+
+        axis = int(np.argmax(self.node_box[node][3:] - self.node_box[node][:3]))
+        order = [modules[i] for i in np.argsort((boxes[:, axis] + boxes[:, axis + 3]) / 2, kind = "stable")]
+        left = self.build(order[:len(order) // 2])
+        right = self.build(order[len(order) // 2:])
+        self.node_children[node] = (left, right)
+        return node
+
+    def intersect(self, origin: np.ndarray, direction: np.ndarray) -> tuple:
+        """Return every module crossed by many rays, traversing the hierarchy once for all the rays
+
+        Args:
+            origin (np.ndarray): (n, 3) origin of each ray, in the vehicle coordinates
+            direction (np.ndarray): (n, 3) direction of each ray, in the vehicle coordinates
+
+        Returns:
+            tuple: ray, module and entry distance of each crossing
+        """
+        with np.errstate(divide = "ignore"):
+            inverse = 1 / np.where(direction == 0, 1e-12, direction)
+
+        rays, modules, entries = [], [], []
+        stack = [(0, np.arange(len(origin)))]
+        while len(stack) > 0: # Browse the nodes hit by at least a ray
+            node, candidates = stack.pop()
+            t0 = (self.node_box[node][None, :3] - origin[candidates]) * inverse[candidates]
+            t1 = (self.node_box[node][None, 3:] - origin[candidates]) * inverse[candidates]
+            entry = np.maximum(np.minimum(t0, t1).max(1), 0)
+            leave = np.maximum(t0, t1).min(1)
+            hit = entry <= leave
+            candidates = candidates[hit]
+            if len(candidates) == 0: continue
+
+            if self.node_module[node] != -1:
+                rays.append(candidates)
+                modules.append(np.full(len(candidates), self.node_module[node]))
+                entries.append(entry[hit])
+            else:
+                stack.append((self.node_children[node][0], candidates))
+                stack.append((self.node_children[node][1], candidates))
+
+        if len(rays) == 0: return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0)
+        return np.concatenate(rays), np.concatenate(modules), np.concatenate(entries)
+
+class DamageModel:
+    """Class used to resolve the impacts of the shells on the vehicles
+    """
+
+    def __init__(self, game) -> None:
+        """Construct a damage model, with one vehicle model by vehicle type
+
+        Args:
+            game: main game object
+        """
+        self.game = game
+
+        self.crew_damage = 40 # Health lost when a crew member is knocked out
+        self.hull_damage = 10 # Health lost when the hull is penetrated
+        self.penetration = 450 # Penetration of a nerfed OFL 120 F1 (in mm)
+
+        entities = game.get_entities()
+        self.effects = np.array([MODULES[name]["effect"] for name in MODULES]) # Effect of each module when destroyed
+        self.models = [VehicleModel(float(entities.types_length[i]), float(entities.types_length[i]) * 0.45, float(entities.types_height[i])) for i in range(len(entities.types_length))] # Model shared by every vehicle of a type
+
+    def get_models(self) -> list:
+        """Return the model of each vehicle type
+
+        Returns:
+            list: model of each vehicle type
+        """
+        return self.models
+
+    def resolve(self, vehicles: np.ndarray, x: np.ndarray, y: np.ndarray, z: np.ndarray, direction_x: np.ndarray, direction_y: np.ndarray, direction_z: np.ndarray, penetration = None) -> tuple:
+        """Resolve many impacts on vehicles, and apply the effects of the destroyed modules
+
+        Args:
+            vehicles (np.ndarray): index of the hit vehicle of each impact
+            x (np.ndarray): x pos of each impact
+            y (np.ndarray): y pos of each impact
+            z (np.ndarray): height of each impact
+            direction_x (np.ndarray): x of the direction of each shell
+            direction_y (np.ndarray): y of the direction of each shell
+            direction_z (np.ndarray): z of the direction of each shell
+            penetration (optional): penetration of each shell. Defaults to the penetration of the OFL 120 F1.
+
+        Returns:
+            tuple: impact and module of each destroyed module
+        """
+        entities = self.game.get_entities()
+        if penetration is None: penetration = self.penetration
+        vehicles = np.asarray(vehicles, np.int64)
+        penetration = np.broadcast_to(np.asarray(penetration, np.float64), vehicles.shape)
+
+        cos_heading, sin_heading = mmath.direction_vectors(entities.heading[vehicles])
+        forward = np.stack((cos_heading, -sin_heading), 1) # Same direction as the ray-cast
+        left = np.stack((-sin_heading, -cos_heading), 1)
+        direction = np.stack((direction_x, direction_y, direction_z), 1).astype(np.float64)
+        offset = np.stack((x - entities.x[vehicles], y - entities.y[vehicles]), 1) - direction[:, :2] * entities.get_length(vehicles)[:, None] # Start the ray outside of the vehicle
+        origin = np.stack(((offset * forward).sum(1), (offset * left).sum(1), z - direction[:, 2] * entities.get_length(vehicles)), 1)
+        local_direction = np.stack(((direction[:, :2] * forward).sum(1), (direction[:, :2] * left).sum(1), direction[:, 2]), 1)
+
+        impacts, modules = [], []
+        for vehicle_type, model in enumerate(self.models): # Each model is traversed once for all its impacts
+            of_type = np.flatnonzero(entities.vehicle_type[vehicles] == vehicle_type)
+            if len(of_type) == 0: continue
+            rays, hit_modules, entries = model.intersect(origin[of_type], local_direction[of_type])
+
+            order = np.lexsort((entries, rays)) # Modules crossed by each ray, from the first to the last
+            rays, hit_modules = rays[order], hit_modules[order]
+            armor = np.cumsum(model.armor[hit_modules])
+            starts = np.searchsorted(rays, rays, "left")
+            armor_before = armor - model.armor[hit_modules] - np.where(starts > 0, armor[starts - 1], 0) # Armor crossed before each module by its ray
+            penetrated = armor_before + model.armor[hit_modules] < penetration[of_type[rays]]
+            impacts.append(of_type[rays[penetrated]])
+            modules.append(hit_modules[penetrated])
+
+        impacts = np.concatenate(impacts) if len(impacts) > 0 else np.zeros(0, np.int64)
+        modules = np.concatenate(modules) if len(modules) > 0 else np.zeros(0, np.int64)
+        self.apply(vehicles[impacts], modules)
+        return impacts, modules
+
+    def apply(self, vehicles: np.ndarray, modules: np.ndarray) -> None:
+        """Apply the effects of destroyed modules on the vehicles
+
+        Args:
+            vehicles (np.ndarray): index of the vehicle of each destroyed module
+            modules (np.ndarray): index of each destroyed module
+        """
+        entities = self.game.get_entities()
+        bits = (1 << modules).astype(np.uint32)
+        first = np.unique(vehicles * 32 + modules, return_index = True)[1] # First impact on each module, a module hit twice in the batch is destroyed once
+        new = np.zeros(len(vehicles), np.bool_) # Modules destroyed by these impacts
+        new[first] = (entities.destroyed_modules[vehicles[first]] & bits[first]) == 0
+        np.bitwise_or.at(entities.destroyed_modules, vehicles, bits)
+        effect = self.effects[modules]
+
+        entities.speed[vehicles[(effect == "paralyzed") | (effect == "immobilized")]] = 0 # An engine or a track hit stops the vehicle
+        np.subtract.at(entities.health, vehicles[new & (effect == "crew")], self.crew_damage)
+        np.subtract.at(entities.health, vehicles[effect == "hull"], self.hull_damage)
+        entities.health[vehicles[effect == "destroyed"]] = 0 # An ammo rack hit destroys the vehicle
+
+        hit = np.unique(vehicles)
+        crew = np.uint32(sum(1 << i for i, e in enumerate(self.effects) if e == "crew"))
+        entities.health[hit[(entities.destroyed_modules[hit] & crew) == crew]] = 0 # Without crew, the vehicle is lost
+        entities.alive[hit[entities.health[hit] <= 0]] = False
+
+    def resolve_impacts(self, impacts: np.ndarray) -> tuple:
+        """Resolve the impacts of the ballistics simulation on the vehicles
+
+        Args:
+            impacts (np.ndarray): impacts of the last update of the ballistics simulation
+
+        Returns:
+            tuple: impact and module of each destroyed module
+        """
+        impacts = impacts[impacts["vehicle"] != -1]
+        return self.resolve(impacts["vehicle"], impacts["x"], impacts["y"], impacts["z"], impacts["direction_x"], impacts["direction_y"], impacts["direction_z"])
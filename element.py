@@ -0,0 +1,148 @@
+# Element.py
+#
+# ------------- File used to describe the map elements ------------
+# Contains the ElementRegistry class to describe every map element.
+# The ElementRegistry class stores each property of the elements as
+# an array indexed by the number of the element, so the ray-cast and
+# the render loops index it directly, one part or many parts at once.
+#
+
+# Import all necessary library
+import numpy as np
+
+ELEMENTS = {"nothing": {"number": 1, "height": 0, "solid": False, "color": (0, 255, 0)},
+            "tree": {"number": 2, "height": 10, "leaves width": 7, "solid": True, "color": (25, 51, 0), "texture": "ressources/textures/wood.png"},
+            "brick wall": {"number": 4, "height": 5, "solid": True, "color": (178, 34, 34), "texture": ""},
+            "player's tank": {"number": 7, "height": 0, "solid": False, "color": (255, 0, 0)}} # Every map element with its properties (a texture without file is generated by the texture registry)
+
+class ElementRegistry:
+    """Class used to describe every element of the map, with one array by property
+    """
+
+    def __init__(self, elements: dict = ELEMENTS) -> None:
+        """Construct an element registry
+
+        Args:
+            elements (dict, optional): every element with its properties. Defaults to the elements of the game.
+        """
+        self.heights = np.zeros(256, np.float64) # Height of each element, indexed by the number of the element (a negative number indexes its byte)
+        self.leaves_widths = np.zeros(256, np.float64) # Width of the leaves of each element (0 without leaves)
+        self.names = {} # Number of each element, by its name
+        self.palette = np.zeros((256, 3), np.uint8) # Color of each element on the minimap
+        self.solid = np.ones(256, np.bool_) # If each element stops the ray-casts and the shells (unknown parts stop them)
+        self.texture_ids = np.full(256, -1, np.int16) # Texture of each element, or -1
+        self.textures = [] # (name of the element, path of the file) of each texture
+
+        for name, properties in elements.items(): # Fill the arrays
+            number = properties["number"]
+            self.names[name] = number
+            self.heights[number] = properties.get("height", 0)
+            self.leaves_widths[number] = properties.get("leaves width", 0)
+            self.palette[number] = properties.get("color", (0, 0, 0))
+            self.solid[number] = properties.get("solid", True)
+            if "texture" in properties:
+                self.texture_ids[number] = len(self.textures)
+                self.textures.append((name, properties["texture"]))
+
+    def get_height(self, number: int) -> float:
+        """Return the height of an element
+
+        Args:
+            number (int): number of the element
+
+        Returns:
+            float: height of the element
+        """
+        return float(self.heights[number])
+
+    def get_heights(self) -> np.ndarray:
+        """Return the height of each element
+
+        Returns:
+            np.ndarray: height of each element, indexed by the number of the element
+        """
+        return self.heights
+
+    def get_leaves_width(self, number: int) -> float:
+        """Return the width of the leaves of an element
+
+        Args:
+            number (int): number of the element
+
+        Returns:
+            float: width of the leaves of the element
+        """
+        return float(self.leaves_widths[number])
+
+    def get_leaves_widths(self) -> np.ndarray:
+        """Return the width of the leaves of each element
+
+        Returns:
+            np.ndarray: width of the leaves of each element, indexed by the number of the element
+        """
+        return self.leaves_widths
+
+    def get_maximum_height(self) -> float:
+        """Return the height of the highest element, with its leaves
+
+        Returns:
+            float: height of the highest element, with its leaves
+        """
+        return float((self.heights + self.leaves_widths).max()) # The leaves are drawn above the top of the part
+
+    def get_number(self, name: str) -> int:
+        """Return the number of an element with its name
+
+        Args:
+            name (str): name of the element
+
+        Returns:
+            int: number of the element, or 0 if there is no element with this name
+        """
+        return self.names.get(name, 0)
+
+    def get_palette(self) -> np.ndarray:
+        """Return the color of each element
+
+        Returns:
+            np.ndarray: (256, 3) color of each element, indexed by the byte of the element
+        """
+        return self.palette
+
+    def get_solid(self) -> np.ndarray:
+        """Return if each element stops the ray-casts and the shells
+
+        Returns:
+            np.ndarray: if each element is solid, indexed by the number of the element
+        """
+        return self.solid
+
+    def get_texture_id(self, number: int) -> int:
+        """Return the texture of an element
+
+        Args:
+            number (int): number of the element
+
+        Returns:
+            int: index of the texture of the element, or -1
+        """
+        return int(self.texture_ids[number])
+
+    def get_textures(self) -> list:
+        """Return the name of the element and the path of the file of each texture
+
+        Returns:
+            list: (name of the element, path of the file) of each texture
+        """
+        return self.textures
+
+    def is_solid(self, number: int) -> bool:
+        """Return if an element stops the ray-casts and the shells
+
+        Args:
+            number (int): number of the element
+
+        Returns:
+            bool: if the element is solid
+        """
+        return bool(self.solid[number])
@@ -0,0 +1,315 @@
+# Entity.py
+#
+# ------------ File used to handle the enemy vehicles -------------
+# Contains the EntityStore class to handle the enemy vehicles.
+# The EntityStore class stores every vehicle as arrays, and moves and
+# collides them with the map in vectorized batches.
+#
+
+# Import all necessary library
+import math
+import mmath
+import numpy as np
+import os
+import sprite
+
+class EntityStore:
+    """Class used to handle every enemy vehicle
+    """
+
+    def __init__(self, game, capacity: int = 64) -> None:
+        """Construct an entity store
+
+        Args:
+            game: main game object
+            capacity (int, optional): number of vehicles stored before the arrays grow. Defaults to 64.
+        """
+        self.game = game
+
+        self.vehicle_types = {0: {"name": "Leopard 2", "height": 3, "length": 8, "speed": 12, "health": 100, "texture": "ressources/textures/leopard2.png"},
+                              1: {"name": "M1A2 Abrams", "height": 3, "length": 8, "speed": 11, "health": 110, "texture": "ressources/textures/abrams.png"},
+                              2: {"name": "T-90", "height": 2.5, "length": 7, "speed": 13, "health": 90, "texture": "ressources/textures/t90.png"}} # Datas about each vehicle type
+        self.types_health = np.array([self.vehicle_types[i]["health"] for i in range(len(self.vehicle_types))], np.float32) # Health of each vehicle type
+        self.types_height = np.array([self.vehicle_types[i]["height"] for i in range(len(self.vehicle_types))], np.float32) # Height of each vehicle type
+        self.types_length = np.array([self.vehicle_types[i]["length"] for i in range(len(self.vehicle_types))], np.float32) # Length of each vehicle type
+        self.types_speed = np.array([self.vehicle_types[i]["speed"] for i in range(len(self.vehicle_types))], np.float32) # Speed of each vehicle type
+        self.types_sprite = [sprite.Sprite(game, (0, 0), self.vehicle_types[i]["height"], self.vehicle_types[i]["length"], self.vehicle_types[i]["texture"], False) for i in range(len(self.vehicle_types))] # Sprite sharing the texture of each vehicle type
+
+        self.flow_fields = [] # Flow field of each goal followed by the vehicles
+        self.loader = None # Background loader of the textures, once the textures are loaded
+        self.types_loaded = set() # Vehicle types whose texture is loaded or loading
+
+        self.alive = np.zeros(capacity, np.bool_) # If each vehicle is alive
+        self.destroyed_modules = np.zeros(capacity, np.uint32) # Bits of the destroyed modules of each vehicle (see damage.MODULES)
+        self.goal = np.full(capacity, -1, np.int16) # Index of the flow field followed by each vehicle, or -1
+        self.heading = np.zeros(capacity, np.float32) # Angle of each vehicle (like the trigonometrical circle)
+        self.health = np.zeros(capacity, np.float32) # Health of each vehicle
+        self.speed = np.zeros(capacity, np.float32) # Speed of each vehicle (in meter by second)
+        self.vehicle_type = np.zeros(capacity, np.int8) # Type of each vehicle
+        self.x = np.zeros(capacity, np.float32) # Pos of each vehicle
+        self.y = np.zeros(capacity, np.float32)
+
+    def add_flow_field(self, flow_field) -> int:
+        """Add a flow field the vehicles can follow
+
+        Args:
+            flow_field (pathfinding.FlowField): flow field to add
+
+        Returns:
+            int: index of the goal of the flow field
+        """
+        for i, f in enumerate(self.flow_fields):
+            if f is flow_field: return i
+        self.flow_fields.append(flow_field)
+        return len(self.flow_fields) - 1
+
+    def get_alive(self) -> np.ndarray:
+        """Return the index of every alive vehicle
+
+        Returns:
+            np.ndarray: index of every alive vehicle
+        """
+        return np.flatnonzero(self.alive)
+
+    def get_height(self, index) -> np.ndarray:
+        """Return the height of vehicles
+
+        Args:
+            index: index of the vehicles
+
+        Returns:
+            np.ndarray: height of the vehicles
+        """
+        return self.types_height[self.vehicle_type[index]]
+
+    def get_length(self, index) -> np.ndarray:
+        """Return the length of vehicles
+
+        Args:
+            index: index of the vehicles
+
+        Returns:
+            np.ndarray: length of the vehicles
+        """
+        return self.types_length[self.vehicle_type[index]]
+
+    def get_spotted(self, base_pos: tuple) -> np.ndarray:
+        """Return the alive vehicles seen from a pos, read in the visibility field from the turret or with one batched line of sight query
+
+        Args:
+            base_pos (tuple): pos of the observer
+
+        Returns:
+            np.ndarray: index of every alive vehicle in the line of sight
+        """
+        alive = self.get_alive()
+        field = self.game.get_visibility()
+        if tuple(base_pos) == tuple(field.get_eye()): # Read the visibility field of the turret
+            visible = field.get_visible_at(self.x[alive], self.y[alive])
+        else:
+            visible = self.game.get_map().line_of_sight(base_pos[0], base_pos[1], self.x[alive], self.y[alive])[0]
+        return alive[visible]
+
+    def get_sprites(self) -> list:
+        """Return a sprite view of every alive vehicle
+
+        Returns:
+            list: sprite view of every alive vehicle
+        """
+        return [sprite.SpriteView(self, int(i)) for i in self.get_alive()]
+
+    def get_sprites_in_view(self, base_pos: tuple, angle: float, fov: float, max_count: int = 64) -> list:
+        """Return a sprite view of the nearest alive vehicles in a view (without the vehicles hidden from the turret), with their angle and their distance
+
+        Args:
+            base_pos (tuple): pos of the view
+            angle (float): angle of the view (like the trigonometrical circle)
+            fov (float): FOV of the view
+            max_count (int, optional): maximum number of vehicles returned. Defaults to 64.
+
+        Returns:
+            list: list of (sprite view, angle, distance) of the vehicles, from the nearest to the farthest
+        """
+        alive = self.get_alive()
+        dx = self.x[alive] - base_pos[0]
+        dy = self.y[alive] - base_pos[1]
+        distance = np.maximum(mmath.distances2D(0, 0, dx, dy), 0.000001)
+        angles = np.degrees(np.arctan2(-dy, dx)) % 360 # Same direction as the ray-cast
+        half_width = np.degrees(np.arctan(self.get_length(alive) / 2 / distance)) # Half angular width of each vehicle
+        difference = np.abs((angles - angle + 180) % 360 - 180)
+        in_view = difference < fov / 2 + half_width
+        field = self.game.get_visibility()
+        if tuple(base_pos) == tuple(field.get_eye()): # Cull the vehicles hidden from the turret, seen if their center or a side is visible
+            side_x, side_y = -dy / distance * self.get_length(alive) / 2, dx / distance * self.get_length(alive) / 2
+            in_view &= field.get_visible_at(self.x[alive], self.y[alive]) | field.get_visible_at(self.x[alive] + side_x, self.y[alive] + side_y) | field.get_visible_at(self.x[alive] - side_x, self.y[alive] - side_y)
+        visibles = np.flatnonzero(in_view)
+        visibles = visibles[np.argsort(distance[visibles])[:max_count]]
+        return [(sprite.SpriteView(self, int(alive[i])), float(angles[i]), float(distance[i])) for i in visibles]
+
+    def get_type_sprite(self, vehicle_type: int) -> sprite.Sprite:
+        """Return the sprite sharing the texture of a vehicle type
+
+        Args:
+            vehicle_type (int): type of the vehicle
+
+        Returns:
+            sprite.Sprite: sprite sharing the texture of the vehicle type
+        """
+        return self.types_sprite[vehicle_type]
+
+    def grow(self, capacity: int) -> None:
+        """Grow the arrays of the vehicles
+
+        Args:
+            capacity (int): minimum number of vehicles stored
+        """
+        capacity = max(capacity, len(self.alive) * 2)
+        for name in ("alive", "destroyed_modules", "goal", "heading", "health", "speed", "vehicle_type", "x", "y"):
+            array = getattr(self, name)
+            new_array = np.full(capacity, -1 if name == "goal" else 0, array.dtype)
+            new_array[:len(array)] = array
+            setattr(self, name, new_array)
+
+    def load_textures(self, loader) -> None:
+        """Load the texture of each vehicle type on the map in background, the other types are loaded when they spawn
+
+        Args:
+            loader (loader.Loader): background loader of the game
+        """
+        self.loader = loader
+        self.load_types_textures(np.unique(self.vehicle_type[self.alive]))
+
+    def load_types_textures(self, vehicle_types) -> None:
+        """Load the texture of vehicle types in background, if it is not loaded yet
+
+        Args:
+            vehicle_types: vehicle types to load
+        """
+        if self.loader is None: return
+        for vehicle_type in vehicle_types:
+            vehicle_type = int(vehicle_type)
+            if vehicle_type in self.types_loaded: continue
+            self.types_loaded.add(vehicle_type)
+            s = self.types_sprite[vehicle_type]
+            if s.get_texture_path() != "" and (self.loader.get_baked(s.get_texture_path()) is not None or os.path.exists(s.get_texture_path())):
+                self.loader.load_texture(s, s.get_texture_path())
+
+    def query_points(self, x: np.ndarray, y: np.ndarray, z: np.ndarray) -> np.ndarray:
+        """Return the vehicle containing each point (each vehicle is a vertical cylinder)
+
+        Args:
+            x (np.ndarray): x pos of each point
+            y (np.ndarray): y pos of each point
+            z (np.ndarray): height of each point
+
+        Returns:
+            np.ndarray: index of the vehicle containing each point, or -1
+        """
+        shape = np.shape(x)
+        x, y, z = np.ravel(x), np.ravel(y), np.ravel(z)
+        result = np.full(x.shape, -1, np.int32)
+        alive = self.get_alive()
+        if len(alive) == 0 or result.size == 0: return result.reshape(shape)
+
+        bucket_size = float(self.types_length.max()) # Vehicles are sorted into square buckets
+        buckets_y = math.ceil(self.game.get_map().get_map_HEIGHT() / bucket_size) + 2
+        keys = (np.floor(self.x[alive] / bucket_size).astype(np.int64) + 1) * buckets_y + np.floor(self.y[alive] / bucket_size).astype(np.int64) + 1
+        order = np.argsort(keys)
+        keys = keys[order]
+        alive = alive[order]
+
+        point_x = np.floor(x / bucket_size).astype(np.int64) + 1
+        point_y = np.floor(y / bucket_size).astype(np.int64) + 1
+        for offset_x in (-1, 0, 1):
+            for offset_y in (-1, 0, 1): # Test the vehicles of the neighbour buckets
+                point_keys = (point_x + offset_x) * buckets_y + point_y + offset_y
+                start = np.searchsorted(keys, point_keys, "left")
+                count = np.searchsorted(keys, point_keys, "right") - start
+                for j in range(int(count.max(initial = 0))):
+                    candidates = np.flatnonzero((count > j) & (result == -1))
+                    vehicle = alive[start[candidates] + j]
+                    inside = (np.hypot(x[candidates] - self.x[vehicle], y[candidates] - self.y[vehicle]) < self.get_length(vehicle) / 2) & (z[candidates] < self.get_height(vehicle))
+                    result[candidates[inside]] = vehicle[inside]
+        return result.reshape(shape)
+
+    def spawn(self, x, y, heading, vehicle_type, speed = None, goal: int = -1) -> np.ndarray:
+        """Spawn vehicles
+
+        Args:
+            x: x pos of each vehicle
+            y: y pos of each vehicle
+            heading: angle of each vehicle (like the trigonometrical circle)
+            vehicle_type: type of each vehicle
+            speed (optional): speed of each vehicle. Defaults to the speed of the vehicle type.
+            goal (int, optional): index of the flow field followed by the vehicles. Defaults to -1 (no flow field).
+
+        Returns:
+            np.ndarray: index of each spawned vehicle
+        """
+        x, y, heading, vehicle_type = [np.ravel(a) for a in np.broadcast_arrays(x, y, heading, vehicle_type)]
+        if speed is None: speed = self.types_speed[vehicle_type]
+
+        free = np.flatnonzero(~self.alive)
+        if len(free) < len(x): # Grow the arrays
+            self.grow(len(self.alive) + len(x) - len(free))
+            free = np.flatnonzero(~self.alive)
+        vehicles = free[:len(x)]
+
+        self.alive[vehicles] = True
+        self.destroyed_modules[vehicles] = 0
+        self.goal[vehicles] = goal
+        self.heading[vehicles] = heading
+        self.health[vehicles] = self.types_health[vehicle_type]
+        self.speed[vehicles] = speed
+        self.vehicle_type[vehicles] = vehicle_type
+        self.x[vehicles], self.y[vehicles] = x, y
+        self.load_types_textures(np.unique(vehicle_type)) # The texture of a new type is loaded at its first spawn
+        return vehicles
+
+    def spawn_column(self, count: int, vehicle_types: tuple = (0, 1, 2)) -> np.ndarray:
+        """Spawn vehicles on the left of the map, crossing it to the right
+
+        Args:
+            count (int): number of vehicles to spawn
+            vehicle_types (tuple, optional): types of the spawned vehicles. Defaults to every type.
+
+        Returns:
+            np.ndarray: index of each spawned vehicle
+        """
+        if count <= 0: return np.zeros(0, np.int64) # Nothing to spawn (a negative count too)
+        map_size = self.game.get_map().get_ray_size()
+        x = np.random.uniform(0, 20, count)
+        y = np.random.uniform(0, map_size[1], count)
+        heading = np.random.uniform(-20, 20, count) % 360
+
+        goal = self.add_flow_field(self.game.get_pathfinding().get_flow_field([(map_size[0] - 1, y) for y in range(map_size[1])])) # Go around the obstacles toward the right
+        return self.spawn(x, y, heading, np.random.choice(vehicle_types, count), goal = goal)
+
+    def update(self, delta_time: float) -> None:
+        """Update every vehicle for one frame
+
+        Args:
+            delta_time (float): time in seconds between this frame and the last frame
+        """
+        moving = np.flatnonzero(self.alive & (self.speed > 0))
+        if len(moving) == 0 or delta_time <= 0: return
+
+        for goal in range(len(self.flow_fields)): # Steer the vehicles following a flow field, with one lookup
+            following = moving[self.goal[moving] == goal]
+            headings = self.flow_fields[goal].get_headings(self.x[following], self.y[following])
+            self.heading[following[~np.isnan(headings)]] = headings[~np.isnan(headings)]
+
+        direction_x, direction_y = mmath.direction_vectors(self.heading[moving])
+        new_x = self.x[moving] + self.speed[moving] * delta_time * direction_x # Same direction as the ray-cast
+        new_y = self.y[moving] - self.speed[moving] * delta_time * direction_y
+
+        part_x = np.floor(new_x).astype(np.int64) # Test the parts with the ray-cast convention (first index is x)
+        part_y = np.floor(new_y).astype(np.int64)
+        in_map = self.game.get_map().is_inside(part_x, part_y)
+        blocked = np.zeros(len(moving), np.bool_)
+        blocked[in_map] = self.game.get_map().get_element_registry().get_solid()[self.game.get_map().get_parts_at(part_y[in_map], part_x[in_map])]
+
+        free = in_map & ~blocked
+        self.x[moving[free]], self.y[moving[free]] = new_x[free], new_y[free]
+        self.heading[moving[blocked]] = (self.heading[moving[blocked]] + np.random.choice((-90, 90), int(blocked.sum()))) % 360 # Go around the obstacle
+        self.alive[moving[~in_map]] = False # The vehicles leaving the map are removed
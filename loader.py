@@ -0,0 +1,173 @@
+# Loader.py
+#
+# -------------- File used to load the assets in background -------
+# Contains the Loader class to load the assets.
+# The Loader class provides an asyncio loop decoding maps and textures
+# into executors (with the structures built from a map, like the
+# visibility field), and swaps them into the game between two frames.
+# The baked assets (see bake.py) are loaded instead of their sources
+# while they are up to date.
+#
+
+# Import all necessary library
+import asyncio
+import bake
+import concurrent.futures
+import threading
+
+class Loader:
+    """Class used to load the game assets in background
+    """
+
+    def __init__(self, game, max_workers: int = 4, baked_directory: str = bake.BAKED_DIRECTORY) -> None:
+        """Construct a background loader, with its own asyncio loop
+
+        Args:
+            game: main game object
+            max_workers (int, optional): number of threads decoding the assets. Defaults to 4.
+            baked_directory (str, optional): directory of the baked assets. Defaults to bake.BAKED_DIRECTORY.
+        """
+        self.game = game
+
+        self.baked_directory = baked_directory
+        self.baked_manifest = bake.read_manifest(baked_directory) # Manifest of the baked assets, read once
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers) # Executor where the decode work is done
+        self.lock = threading.Lock() # Lock protecting the datas shared with the loop thread
+        self.loop = asyncio.new_event_loop() # Asyncio loop scheduling the loadings
+        self.pending = [] # List of every loaded asset waiting to be applied, with their apply function
+        self.tasks_done = 0 # Number of loading finished
+        self.tasks_total = 0 # Number of loading asked
+
+        self.thread = threading.Thread(target = self.loop.run_forever, daemon = True) # Thread running the asyncio loop
+        self.thread.start()
+
+    async def _load(self, decode, args: tuple, apply) -> None:
+        """Decode an asset into the executor, and put it into the pending list
+
+        Args:
+            decode: function decoding the asset, called into the executor
+            args (tuple): arguments of the decode function
+            apply: function applying the decoded asset, called at a frame boundary
+        """
+        result = None
+        error = None
+        try:
+            result = await self.loop.run_in_executor(self.executor, decode, *args)
+        except Exception as e: # Give the error to the main thread
+            error = e
+
+        with self.lock:
+            self.pending.append((apply, result, error))
+            self.tasks_done += 1
+
+    def apply_pending(self) -> int:
+        """Apply every asset loaded since the last call, should be called between two frames
+
+        Raises the error of the first asset which failed to load, the assets after it stay pending for the next call.
+
+        Returns:
+            int: number of asset applied
+        """
+        with self.lock: # Take the pending assets atomically
+            pending = self.pending
+            self.pending = []
+
+        for i, (apply, result, error) in enumerate(pending):
+            if error is not None:
+                with self.lock: # Keep the next assets, so no asset is lost
+                    self.pending[:0] = pending[i + 1:]
+                raise error
+            apply(result)
+        return len(pending)
+
+    def decode_map(self, map_to_load, path: str) -> tuple:
+        """Decode a map, and build the structures of the map from its parts (called into the executor)
+
+        Args:
+            map_to_load (map.Map): map where the datas are swapped in
+            path (str): path of the map to decode
+
+        Returns:
+            tuple: width of the map, height of the map, parts and structures built from them (see Map.prepare)
+        """
+        map_width, map_height, parts = map_to_load.decode(path)
+        return map_width, map_height, parts, map_to_load.prepare(map_width, map_height, parts)
+
+    def get_baked(self, path: str) -> str:
+        """Return the path of the baked asset of a source, if it is up to date
+
+        Args:
+            path (str): path of the source asset
+
+        Returns:
+            str: path of the baked asset, or None
+        """
+        return bake.find_baked(self.baked_manifest, path, self.baked_directory)
+
+    def get_loading(self) -> bool:
+        """Return if some assets are still loading
+
+        Returns:
+            bool: if some assets are still loading
+        """
+        with self.lock:
+            return self.tasks_done < self.tasks_total or len(self.pending) > 0
+
+    def get_progress(self) -> float:
+        """Return the progress of the loading (between 0 and 1)
+
+        Returns:
+            float: progress of the loading
+        """
+        with self.lock:
+            if self.tasks_total == 0: return 1
+            return self.tasks_done / self.tasks_total
+
+    def load(self, decode, args: tuple, apply) -> concurrent.futures.Future:
+        """Load an asset in background
+
+        Args:
+            decode: function decoding the asset, called into the executor
+            args (tuple): arguments of the decode function
+            apply: function applying the decoded asset, called at a frame boundary
+
+        Returns:
+            concurrent.futures.Future: future done when the asset is decoded
+        """
+        with self.lock:
+            self.tasks_total += 1
+        return asyncio.run_coroutine_threadsafe(self._load(decode, args, apply), self.loop)
+
+    def load_map(self, map_to_load, path: str = "map.agmff") -> concurrent.futures.Future:
+        """Load a map in background, from its baked map if it is up to date
+
+        Args:
+            map_to_load (map.Map): map where the datas are swapped in
+            path (str, optional): path of the map to load. Defaults to "map.agmff".
+
+        Returns:
+            concurrent.futures.Future: future done when the map is decoded
+        """
+        baked_path = self.get_baked(path)
+        return self.load(self.decode_map, (map_to_load, path if baked_path is None else baked_path), lambda result: map_to_load.set_parts(*result))
+
+    def load_texture(self, sprite_to_load, path: str) -> concurrent.futures.Future:
+        """Load the texture of a sprite in background, from its baked texture if it is up to date
+
+        Args:
+            sprite_to_load (sprite.Sprite): sprite where the texture is swapped in
+            path (str): path of the texture to load
+
+        Returns:
+            concurrent.futures.Future: future done when the texture is decoded
+        """
+        baked_path = self.get_baked(path)
+        if baked_path is not None: return self.load(sprite_to_load.decode_baked_texture, (baked_path,), lambda result: sprite_to_load.set_texture(*result))
+        return self.load(sprite_to_load.decode_texture, (path,), lambda result: sprite_to_load.set_texture(*result))
+
+    def stop(self) -> None:
+        """Stop the loader loop and its executor
+        """
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.executor.shutdown(wait = False)
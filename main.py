@@ -2,26 +2,39 @@
 #
 # ----------------------- Main project file -----------------------
 # Contains the Game class to create the game.
-# The Game class provides assembles the graphics parts.
-#
+# The Game class provides assembles the graphics parts, over a local
+# simulation or a simulation served by a headless server.
 #
 
 # Import all necessary library
+import loader
 import map
 import mmath
-import player
+import os
 import pygame
+import raycast
+import server
+import simulation
 import sprite
+import texture
 
-class Game:
+class Game(simulation.Simulation):
     """Main class to run the game
     """
 
-    def __init__(self) -> None:
+    def __init__(self, enemies: int = 0, connect: tuple = None) -> None:
         """Create a game object
+
+        Args:
+            enemies (int, optional): number of enemy vehicles crossing the map. Defaults to 0.
+            connect (tuple, optional): (host, port) of a simulation server to render, or None to simulate locally. Defaults to None.
         """
+        self.client = None # Connection to the simulation server, if the simulation is not local
         self.delta_time = 0 # Time between the last frame and this frame
+        self.fires = 0 # Number of shells fired since the last input sent to the server
         self.game_surface = 0 # Main graphics pygame Surface of the game
+        self.gunner_sight_displayed = False # If the gunner sight is displayed in the HUD, with the commander view
+        self.minimap_displayed = False # If the minimap is displayed in the HUD
         self.pressed_keys = [] # List of all pressed keys
         self.running = True # If the game is running
         self.SCREEN_WIDTH = 505 # Width of the screen (const)
@@ -30,13 +43,29 @@ class Game:
         pygame.init() # Activate the pygame display
         self.window = pygame.display.set_mode((self.get_SCREEN_WIDTH(), self.get_SCREEN_HEIGHT()))
 
-        self.map = map.Map(self) # Create the map
-        self.player = player.Player(self) # Create the player
-        self.leopard2 = sprite.Sprite(self, (252, 200), 3, 8, "ressources/textures/leopard2.png") #Create a Leopard 2
+        self.loader = loader.Loader(self) # Create the background loader
+        if connect is None:
+            super().__init__(enemies, False) # Create the simulation, with the map loaded in background
+            self.load_map()
+        else:
+            super().__init__(0, False) # Create a mirror of the served simulation
+            self.client = server.Client(self, *connect)
+        self.textures = texture.TextureRegistry(self) # Create the walls textures, loaded in background
+
+        self.entities.load_textures(self.loader)
+        self.textures.load_textures(self.loader)
 
         self.floor_offset = self.map.get_map_HEIGHT() // 2
         self.player.y_offset = 5
 
+    def get_client(self) -> server.Client:
+        """Return the connection to the simulation server
+
+        Returns:
+            server.Client: connection to the simulation server, or None if the simulation is local
+        """
+        return self.client
+
     def get_delta_time(self) -> float:
         """Return the time between the last frame and this frame
 
@@ -53,13 +82,13 @@ class Game:
         """
         return self.game_surface
     
-    def get_map(self) -> map.Map:
-        """Return the main Map in the game
+    def get_loader(self) -> loader.Loader:
+        """Return the background loader of the game
 
         Returns:
-            map.Map: main Map in the game
+            loader.Loader: background loader of the game
         """
-        return self.map
+        return self.loader
 
     def get_running(self) -> bool:
         """Return if the game is running
@@ -85,14 +114,14 @@ class Game:
         """
         return self.SCREEN_WIDTH
     
-    def get_sprites(self) -> list:
-        """Return a list of all the sprites in the game
+    def get_textures(self) -> texture.TextureRegistry:
+        """Return the texture of each element of the map
 
         Returns:
-            list: list of all the sprites in the game
+            texture.TextureRegistry: texture of each element of the map
         """
-        return [self.leopard2]
-    
+        return self.textures
+
     def get_window(self) -> pygame.Surface:
         """Return the main window of the game
 
@@ -126,6 +155,13 @@ class Game:
                     self.pressed_keys.append("z")
                 elif event.key == pygame.K_s:
                     self.pressed_keys.append("s")
+                elif event.key == pygame.K_m: # Show or hide the minimap
+                    self.minimap_displayed = not self.minimap_displayed
+                elif event.key == pygame.K_p: # Show or hide the gunner sight (picture in picture)
+                    self.gunner_sight_displayed = not self.gunner_sight_displayed
+                elif event.key == pygame.K_SPACE: # Fire a shell
+                    if self.get_client() is None: self.player.fire()
+                    else: self.fires += 1
             elif event.type == pygame.KEYUP: # If a key is released
                 if event.key == pygame.K_LEFT and self.pressed_keys.count("left") > 0: # If the left arrow is pressed
                     self.pressed_keys.remove("left")
@@ -144,29 +180,19 @@ class Game:
                 elif event.key == pygame.K_s:
                     self.pressed_keys.remove("s")
         
-        if self.pressed_keys.count("left") > 0: # If the left arrow is pressed, turn at the left
-            self.player.turn_turret(self.get_delta_time())
-        
-        if self.pressed_keys.count("right") > 0: # If the right arrow is pressed, turn at the right
-            self.player.turn_turret(self.get_delta_time(), -1)
-
-        if self.pressed_keys.count("q") > 0: # If the Q key is pressed, turn at left
-            self.player.turn_commander_view(self.get_delta_time())
-        
-        if self.pressed_keys.count("d") > 0: # If the D key is pressed, turn at left
-            self.player.turn_commander_view(self.get_delta_time(), -1)
+        if self.get_client() is None: # Apply the pressed keys locally, or send them to the server
+            self.apply_input(self.pressed_keys, self.get_delta_time())
+        else:
+            self.get_client().send_input(self.pressed_keys, self.fires)
+            self.fires = 0
 
-        if self.pressed_keys.count("a") > 0: # Set commander view
-            self.player.set_view(0)
+    def load_map(self, path: str = "map.agmff") -> None:
+        """Load a new map in background, swapped in between two frames when ready
 
-        if self.pressed_keys.count("e") > 0: # Set shooter view
-            self.player.set_view(1)
-
-        if self.pressed_keys.count("s") > 0: # Set commander view elevation
-            self.player.raise_commander_view(self.get_delta_time())
-
-        if self.pressed_keys.count("z") > 0: # Set shooter view elevation
-            self.player.raise_commander_view(self.get_delta_time(), -1)
+        Args:
+            path (str, optional): path of the map to load. Defaults to "map.agmff".
+        """
+        self.get_loader().load_map(self.get_map(), path)
 
     def run(self) -> None:
         """Run the game
@@ -177,20 +203,57 @@ class Game:
             self.handle_event() #Handle all the events during this frame
             if not self.get_running(): break # If the user wants to quit
 
+            self.get_loader().apply_pending() # Swap in the assets loaded since the last frame
+            if self.get_client() is None: self.update(self.get_delta_time()) # Simulate the frame
+            else: # Apply the snapshots of the server
+                self.get_client().receive()
+                if not self.get_client().get_connected(): break # The server left
+
             self.game_surface = self.player.projection3D()
             self.window.blit(self.game_surface, (0, 0, self.game_surface.get_width(), self.game_surface.get_height()))
 
+            if self.gunner_sight_displayed: # Draw the gunner sight in the bottom left corner, sharing the rays of the commander view
+                gunner_sight_size = (self.get_SCREEN_WIDTH() // 3, self.get_SCREEN_HEIGHT() // 3)
+                gunner_sight = pygame.transform.scale(self.player.projection3D(self.player.get_turret_angle(), 1), gunner_sight_size)
+                self.window.blit(gunner_sight, (0, self.get_SCREEN_HEIGHT() - gunner_sight_size[1]))
+                pygame.draw.rect(self.window, (0, 0, 0), (0, self.get_SCREEN_HEIGHT() - gunner_sight_size[1], gunner_sight_size[0], gunner_sight_size[1]), 1)
+
+            if self.minimap_displayed: # Draw the minimap in the top right corner
+                minimap_size = (self.get_SCREEN_WIDTH() // 4, self.get_SCREEN_HEIGHT() // 4)
+                self.window.blit(self.map.get_minimap().get_scaled_surface(minimap_size), (self.get_SCREEN_WIDTH() - minimap_size[0], 0))
+
+            if self.get_loader().get_loading(): # Draw the loading progress bar
+                pygame.draw.rect(self.window, (255, 255, 255), (0, self.get_SCREEN_HEIGHT() - 4, self.get_SCREEN_WIDTH() * self.get_loader().get_progress(), 4))
+
             pygame.display.flip() # Update the pygame window
 
             self.delta_time = clock.get_time() / 1000 # Update the frame between each frame
             #if clock.get_time() != 0: print(1000/clock.get_time())
             clock.tick(250)
 
-m = map.MapGenerator()
-m.generate()
+        self.get_loader().stop()
+        if self.get_client() is not None: self.get_client().close()
+
+if not os.path.exists("map.agmff"): # Only generate a map the first time, so the baked map stays up to date
+    m = map.MapGenerator()
+    m.generate()
 
 # If the user directyl executes the file
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description = "Run the game")
+    parser.add_argument("--enemies", type = int, default = 0, help = "number of enemy vehicles crossing the map")
+    parser.add_argument("--connect", default = None, help = "host:port of a simulation server to render (see server.py), instead of a local simulation")
+    parser.add_argument("--raycast", choices = list(raycast.BACKENDS), default = raycast.DEFAULT_BACKEND, help = "implementation of the ray-cast (see raycast.py)")
+    arguments = parser.parse_args()
+
+    connect = None
+    if arguments.connect is not None:
+        host, port = arguments.connect.rsplit(":", 1)
+        connect = (host, int(port))
+
     # Create and run a game object
-    game = Game()
+    game = Game(arguments.enemies, connect)
+    game.get_player().set_raycast_backend(arguments.raycast)
     game.run()
\ No newline at end of file
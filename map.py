@@ -7,6 +7,10 @@
 #
 
 # Import all necessary library
+import agmff
+import element
+import minimap
+import numpy as np
 import pygame
 import random
 import struct
@@ -18,7 +22,7 @@ class MapGenerator:
     def __init__(self) -> None:
         """Construct a map generator
         """
-        self.elements = {"nothing": 1, "tree": 2, "brick wall": 4, "player's tank": 7} # Every number for the map element with their names
+        self.elements = element.ElementRegistry() # Every map element with its properties
 
         self.map_WIDTH = 505 # Width of the map (in square)
         self.map_HEIGHT = 505 # Height of the map (in square)
@@ -94,7 +98,7 @@ class MapGenerator:
         Returns:
             int: number of the elements to return
         """
-        return self.elements[name]
+        return self.elements.get_number(name)
 
     def get_map_HEIGHT(self) -> int:
         """Return the height of the map (in square)
@@ -124,18 +128,41 @@ class Map:
     """Class used to handle an in-game map
     """
 
-    def __init__(self, game) -> None:
+    def __init__(self, game, path: str = "map.agmff", load: bool = True) -> None:
         """Construct an in-game map handler
+
+        Args:
+            game: main game object
+            path (str, optional): path of the map to load. Defaults to "map.agmff".
+            load (bool, optional): if the map is loaded now, or filled with "nothing" until a later load. Defaults to True.
         """
-        self.elements = {"nothing": 1, "tree": 2, "brick wall": 4, "player's tank": 7} # Every number for the map element with their names
+        self.builders = [] # List of every (build, install) functions of the structures built from the parts of a new map
+        self.elements = element.ElementRegistry() # Every map element with its properties
+        self.dirty_regions = [] # List of every (x, y, width, height) region changed since the last flush
         self.game = game # Pointer towards the main Game object
-        self.parts = [] # 2D list of every parts
-        self.parts_data = {0: {"height": 0, "y": 0}, 1: {"height": 0, "y": 0}, 2: {"height": 10, "y": 0, "leaves width": 7}, 4: {"height": 5, "y": 0}} # Datas about a part of the map
+        self.minimap = minimap.Minimap(self) # Cached 2D display of the map
+        self.parts = [] # 2D array of every parts (or agmff.TiledParts for a streamed map)
 
         self.map_HEIGHT = 505 # Height of the map
         self.map_WIDTH = 505 # Width of the map
+        self.subscribers = [] # List of every function called with a changed region of the map
+        self.tile_memory_budget = 64 * 1024 * 1024 # Maximum size in bytes of the tiles kept for a streamed map
+
+        if load:
+            self.load(path)
+        else: # Placeholder map, until the real map is loaded
+            self.parts = np.full((self.get_map_HEIGHT(), self.get_map_WIDTH()), self.get_elements("nothing"), np.int8)
+
+        self.subscribe(self.get_minimap().invalidate)
 
-        self.load()
+    def add_builder(self, build, install) -> None:
+        """Add a structure built from the parts of a new map before the map is swapped in, so it is not built again when the swap is flushed
+
+        Args:
+            build: function called with the width, the height and the parts of a new map (from the loader thread, so it must not modify anything)
+            install: function called with the result of build when the new map is swapped in
+        """
+        self.builders.append((build, install))
 
     def display2D(self) -> pygame.Surface:
         """Return a pygame Surface of the map displayed in 2D
@@ -146,15 +173,20 @@ class Map:
         screen_width = self.game.get_SCREEN_WIDTH()
         screen_height = self.game.get_SCREEN_HEIGHT()
 
-        color = {0: (0, 0, 0), 1: (0, 255, 0), 2: (25, 51, 0), 7: (255, 0, 0)}
-        surface_to_return = pygame.Surface((self.get_map_WIDTH(), self.get_map_HEIGHT()), pygame.SRCALPHA) # Generate the surface
+        return self.get_minimap().get_scaled_surface((screen_width, screen_height))
+    
+    def flush_changes(self) -> int:
+        """Notify every subscriber of the regions changed since the last flush, should be called between two frames
 
-        for i in range(len(self.get_parts())):
-            for j in range(len(self.get_parts()[i])): # Browse the parts
-                pygame.draw.rect(surface_to_return, color[self.get_part(i, j)], (j, i, 1, 1))
+        Returns:
+            int: number of region notified
+        """
+        dirty_regions = self.dirty_regions
+        self.dirty_regions = []
+        for region in dirty_regions:
+            for subscriber in self.subscribers: subscriber(region)
+        return len(dirty_regions)
 
-        return pygame.transform.scale(surface_to_return, (screen_width, screen_height))
-    
     def get_elements(self, element: str) -> int:
         """Return the number of an element with his name
 
@@ -164,10 +196,15 @@ class Map:
         Returns:
             int: number of an element with his name
         """
-        if self.elements.__contains__(element):
-            return self.elements[element]
-        else:
-            return 0
+        return self.elements.get_number(element)
+
+    def get_element_registry(self) -> element.ElementRegistry:
+        """Return the properties of every map element
+
+        Returns:
+            element.ElementRegistry: properties of every map element
+        """
+        return self.elements
     
     def get_map_HEIGHT(self) -> int:
         """Return the height of the map
@@ -185,6 +222,14 @@ class Map:
         """
         return self.map_WIDTH
     
+    def get_minimap(self) -> minimap.Minimap:
+        """Return the cached 2D display of the map
+
+        Returns:
+            minimap.Minimap: cached 2D display of the map
+        """
+        return self.minimap
+
     def get_part(self, x: int, y: int) -> int:
         """Return the part at the x, y coordinates
 
@@ -195,26 +240,122 @@ class Map:
         Returns:
             int: elements at this coordinates
         """
-        return self.get_parts()[y][x]
+        return self.parts[y, x]
+
+    def get_parts_at(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Return the parts at many x, y coordinates at once
+
+        Args:
+            x (np.ndarray): x coordinates
+            y (np.ndarray): y coordinates
+
+        Returns:
+            np.ndarray: elements at these coordinates
+        """
+        return self.parts[y, x]
 
-    def get_parts(self) -> list:
-        """Return the 2D list of every parts
+    def get_parts(self):
+        """Return the 2D array of every parts (or agmff.TiledParts for a streamed map)
 
         Returns:
-            list: 2D list of every parts
+            2D array of every parts
         """
         return self.parts
+
+    def get_ray_size(self) -> tuple:
+        """Return the size of the map with the ray-cast convention, where the x pos is the first index of the parts (Map.get_part(y, x))
+
+        Returns:
+            tuple: number of x pos and of y pos inside the map
+        """
+        return (self.get_map_HEIGHT(), self.get_map_WIDTH())
+
+    def is_inside(self, x, y):
+        """Return if pos with the ray-cast convention are inside the map (see get_ray_size)
+
+        Args:
+            x: x pos of the parts (int or np.ndarray)
+            y: y pos of the parts (int or np.ndarray)
+
+        Returns:
+            if each pos is inside the map (bool or np.ndarray)
+        """
+        size = self.get_ray_size()
+        return (x >= 0) & (y >= 0) & (x < size[0]) & (y < size[1])
     
-    def get_parts_data(self, part: int) -> dict:
-        """Return the datas about a part of the map
+    def decode(self, path: str = "map.agmff") -> tuple:
+        """Decode a map file, without modifying the map (can be called from another thread)
 
         Args:
-            part (int): part to analyze
+            path (str, optional): path of the map to decode. Defaults to "map.agmff".
 
         Returns:
-            dict: datas about a part of the map
+            tuple: width of the map, height of the map and 2D array of every parts (memory-mapped for a raw map, agmff.TiledParts for a chunked map)
         """
-        return self.parts_data[part]
+        return agmff.load(path, self.tile_memory_budget)
+
+    def line_of_sight(self, x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray) -> tuple:
+        """Return if many segments are free of any blocking part, in one batch (grid traversal of every segment at once)
+
+        Args:
+            x0 (np.ndarray): x pos of the start of each segment (like the ray-cast, the x pos is the first index of the parts)
+            y0 (np.ndarray): y pos of the start of each segment
+            x1 (np.ndarray): x pos of the end of each segment
+            y1 (np.ndarray): y pos of the end of each segment
+
+        Returns:
+            tuple: for each segment, if the end is visible, and the x, y, part and distance of the first blocking part (-1 if visible)
+        """
+        x0, y0, x1, y1 = [np.ravel(a).astype(np.float64) for a in np.broadcast_arrays(x0, y0, x1, y1)]
+        transparent = ~self.get_element_registry().get_solid() # Same transparent parts as the ray-cast
+
+        count = len(x0)
+        visible = np.ones(count, np.bool_)
+        blocker_x = np.full(count, -1, np.int64)
+        blocker_y = np.full(count, -1, np.int64)
+        blocker_part = np.full(count, -1, np.int8)
+        blocker_distance = np.full(count, -1, np.float64)
+
+        dx, dy = x1 - x0, y1 - y0
+        length = np.hypot(dx, dy)
+        cell_x, cell_y = np.floor(x0).astype(np.int64), np.floor(y0).astype(np.int64)
+        end_x, end_y = np.floor(x1).astype(np.int64), np.floor(y1).astype(np.int64)
+        step_x, step_y = np.sign(dx).astype(np.int64), np.sign(dy).astype(np.int64)
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            delta_x = np.where(dx != 0, np.abs(1 / dx), np.inf) # Part of the segment to cross a part
+            delta_y = np.where(dy != 0, np.abs(1 / dy), np.inf)
+            next_x = np.where(dx != 0, (cell_x + (step_x > 0) - x0) / dx, np.inf) # Part of the segment to reach the next part
+            next_y = np.where(dy != 0, (cell_y + (step_y > 0) - y0) / dy, np.inf)
+
+        active = np.flatnonzero((cell_x != end_x) | (cell_y != end_y))
+        while len(active) > 0: # Cross one part with every active segment
+            horizontal = next_x[active] < next_y[active]
+            corner = next_x[active] == next_y[active] # Through the corner of 4 parts, touching the parts on both sides
+            entry = np.minimum(next_x[active], next_y[active])
+            cell_x[active] += np.where(horizontal | corner, step_x[active], 0)
+            cell_y[active] += np.where(horizontal, 0, step_y[active])
+            next_x[active] += np.where(horizontal | corner, delta_x[active], 0)
+            next_y[active] += np.where(horizontal, 0, delta_y[active])
+
+            x, y = cell_x[active], cell_y[active]
+            arrived = ((x == end_x[active]) & (y == end_y[active])) | (entry >= 1)
+            blocked = np.zeros(len(active), np.bool_)
+            for part_x, part_y, touched in ((x - step_x[active], y, corner), (x, y - step_y[active], corner), (x, y, True)): # Parts on both sides of a corner, then the part entered
+                checked = np.flatnonzero(touched & ~blocked & (entry < 1) & ((part_x != end_x[active]) | (part_y != end_y[active])) & self.is_inside(part_x, part_y))
+                parts = self.get_parts_at(part_y[checked], part_x[checked]) # The x pos is the first index of the parts, like the ray-cast
+                solid = ~transparent[parts.view(np.uint8)]
+                checked = checked[solid]
+                blocked[checked] = True
+
+                segments = active[checked]
+                visible[segments] = False
+                blocker_x[segments], blocker_y[segments] = part_x[checked], part_y[checked]
+                blocker_part[segments] = parts[solid]
+                blocker_distance[segments] = entry[checked] * length[segments]
+
+            active = active[~(arrived | ~self.is_inside(x, y) | blocked)]
+
+        return visible, blocker_x, blocker_y, blocker_part, blocker_distance
 
     def load(self, path: str = "map.agmff") -> None:
         """Load the map
@@ -222,33 +363,75 @@ class Map:
         Args:
             path (str, optional): path of the map to load. Defaults to "map.agmff".
         """
-        file = open(path, "rb") # Open the map file
-        content = file.read()
-        file.close() # Close the file
+        self.set_parts(*self.decode(path))
 
-        map_width = struct.unpack("H", content[:2])[0] # Read the width of the map
-        map_height = struct.unpack("H", content[2:4])[0] # Read the height of the map
+    def prepare(self, map_width: int, map_height: int, parts) -> list:
+        """Build every structure of a new map before it is swapped in (can be called from another thread)
+
+        Args:
+            map_width (int): width of the new map
+            map_height (int): height of the new map
+            parts: 2D array of every parts of the new map (or agmff.TiledParts)
+
+        Returns:
+            list: (install function, built structure) of each builder, to give to set_parts
+        """
+        return [(install, build(map_width, map_height, parts)) for build, install in self.builders]
+
+    def set_part(self, x: int, y: int, part: int) -> None:
+        """Change the part at the x, y coordinates
+
+        Args:
+            x (int): x coordinates
+            y (int): y coordinates
+            part (int): new part at this coordinates
+        """
+        if x < 0 or y < 0 or x >= self.get_map_WIDTH() or y >= self.get_map_HEIGHT(): raise IndexError("part out of the map")
+        self.parts[y, x] = part
+        self.dirty_regions.append((x, y, 1, 1))
+
+    def set_region(self, x: int, y: int, width: int, height: int, parts) -> None:
+        """Change every part of a region, clipped to the map
+
+        Args:
+            x (int): x coordinates of the region
+            y (int): y coordinates of the region
+            width (int): width of the region
+            height (int): height of the region
+            parts: new part of the whole region, or 2D array (height * width) of the new parts
+        """
+        parts = np.asarray(parts, np.int8)
+        if parts.ndim == 2: # Clip the new parts with the region
+            parts = parts[max(-y, 0):, max(-x, 0):]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, self.get_map_WIDTH()), min(y + height, self.get_map_HEIGHT())
+        if x1 <= x0 or y1 <= y0: return
+
+        self.parts[y0:y1, x0:x1] = parts if parts.ndim == 0 else parts[:y1 - y0, :x1 - x0]
+        self.dirty_regions.append((x0, y0, x1 - x0, y1 - y0))
+
+    def set_parts(self, map_width: int, map_height: int, parts: list, prepared: list = None) -> None:
+        """Swap the content of the map with new parts
+
+        Args:
+            map_width (int): width of the new map
+            map_height (int): height of the new map
+            parts: 2D array of every parts of the new map (or agmff.TiledParts)
+            prepared (list, optional): structures built by prepare for these parts, installed with the parts. Defaults to None.
+        """
+        if isinstance(self.parts, agmff.TiledParts) and self.parts is not parts: self.parts.close() # Close the last streamed map
 
         self.map_HEIGHT = map_height # Defines the const size
         self.map_WIDTH = map_width
+        self.parts = parts
 
-        start = 4
-        total_size = 0
-        while total_size < map_width * map_height: # While we haven't found the total number of map parts
-            number = struct.unpack("I", content[start: start + 4])[0]
-            element = struct.unpack("b", content[start + 4: start + 5])[0]
-
-            current_list = [] # Create the current list to add ther parts ...
-            if len(self.get_parts()) > 0: # Or get the last list in the parts if not completed
-                current_list = self.get_parts()[-1]
-            else:
-                self.get_parts().append(current_list)
-
-            for i in range(number): # Add all the elements
-                if len(current_list) >= map_width:
-                    current_list = []
-                    self.get_parts().append(current_list)
-                current_list.append(element)
-
-            start += 5
-            total_size += number
\ No newline at end of file
+        self.dirty_regions = [(0, 0, map_width, map_height)] # The whole map changed
+        for install, structure in prepared or (): install(structure)
+
+    def subscribe(self, subscriber) -> None:
+        """Add a function called with each (x, y, width, height) region of the map changed, when the changes are flushed
+
+        Args:
+            subscriber: function to call with a changed region
+        """
+        self.subscribers.append(subscriber)
@@ -0,0 +1,101 @@
+# Minimap.py
+#
+# ---------------- File used to display the minimap ---------------
+# Contains the Minimap class to display the map in 2D.
+# The Minimap class provides a cached surface of the map, built with
+# a palette lookup table and only updated where the map changes, with
+# the parts hidden from the turret darkened (fog of war).
+#
+
+# Import all necessary library
+import math
+import numpy as np
+import pygame
+
+class Minimap:
+    """Class used to display a map in 2D
+    """
+
+    def __init__(self, map_to_display, max_size: int = 1024) -> None:
+        """Construct a minimap
+
+        Args:
+            map_to_display (map.Map): map displayed by the minimap
+            max_size (int, optional): maximum width and height of the minimap surface, bigger maps are sampled. Defaults to 1024.
+        """
+        self.dirty_regions = [] # List of every (x, y, width, height) region of the map to update
+        self.fog = None # Visibility field darkening the hidden parts, or None
+        self.map = map_to_display
+        self.max_size = max_size
+        self.palette = map_to_display.get_element_registry().get_palette() # Color of each part, indexed by the byte of the part
+        self.scaled_surface = None # Last scaled surface returned
+        self.step = 1 # Number of map parts by minimap pixel
+        self.surface = None # Surface of the minimap, one pixel by sampled part
+
+    def get_map(self):
+        """Return the map displayed by the minimap
+
+        Returns:
+            map.Map: map displayed by the minimap
+        """
+        return self.map
+
+    def get_scaled_surface(self, size: tuple) -> pygame.Surface:
+        """Return the minimap scaled to a size, only scaled again if the map changed
+
+        Args:
+            size (tuple): size of the scaled surface
+
+        Returns:
+            pygame.Surface: scaled minimap
+        """
+        if self.scaled_surface is None or len(self.dirty_regions) > 0 or self.scaled_surface.get_size() != tuple(size):
+            self.scaled_surface = pygame.transform.scale(self.get_surface(), size)
+        return self.scaled_surface
+
+    def get_surface(self) -> pygame.Surface:
+        """Return the minimap surface, with the changed regions updated
+
+        Returns:
+            pygame.Surface: minimap surface
+        """
+        map_size = (self.get_map().get_map_WIDTH(), self.get_map().get_map_HEIGHT())
+        step = max(1, math.ceil(max(map_size) / self.max_size))
+        surface_size = (math.ceil(map_size[0] / step), math.ceil(map_size[1] / step))
+
+        if self.surface is None or self.surface.get_size() != surface_size or self.step != step: # Build the whole minimap
+            self.step = step
+            self.surface = pygame.Surface(surface_size)
+            self.dirty_regions = [(0, 0, map_size[0], map_size[1])]
+
+        fog = self.fog is not None and self.fog.get_distances().shape == (map_size[1], map_size[0]) # If the parts hidden from the turret are darkened
+        for x, y, width, height in self.dirty_regions: # Update each changed region
+            x0, y0 = max(x, 0) // step, max(y, 0) // step
+            x1, y1 = min(math.ceil((x + width) / step), surface_size[0]), min(math.ceil((y + height) / step), surface_size[1])
+            if x1 <= x0 or y1 <= y0: continue
+            rows, columns = slice(y0 * step, y1 * step, step), slice(x0 * step, x1 * step, step) # Only the sampled parts of the region are read
+            parts = np.asarray(self.get_map().get_parts()[rows, columns])
+            colors = self.palette[parts.view(np.uint8)]
+            if fog: colors[~self.fog.get_visible_region(rows, columns)] //= 3
+            pygame.surfarray.blit_array(self.surface.subsurface((x0, y0, x1 - x0, y1 - y0)), colors.transpose(1, 0, 2))
+        self.dirty_regions.clear()
+
+        return self.surface
+
+    def invalidate(self, region: tuple = None) -> None:
+        """Mark a region of the map as changed
+
+        Args:
+            region (tuple, optional): (x, y, width, height) region of the map changed. Defaults to the whole map.
+        """
+        if region is None: region = (0, 0, self.get_map().get_map_WIDTH(), self.get_map().get_map_HEIGHT())
+        self.dirty_regions.append(region)
+
+    def set_fog(self, fog) -> None:
+        """Darken the parts hidden from the turret
+
+        Args:
+            fog (visibility.VisibilityField): visibility field of the turret, or None to show every part
+        """
+        self.fog = fog
+        self.invalidate()
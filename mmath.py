@@ -2,12 +2,13 @@
 #
 # -------------------- File used to do some math ------------------
 # Contains some math functions.
-#
-#
+# Each function has a variant working on NumPy arrays, with the same
+# semantics, to be shared by the batched code.
 #
 
 # Import all necessary library
 import math
+import numpy as np
 
 def direction_vector_from_radian(radian: float) -> tuple:
     """Return the direction vector with a norm of 1, with an radian
@@ -20,6 +21,17 @@ def direction_vector_from_radian(radian: float) -> tuple:
     """
     return (math.cos(radian), math.sin(radian))
 
+def direction_vectors_from_radians(radians: np.ndarray) -> tuple:
+    """Return the direction vectors with a norm of 1, with many radians
+
+    Args:
+        radians (np.ndarray): radians to test, same as trigonometrical circle
+
+    Returns:
+        tuple: x and y arrays of the direction vectors
+    """
+    return np.cos(radians), np.sin(radians)
+
 def direction_vector(angle: float) -> tuple:
     """Return the direction vector with a norm of 1, with an angle
 
@@ -31,6 +43,17 @@ def direction_vector(angle: float) -> tuple:
     """
     return direction_vector_from_radian((angle/180)*math.pi)
 
+def direction_vectors(angles: np.ndarray) -> tuple:
+    """Return the direction vectors with a norm of 1, with many angles
+
+    Args:
+        angles (np.ndarray): angles to test, same as trigonometrical circle
+
+    Returns:
+        tuple: x and y arrays of the direction vectors
+    """
+    return direction_vectors_from_radians(np.radians(angles))
+
 def distance2D(x0: float, y0: float, x1: float, y1: float) -> float:
     """Return the distance between 2 point
 
@@ -45,6 +68,20 @@ def distance2D(x0: float, y0: float, x1: float, y1: float) -> float:
     """
     return math.sqrt(pow(x1 - x0, 2) + pow(y1 - y0, 2))
 
+def distances2D(x0: np.ndarray, y0: np.ndarray, x1: np.ndarray, y1: np.ndarray) -> np.ndarray:
+    """Return the distances between many couples of points
+
+    Args:
+        x0 (np.ndarray): x pos of the first points
+        y0 (np.ndarray): y pos of the first points
+        x1 (np.ndarray): x pos of the second points
+        y1 (np.ndarray): y pos of the second points
+
+    Returns:
+        np.ndarray: distance between each couple of points
+    """
+    return np.hypot(np.subtract(x1, x0), np.subtract(y1, y0))
+
 def normalize_angle(angle: float) -> float:
     """Return the angle normalized (between 360 and 0)
 
@@ -54,9 +91,22 @@ def normalize_angle(angle: float) -> float:
     Returns:
         float: angle normalized
     """
-    while angle < 0: angle += 360
-    while angle > 360: angle -= 360
-    return angle
+    normalized = angle % 360
+    if normalized == 0 and angle > 0: return 360 # A positive full turn stays 360
+    return normalized
+
+def normalize_angles(angles: np.ndarray) -> np.ndarray:
+    """Return the angles normalized (between 360 and 0)
+
+    Args:
+        angles (np.ndarray): angles normalized
+
+    Returns:
+        np.ndarray: angles normalized
+    """
+    angles = np.asarray(angles)
+    normalized = angles % 360
+    return np.where((normalized == 0) & (angles > 0), 360, normalized) # A positive full turn stays 360
 
 def vector_with_one_as_a_part(vector: tuple) -> tuple:
     """Take the vector and put his bigger coordinates to 1
@@ -72,4 +122,20 @@ def vector_with_one_as_a_part(vector: tuple) -> tuple:
     x_to_y = abs(vector[0]) / abs(vector[1])
     if x_to_y < 0:
         return vector[0] * (1/abs(vector[0])), vector[1] * (1/abs(vector[0]))
-    return vector[0] * (1/abs(vector[1])), vector[1] * (1/abs(vector[1]))
\ No newline at end of file
+    return vector[0] * (1/abs(vector[1])), vector[1] * (1/abs(vector[1]))
+
+def vectors_with_one_as_a_part(x: np.ndarray, y: np.ndarray) -> tuple:
+    """Take many vectors and put their bigger coordinates to 1
+
+    Args:
+        x (np.ndarray): x of the vectors to modify
+        y (np.ndarray): y of the vectors to modify
+
+    Returns:
+        tuple: x and y arrays of the final vectors
+    """
+    x, y = np.broadcast_arrays(np.asarray(x, np.float64), np.asarray(y, np.float64))
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        final_x = np.where(y == 0, 1, np.where(x == 0, 0, x / np.abs(y)))
+        final_y = np.where(y == 0, 0, np.where(x == 0, 1, y / np.abs(y)))
+    return final_x, final_y
@@ -0,0 +1,306 @@
+# Pathfinding.py
+#
+# ------------- File used to find paths into the map ---------------
+# Contains the FlowField class to guide vehicles toward goals.
+# The FlowField class provides an integration field and a direction
+# field, repaired only where the map changes.
+# Contains the Pathfinding class to share the flow fields.
+#
+
+# Import all necessary library
+import numpy as np
+
+INFINITE = np.iinfo(np.int32).max # Integration of a part which can't reach the goals
+NEIGHBOURS = ((1, 0, 2), (1, -1, 3), (0, -1, 2), (-1, -1, 3), (-1, 0, 2), (-1, 1, 3), (0, 1, 2), (1, 1, 3)) # Offset of each neighbour (like the trigonometrical circle) with its cost
+
+class FlowField:
+    """Class used to guide vehicles toward goals
+    """
+
+    def __init__(self, game, goals, parts = None) -> None:
+        """Construct a flow field, computed on the whole map
+
+        Args:
+            game: main game object
+            goals: list of (x, y) pos of the goals
+            parts (optional): 2D array of every parts the field is computed on. Defaults to the parts of the map.
+        """
+        self.game = game
+
+        self.direction = None # Index of the neighbour to go to from each part, or -1
+        self.goals = np.array(goals, np.int64).reshape(-1, 2) # Pos of each goal
+        self.integration = None # Cost to reach the nearest goal from each part
+        self.offsets = () # Offset of each neighbour in the flat padded arrays
+        self.padded_integration = None # Integration with a border of unreachable parts, so neighbours never leave the arrays
+        self.padded_walkable = None # Walkable parts with a border of unwalkable parts
+        self.walkable = None # If a vehicle can go on each part
+
+        self.compute(parts)
+
+    def compute(self, parts = None) -> None:
+        """Compute the whole flow field
+
+        Args:
+            parts (optional): 2D array of every parts. Defaults to the parts of the map.
+        """
+        self.padded_walkable = np.pad(self.get_walkable((slice(None), slice(None)), parts), 1)
+        self.padded_integration = np.full(self.padded_walkable.shape, INFINITE, np.int32)
+        self.walkable = self.padded_walkable[1:-1, 1:-1]
+        self.integration = self.padded_integration[1:-1, 1:-1]
+        self.direction = np.full(self.walkable.shape, -1, np.int8)
+        self.offsets = tuple(offset_x * self.padded_walkable.shape[1] + offset_y for offset_x, offset_y, cost in NEIGHBOURS)
+
+        changed = self.propagate(self.seed_goals(np.ones(self.walkable.shape, np.bool_)))
+        self.compute_direction(changed)
+
+    def compute_direction(self, changed: np.ndarray) -> None:
+        """Compute the direction field around changed parts
+
+        Args:
+            changed (np.ndarray): flat index of the changed parts (in the padded arrays)
+        """
+        if len(changed) == 0: return
+        x, y = np.unravel_index(changed, self.padded_integration.shape)
+        x0, x1 = max(int(x.min()) - 1, 1), min(int(x.max()) + 2, self.padded_integration.shape[0] - 1) # Each neighbour of a changed part may change too
+        y0, y1 = max(int(y.min()) - 1, 1), min(int(y.max()) + 2, self.padded_integration.shape[1] - 1)
+
+        integration = self.padded_integration
+        walkable = self.padded_walkable
+        costs = np.empty((len(NEIGHBOURS), x1 - x0, y1 - y0), np.int64)
+        for i, (offset_x, offset_y, cost) in enumerate(NEIGHBOURS): # Integration of each neighbour
+            costs[i] = integration[x0 + offset_x:x1 + offset_x, y0 + offset_y:y1 + offset_y]
+            if offset_x != 0 and offset_y != 0: # Never cut a corner
+                costs[i][~(walkable[x0 + offset_x:x1 + offset_x, y0:y1] & walkable[x0:x1, y0 + offset_y:y1 + offset_y])] = INFINITE
+
+        direction = np.argmin(costs, 0).astype(np.int8)
+        best = np.min(costs, 0)
+        direction[(best >= integration[x0:x1, y0:y1]) | (best == INFINITE) | ~walkable[x0:x1, y0:y1]] = -1 # Goals and unreachable parts have no direction
+        self.direction[x0 - 1:x1 - 1, y0 - 1:y1 - 1] = direction
+
+    def get_direction_vectors(self, x: np.ndarray, y: np.ndarray) -> tuple:
+        """Return the direction to follow from many pos, with one lookup
+
+        Args:
+            x (np.ndarray): x pos of each vehicle
+            y (np.ndarray): y pos of each vehicle
+
+        Returns:
+            tuple: x and y of the unit direction vector of each vehicle (0 if there is no direction)
+        """
+        offsets = np.array([(0, 0)] + [(offset_x, offset_y) for offset_x, offset_y, cost in NEIGHBOURS], np.float32)
+        offsets[1:] /= np.hypot(offsets[1:, 0], offsets[1:, 1])[:, None]
+        part_x = np.clip(np.floor(x).astype(np.int64), 0, self.direction.shape[0] - 1)
+        part_y = np.clip(np.floor(y).astype(np.int64), 0, self.direction.shape[1] - 1)
+        vectors = offsets[self.direction[part_x, part_y].astype(np.int64) + 1]
+        return vectors[:, 0], vectors[:, 1]
+
+    def get_headings(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Return the angle to follow from many pos (like the trigonometrical circle), with one lookup
+
+        Args:
+            x (np.ndarray): x pos of each vehicle
+            y (np.ndarray): y pos of each vehicle
+
+        Returns:
+            np.ndarray: angle to follow of each vehicle, or NaN if there is no direction
+        """
+        direction_x, direction_y = self.get_direction_vectors(x, y)
+        headings = np.degrees(np.arctan2(-direction_y, direction_x)) % 360 # Same direction as the ray-cast
+        headings[(direction_x == 0) & (direction_y == 0)] = np.nan
+        return headings
+
+    def get_walkable(self, region: tuple, parts = None) -> np.ndarray:
+        """Return if a vehicle can go on the parts of a region
+
+        Args:
+            region (tuple): slices of the region (first index is x, like the ray-cast)
+            parts (optional): 2D array of every parts. Defaults to the parts of the map.
+
+        Returns:
+            np.ndarray: if a vehicle can go on each part
+        """
+        if parts is None: parts = self.game.get_map().get_parts()
+        return ~self.game.get_map().get_element_registry().get_solid()[np.asarray(parts[region])] # Same obstacles as the moves of the vehicles
+
+    def install(self, flow_field) -> None:
+        """Take the arrays of a flow field toward the same goals, computed on the parts of a new map
+
+        Args:
+            flow_field (FlowField): flow field computed on the new parts
+        """
+        self.direction = flow_field.direction
+        self.integration = flow_field.integration
+        self.offsets = flow_field.offsets
+        self.padded_integration = flow_field.padded_integration
+        self.padded_walkable = flow_field.padded_walkable
+        self.walkable = flow_field.walkable
+
+    def neighbours(self, cells: np.ndarray, index: int) -> tuple:
+        """Return a neighbour of parts
+
+        Args:
+            cells (np.ndarray): flat index of the parts (in the padded arrays, never on the border)
+            index (int): index of the neighbour into NEIGHBOURS
+
+        Returns:
+            tuple: flat index of the neighbours, and mask of the parts allowed to go to this neighbour
+        """
+        neighbours = cells + self.offsets[index]
+        offset_x, offset_y, cost = NEIGHBOURS[index]
+        if offset_x != 0 and offset_y != 0: # Never cut a corner
+            walkable = self.padded_walkable.ravel()
+            return neighbours, walkable[cells + self.offsets[index] - offset_y] & walkable[cells + offset_y]
+        return neighbours, np.ones(len(cells), np.bool_)
+
+    def propagate(self, seeds: np.ndarray) -> np.ndarray:
+        """Propagate the integration from parts, only where it decreases (bucketed Dijkstra)
+
+        Args:
+            seeds (np.ndarray): flat index of the parts to propagate from (in the padded arrays)
+
+        Returns:
+            np.ndarray: flat index of every part whose integration changed (with the seeds)
+        """
+        integration = self.padded_integration.ravel()
+        walkable = self.padded_walkable.ravel()
+        buckets = {}
+        for d in np.unique(integration[seeds]):
+            buckets[int(d)] = [seeds[integration[seeds] == d]]
+
+        changed = [seeds]
+        while len(buckets) > 0: # Browse the parts by increasing cost
+            d = min(buckets)
+            cells = np.unique(np.concatenate(buckets.pop(d)))
+            cells = cells[integration[cells] == d] # Remove the parts reached again with a lower cost
+            if len(cells) == 0: continue
+
+            for i in range(len(NEIGHBOURS)):
+                neighbours, valid = self.neighbours(cells, i)
+                new_cost = d + NEIGHBOURS[i][2]
+                neighbours = neighbours[valid & walkable[neighbours] & (integration[neighbours] > new_cost)]
+                if len(neighbours) == 0: continue
+                integration[neighbours] = new_cost
+                buckets.setdefault(new_cost, []).append(neighbours)
+                changed.append(neighbours)
+        return np.unique(np.concatenate(changed))
+
+    def repair(self, region: tuple) -> None:
+        """Repair the flow field after a change of the map
+
+        Args:
+            region (tuple): (x, y, width, height) region of the map changed (x, y like Map.get_part)
+        """
+        x, y, width, height = region
+        if self.integration.shape != (self.game.get_map().get_map_HEIGHT(), self.game.get_map().get_map_WIDTH()):
+            self.compute() # Another map
+            return
+
+        rows = (slice(y, y + height), slice(x, x + width)) # Map.get_part(x, y) is the part [y, x]
+        walkable = self.get_walkable(rows)
+        if np.array_equal(walkable, self.walkable[rows]): return # Nothing changed for the vehicles (like a map swapped in with its field already computed)
+        if width * height >= self.integration.size:
+            self.compute() # The whole map changed
+            return
+        self.walkable[rows] = walkable
+
+        invalid = np.zeros(self.padded_integration.shape, np.bool_) # Parts whose integration may increase
+        invalid[1:-1, 1:-1][rows] = True
+        flat_invalid = invalid.ravel()
+        integration = self.padded_integration.ravel()
+        frontier = np.flatnonzero(flat_invalid)
+        while len(frontier) > 0: # Invalidate every part only reaching the goals through invalid parts
+            candidates = np.unique(np.concatenate([frontier + offset for offset in self.offsets]))
+            candidates = candidates[~flat_invalid[candidates] & (integration[candidates] != INFINITE) & (integration[candidates] > 0)]
+
+            supported = np.zeros(len(candidates), np.bool_)
+            for i in range(len(NEIGHBOURS)):
+                neighbours, valid = self.neighbours(candidates, i)
+                supported |= valid & ~flat_invalid[neighbours] & (integration[neighbours].astype(np.int64) + NEIGHBOURS[i][2] == integration[candidates])
+            frontier = candidates[~supported]
+            flat_invalid[frontier] = True
+
+        invalid_cells = np.flatnonzero(flat_invalid)
+        integration[invalid_cells] = INFINITE
+        seeds = [self.seed_goals(invalid[1:-1, 1:-1])]
+        for offset in self.offsets: # Propagate again from the valid parts around
+            neighbours = invalid_cells + offset
+            seeds.append(neighbours[~flat_invalid[neighbours] & (integration[neighbours] != INFINITE)])
+        seeds = np.unique(np.concatenate(seeds))
+
+        self.compute_direction(np.unique(np.concatenate((invalid_cells, self.propagate(seeds)))))
+
+    def seed_goals(self, mask: np.ndarray) -> np.ndarray:
+        """Set the integration of the walkable goals inside a mask to 0
+
+        Args:
+            mask (np.ndarray): parts where the goals are seeded
+
+        Returns:
+            np.ndarray: flat index of the seeded goals (in the padded arrays)
+        """
+        goals = self.goals[(self.goals[:, 0] >= 0) & (self.goals[:, 1] >= 0) & (self.goals[:, 0] < self.integration.shape[0]) & (self.goals[:, 1] < self.integration.shape[1])]
+        goals = goals[mask[goals[:, 0], goals[:, 1]] & self.walkable[goals[:, 0], goals[:, 1]]]
+        self.integration[goals[:, 0], goals[:, 1]] = 0
+        return np.ravel_multi_index((goals[:, 0] + 1, goals[:, 1] + 1), self.padded_integration.shape)
+
+class Pathfinding:
+    """Class used to share the flow fields between every vehicle
+    """
+
+    def __init__(self, game) -> None:
+        """Construct a pathfinding service, repairing its flow fields when the map changes
+
+        Args:
+            game: main game object
+        """
+        self.game = game
+
+        self.flow_fields = {} # Every flow field computed, by goals
+
+        self.game.get_map().subscribe(self.repair)
+        self.game.get_map().add_builder(self.build, self.install)
+
+    def build(self, map_width: int, map_height: int, parts) -> dict:
+        """Compute every flow field on the parts of a new map, without modifying them (can be called from another thread)
+
+        Args:
+            map_width (int): width of the map
+            map_height (int): height of the map
+            parts: 2D array of every parts (or agmff.TiledParts)
+
+        Returns:
+            dict: flow field computed on the new parts, by goals
+        """
+        return {key: FlowField(self.game, key, parts) for key in list(self.flow_fields)}
+
+    def get_flow_field(self, goals) -> FlowField:
+        """Return the flow field toward goals, only computed the first time
+
+        Args:
+            goals: list of (x, y) pos of the goals
+
+        Returns:
+            FlowField: flow field toward the goals
+        """
+        key = tuple(sorted((int(x), int(y)) for x, y in goals))
+        if key not in self.flow_fields:
+            self.flow_fields[key] = FlowField(self.game, key)
+        return self.flow_fields[key]
+
+    def install(self, flow_fields: dict) -> None:
+        """Install the flow fields computed by build, the vehicles keep following the same objects
+
+        Args:
+            flow_fields (dict): flow field computed on the new parts, by goals
+        """
+        for key, flow_field in flow_fields.items():
+            if key in self.flow_fields: self.flow_fields[key].install(flow_field)
+
+    def repair(self, region: tuple) -> None:
+        """Repair every flow field after a change of the map
+
+        Args:
+            region (tuple): (x, y, width, height) region of the map changed
+        """
+        for flow_field in self.flow_fields.values():
+            flow_field.repair(region)
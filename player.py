@@ -9,9 +9,12 @@
 # Import all necessary library
 import math
 import mmath
+import numpy as np
 import pygame
 import random
+import raycast
 import struct
+import texture
 
 class Player:
     """Class used to handle the player behavior
@@ -25,6 +28,7 @@ class Player:
         """
         self.game = game
 
+        self.base_pos = (math.ceil(self.game.get_map().get_ray_size()[0] / 2), math.ceil(self.game.get_map().get_ray_size()[1] / 2)) # Pos of the player tank, where the rays start (center of the map with the ray-cast convention)
         self.binoculars = 0 # Surface of a binocular effect
         self.commander_view_angle = 0 # Angle of the commander view (like the trigonometrical circle)
         self.commander_view_elevation = 0
@@ -35,14 +39,28 @@ class Player:
         self.commander_view_rotation_speed = 180 # Number of angle the commander view turn by seconds
         self.floor_offset = game.get_map().get_map_HEIGHT() // 2
         self.fov = 45
+        self.max_layers = 6 # Maximum number of hits collected by a ray
+        self.ray_cache = {} # Hits of each ray-cast already done, by index of its angle on the rays grid (the player tank never moves)
+        self.ray_cache_y_offset = None # Y offset used by the ray-casts of the cache (their early termination depends on it)
+        self.raycast_backend = raycast.get_backend() # Implementation of the multi-layer ray-cast
         self.screen_distance = (math.ceil(self.game.get_map().get_map_WIDTH() / 2) / math.tan(math.radians(self.get_fov() / 2)))
         self.shooter_view_fov = 10 # FOV of the shooter viewn
+        self.ray_angle_step = min(self.get_commander_view_fov(), self.get_shooter_view_fov()) / 255 # Angle between two rays of the grid shared by every view, as fine as the narrowest view
         self.turret_angle = 0 # Angle of the player (like the trigonometrical circle)
         self.turret_rotation_speed = 60 # Number of angle the turret turn by seconds
         self.view = 0 # Current view of the player
         self.y_offset = 1 # Offset of the y
 
         self.generate_binoculars()
+        self.game.get_map().subscribe(self.invalidate_rays)
+
+    def fire(self) -> int:
+        """Fire a shell along the turret angle
+
+        Returns:
+            int: index of the fired shell in the ballistics simulation
+        """
+        return self.game.get_ballistics().fire(self.get_turret_angle())
 
     def generate_binoculars(self) -> None:
         """Generate a binoculars surface
@@ -142,6 +160,14 @@ class Player:
         """
         return self.fov
     
+    def get_raycast_backend(self) -> raycast.RaycastBackend:
+        """Return the implementation of the multi-layer ray-cast
+
+        Returns:
+            raycast.RaycastBackend: implementation of the multi-layer ray-cast
+        """
+        return self.raycast_backend
+
     def get_screen_distance(self) -> float:
         """Return the distance of the projection screen from the player
 
@@ -190,13 +216,42 @@ class Player:
         """
         return self.y_offset
     
-    def projection3D(self) -> pygame.Surface:
+    def invalidate_rays(self, region: tuple = None) -> None:
+        """Remove the ray-casts which may cross a changed region of the map from the rays cache
+
+        Args:
+            region (tuple, optional): (x, y, width, height) region of the map changed (x, y like Map.get_part). Defaults to the whole map.
+        """
+        map_size = self.game.get_map().get_ray_size() # The x pos is the first index of the parts
+        base_pos = (math.ceil(map_size[0] / 2), math.ceil(map_size[1] / 2)) # Same pos as the ray-cast
+        if region is None or (region[1] <= base_pos[0] + 1 and base_pos[0] - 1 <= region[1] + region[3] and region[0] <= base_pos[1] + 1 and base_pos[1] - 1 <= region[0] + region[2]):
+            self.ray_cache.clear() # Every ray may cross the region
+            return
+
+        x, y, width, height = region # The ray-cast reads Map.get_part(y, x) with rounded pos, so the region is transposed and grown by one part
+        corners = [(x_corner, y_corner) for x_corner in (y - 1, y + height + 1) for y_corner in (x - 1, x + width + 1)]
+        angles = [math.degrees(math.atan2(-(y_corner - base_pos[1]), x_corner - base_pos[0])) for x_corner, y_corner in corners]
+        middle = angles[0]
+        differences = [(a - middle + 180) % 360 - 180 for a in angles]
+        low, high = min(differences) - 2 * self.ray_angle_step, max(differences) + 2 * self.ray_angle_step
+        for index in list(self.ray_cache): # Only the rays inside the angular range of the region may cross it
+            if low <= (index * self.ray_angle_step - middle + 180) % 360 - 180 <= high: del self.ray_cache[index]
+
+    def projection3D(self, angle: float = None, view: int = None) -> pygame.Surface:
         """Return a pygame surface with the 3D projection on it
 
+        Args:
+            angle (float, optional): angle of the view (like the trigonometrical circle). Defaults to the commander view angle.
+            view (int, optional): view rendered (0 for the commander view, 1 for the shooter view). Defaults to the current view.
+
         Returns:
             pygame.Surface: surface with the 3D projection on it
         """
-        raycast = self.ray_cast_commander_view() # Do the raycast for the commander view
+        view_angle = self.get_commander_view_angle() if angle is None else angle # The name angle is used by each ray below
+        if view is None: view = self.get_view()
+        fov = self.get_shooter_view_fov() if view == 1 else self.get_commander_view_fov()
+        zoom = self.get_commander_view_fov() / fov # Zoom of the view compared to the commander view
+        hits = self.ray_cast_view(view_angle, fov) # Do the multi-layer raycast for the view, sharing the rays already cast
         map_size = (self.game.get_map().get_map_WIDTH(), self.game.get_map().get_map_HEIGHT())
         floor_offset = map_size[0] - self.get_floor_offset() # Get the offset of the floor
         screen_size = (self.game.get_SCREEN_WIDTH(), self.game.get_SCREEN_HEIGHT())
@@ -205,130 +260,94 @@ class Player:
         pygame.draw.rect(surface_to_return, (0, 0, 255), (0, 0, map_size[0], map_size[1]))
         pygame.draw.rect(surface_to_return, (0, 255, 0), (0, floor_offset, map_size[0], map_size[1] - floor_offset))
 
-        raycast = sorted(raycast, key = lambda x: x[0])[::-1] # Sort ray by distance from the player
-
-        sprites = self.game.get_sprites()
-        sprites_angles = {}
-        sprites_length = {}
-        for s in sprites: # Calculate how to display the sprite
-            angle = mmath.normalize_angle(math.degrees(math.atan(abs(self.get_base_pos()[0] - s.get_pos()[0]) / abs(self.get_base_pos()[1] - s.get_pos()[1]))))
-            if angle > 270: angle = 360 - angle
-            elif angle > 180: angle += 180
-            elif angle > 90: angle = 180 - angle
-            sprites_angles[s] = angle + 180
-            sprites_length[s] = mmath.distance2D(self.get_base_pos()[0], self.get_base_pos()[1], s.get_pos()[0], s.get_pos()[1])
-
-        i = 0
-        scale = math.ceil(map_size[0] / len(raycast))
-        game_surface = pygame.Surface((map_size[0], map_size[1]), pygame.SRCALPHA)
-        for r in raycast: # Calculate with each raycast
-            length = r[0]
-            pos = r[1]
-            part = r[2]
-            side = r[3]
-            angle = r[4]
-            side_purcentage = r[5]
-            side_length = r[6]
-            i = r[-1]
-
-            sprite_length = -1
-            
-            sprites_displayed = 0
-            visibles_sprites = 0
-            for s in sprites: # Calculate if the sprite should be displayed and how
-                angle_sprite = mmath.normalize_angle(sprites_angles[s])
-                length_sprite = sprites_length[s]
-                fov_sprites = math.degrees(math.atan((s.get_length() / 2) / length_sprite))
-                if sprite_length > length_sprite or sprite_length == -1:
-                    if angle > mmath.normalize_angle(angle_sprite - fov_sprites) and angle < mmath.normalize_angle(angle_sprite + fov_sprites): # If the sprite is on the angle
-                        sprites_displayed = abs(angle - (angle_sprite - fov_sprites)) / (fov_sprites * 2)
-                        visibles_sprites = s
-                        sprite_length = length_sprite
-                    elif mmath.normalize_angle(angle_sprite + fov_sprites) < mmath.normalize_angle(angle_sprite - fov_sprites) and (angle < mmath.normalize_angle(angle_sprite + fov_sprites) or angle > mmath.normalize_angle(angle_sprite - fov_sprites)): # If the sprite is on the angle (other way)
-                        sprites_displayed = mmath.normalize_angle(angle - (angle_sprite - fov_sprites)) / (fov_sprites * 2)
-                        visibles_sprites = s
-                        sprite_length = length_sprite
-
-            if sprite_length > length:
-                if visibles_sprites != 0: # Draw a sprites if necessary
-                    height = (self.get_screen_distance() / (sprite_length + 0.000001)) # Calculate the projection height
-                    final_height = height * visibles_sprites.get_height() * (self.get_commander_view_fov() / self.get_fov())
-
-                    texture_x = math.floor(sprites_displayed * visibles_sprites.get_texture_size()[0])
-
-                    y = -height * self.get_y_offset() * (self.get_commander_view_fov() / self.get_fov())# * ((map_size[1] - floor_offset) / (map_size[1] // 2)) # Calculate the y pos of the part (assuming y inversed)
-                    y = map_size[1] - ((map_size[0] - floor_offset) + y + math.floor(final_height)) # Inverse y
-
-                    color = (0, 0, 0)
-                    for j in range(scale):
-                        game_surface.blit(pygame.transform.scale(visibles_sprites.get_texture_column(texture_x), (1, final_height)), (i * scale + j, y, 1, final_height))
-            
-            if part != 0:
-                height = (self.get_screen_distance() / (length + 0.000001)) # Calculate the projection height
-                datas = self.game.get_map().get_parts_data(r[2])
-                final_height = height * datas["height"] * (self.get_commander_view_fov() / self.get_fov()) # Calculate the real height
-
-                y = -height * self.get_y_offset() * (self.get_commander_view_fov() / self.get_fov())# * ((map_size[1] - floor_offset) / (map_size[1] // 2)) # Calculate the y pos of the part (assuming y inversed)
-                y = map_size[1] - ((map_size[0] - floor_offset) + y + math.floor(final_height)) # Inverse y
-
-                color = (255 / (math.sqrt(length)), 255 / math.sqrt(length), 255 / (math.sqrt(length)))
-                if length < 0: color = (255, 255, 255)
-
-                if part == self.game.get_map().get_elements("tree"): # Draw texture depending on the part
-                    if side_purcentage < 0.2 or side_purcentage > 0.8:
-                        color = (51, 25, 0)
-                    else:
-                        color = (102, 51, 0)
-                elif part == self.game.get_map().get_elements("brick wall"):
-                    if math.floor(side_purcentage * 5) % 2 == 0:
-                        color = (255, 51, 51)
-                    else:
-                        color = (128, 128, 128)
-
-                pygame.draw.rect(game_surface, color, (i * scale, y, scale, final_height))
-
-                if part == self.game.get_map().get_elements("tree"): # Draw the leaves (a perfect square)
-                    color = (0, 51, 0)
-                    leaves_width = height * datas["leaves width"] * (self.get_commander_view_fov() / self.get_fov()) # Calculate the width of the leaves
-                    leaves_x = i * scale
-
-                    if angle <= 90:
-                        if side != 2:
-                            leaves_x -= (leaves_width / 2) * abs(side_length - 1)
-                    elif angle <= 180:
-                        if side == 2:
-                            leaves_x -= (leaves_width / 2) * abs(side_length - 1)
-                    elif angle <= 270:
-                        if side != 0:
-                            leaves_x -= (leaves_width / 2) * abs(side_length - 1)
-                    else:
-                        if side == 0:
-                            leaves_x -= (leaves_width / 2) * abs(side_length - 1)
-
-                    pygame.draw.rect(surface_to_return, color, (leaves_x, y - (leaves_width), (leaves_width / 2) * abs(side_length - 1) + 5, leaves_width + 1)) # Draw the leave
-
-            if sprite_length <= length:
-                if visibles_sprites != 0: # Draw a sprites if necessary
-                    height = (self.get_screen_distance() / (sprite_length + 0.000001)) # Calculate the projection height
-                    final_height = height * visibles_sprites.get_height() * (self.get_commander_view_fov() / self.get_fov())
-
-                    texture_x = math.floor(sprites_displayed * visibles_sprites.get_texture_size()[0])
-
-                    y = -height * self.get_y_offset() * (self.get_commander_view_fov() / self.get_fov())# * ((map_size[1] - floor_offset) / (map_size[1] // 2)) # Calculate the y pos of the part (assuming y inversed)
-                    y = map_size[1] - ((map_size[0] - floor_offset) + y + math.floor(final_height)) # Inverse y
-
-                    color = (0, 0, 0)
-                    for j in range(scale):
-                        game_surface.blit(pygame.transform.scale(visibles_sprites.get_texture_column(texture_x), (1, final_height)), (i * scale + j, y, 1, final_height))
-            i += 1
-
-        surface_to_return.blit(game_surface, (0, 0, game_surface.get_width(), game_surface.get_height()))
-
-        if self.get_view() == 1: # Add a binocualr effect
+        scale = math.ceil(map_size[0] / len(hits))
+        columns = [[] for r in hits] # Every object drawn on each column, as (distance, kind, datas)
+        registry = self.game.get_map().get_element_registry()
+        heights = registry.get_heights()
+        leaves_widths = registry.get_leaves_widths()
+        trees = {} # First column, last column, distance and part of each part with leaves touched
+        for i, ray_angle, ray_hits in hits: # Parts touched by each ray
+            for hit in ray_hits:
+                columns[i].append((hit.length, "wall", hit))
+                if leaves_widths[hit.part] > 0:
+                    first, last, length, part = trees.get(hit.cell, (i, i, hit.length, hit.part))
+                    trees[hit.cell] = (min(first, i), max(last, i), min(length, hit.length), part)
+
+        for first, last, length, part in trees.values(): # Add one leaves square by tree
+            top, final_height = self.project(length, heights[part], zoom)
+            leaves_width = (self.get_screen_distance() / (length + 0.000001)) * leaves_widths[part] * zoom # Calculate the width of the leaves
+            center = (first + last + 1) / 2 * scale
+            for j in range(max(math.floor((center - leaves_width / 2) / scale), 0), min(math.ceil((center + leaves_width / 2) / scale), len(hits))):
+                columns[j].append((length, "leaves", (top - leaves_width, top)))
+
+        sprites = self.game.get_entities().get_sprites_in_view(self.get_base_pos(), view_angle, fov) # Nearest sprites in the view, with their angle and distance
+        if len(sprites) > 0: # Add the column of each sprite on each ray crossing it
+            rays_angles = np.array([ray_angle for i, ray_angle, ray_hits in hits])
+            sprites_angles = np.array([angle for s, angle, length in sprites])
+            sprites_lengths = np.array([length for s, angle, length in sprites])
+            fov_sprites = np.degrees(np.arctan((np.array([s.get_length() for s, angle, length in sprites]) / 2) / sprites_lengths))
+            difference = (rays_angles[None, :] - sprites_angles[:, None] + 180) % 360 - 180
+            for sprite_index, i in zip(*np.nonzero(np.abs(difference) < fov_sprites[:, None])):
+                sprites_displayed = (difference[sprite_index, i] + fov_sprites[sprite_index]) / (fov_sprites[sprite_index] * 2)
+                columns[i].append((sprites_lengths[sprite_index], "sprite", (sprites[sprite_index][0], sprites_displayed)))
+
+        textures = self.game.get_textures()
+        for i, objects in enumerate(columns): # Draw each column from the front to the back, only where nothing nearer was drawn
+            coverage = [] # Sorted spans of the column already drawn
+            transparents = [] # Visible spans of the sprites, drawn after the opaque objects behind them
+            for length, kind, datas in sorted(objects, key = lambda o: o[0]):
+                if kind == "sprite":
+                    top, final_height = self.project(length, datas[0].get_height(), zoom)
+                    transparents.append((datas, top, final_height, raycast.get_uncovered_spans(coverage, top, top + final_height)))
+                    continue
+
+                if kind == "leaves":
+                    top, bottom = datas
+                    for span_top, span_bottom in raycast.get_uncovered_spans(coverage, top, bottom):
+                        pygame.draw.rect(surface_to_return, (0, 51, 0), (i * scale, span_top, scale, span_bottom - span_top))
+                else:
+                    part = datas.part
+                    top, final_height = self.project(length, heights[part], zoom)
+                    bottom = top + final_height
+                    part_texture = textures.get_texture(part)
+                    for span_top, span_bottom in raycast.get_uncovered_spans(coverage, top, bottom):
+                        if part_texture is not None: # Draw the column of the texture, sampled from the mip level matching its height
+                            part_texture.draw_column(surface_to_return, datas.side_percentage, i * scale, top, scale, final_height, span_top, span_bottom)
+                        else:
+                            color = (255 / (math.sqrt(length)), 255 / math.sqrt(length), 255 / (math.sqrt(length)))
+                            if length < 0: color = (255, 255, 255)
+                            pygame.draw.rect(surface_to_return, color, (i * scale, span_top, scale, span_bottom - span_top))
+                raycast.cover_span(coverage, top, bottom)
+                if len(coverage) == 1 and coverage[0][0] <= 0 and coverage[0][1] >= map_size[1]: break # The column is full
+
+            for (visibles_sprites, sprites_displayed), top, final_height, spans in transparents[::-1]: # Draw the sprites from the back to the front
+                column = visibles_sprites.get_texture_column(min(math.floor(sprites_displayed * visibles_sprites.get_texture_size()[0]), visibles_sprites.get_texture_size()[0] - 1))
+                for span_top, span_bottom in spans:
+                    texture.draw_scaled_column(surface_to_return, column, i * scale, top, scale, final_height, span_top, span_bottom)
+
+        if view == 1: # Add a binocualr effect
             surface_to_return.blit(self.get_binoculars(), (0, 0, surface_to_return.get_width(), surface_to_return.get_height()))
 
         return pygame.transform.scale(surface_to_return, (screen_size[0], screen_size[1]))
     
+    def project(self, length: float, height: float, zoom: float = 1) -> tuple:
+        """Return where an object is projected on a column of the view
+
+        Args:
+            length (float): distance between the object and the player
+            height (float): height of the object
+            zoom (float, optional): zoom of the view compared to the commander view. Defaults to 1.
+
+        Returns:
+            tuple: y pos of the top of the object, and its projected height
+        """
+        map_size = (self.game.get_map().get_map_WIDTH(), self.game.get_map().get_map_HEIGHT())
+        projection_height = (self.get_screen_distance() / (length + 0.000001)) # Calculate the projection height
+        final_height = projection_height * height * zoom # Calculate the real height
+
+        y = -projection_height * self.get_y_offset() * zoom # Calculate the y pos of the part (assuming y inversed)
+        return map_size[1] - (self.get_floor_offset() + y + math.floor(final_height)), final_height # Inverse y
+
     def raise_commander_view(self, delta_time: float, multiplicator: float = 1) -> None:
         """Raise the commander view
 
@@ -336,155 +355,110 @@ class Player:
             delta_time (float): time between the last frame and this frame
             multiplicator (float, optional): value to multiplie for turning. Defaults to 1.
         """
-        new_angle = self.get_commander_view_elevation() + self.get_commander_view_elevation_speed() * delta_time * multiplicator
-        if new_angle > self.get_commander_view_elevation_maximum(): new_angle = self.get_commander_view_elevation_maximum() # Adjust the angle
-        if new_angle < self.get_commander_view_elevation_minimum(): new_angle = self.get_commander_view_elevation_minimum()
-        self.commander_view_elevation = new_angle
-        self.floor_offset = self.game.get_map().get_map_HEIGHT() // 2 + self.get_commander_view_elevation()
+        self.set_commander_view_elevation(self.get_commander_view_elevation() + self.get_commander_view_elevation_speed() * delta_time * multiplicator)
     
-    def ray_cast(self, angle: float, fov: float = 0, fov_raycast: float = 0) -> list:
-        """Return the length between the player and an object on an angle
+    def ray_cast_commander_view(self) -> list:
+        """Return the ray-casts of the commander view (see ray_cast_view)
+
+        Returns:
+            list: list of (index, angle, parts touched) of each ray, with the raycast.RayHit of each part touched
+        """
+        return self.ray_cast_view(self.get_commander_view_angle(), self.get_fov())
+
+    def ray_cast_layers(self, angle: float, max_layers: int = None) -> list:
+        """Return every part touched by a ray-cast, until the parts touched hide everything behind them
 
         Args:
             angle (float): angle to do the ray-cast
-            fov (float, optional): fov of the raycast. Defaults to 0.
-            fov_raycast (float, optional): number of raycast in the FOV. Defaults to 0.
+            max_layers (int, optional): maximum number of parts touched returned. Defaults to the max layers of the player.
 
         Returns:
-            list: list of element containing:
-                  -The length between the object and the player.
-                  -A list of point.
-                  -The part touched.
-                  -The side of the part touched.
-                  -The angle of the ray-cast.
-                  -The purcentage of the side where the ray-cast hit.
-        """
-        angle = mmath.normalize_angle(angle)
-        map_size = (self.game.get_map().get_map_WIDTH(), self.game.get_map().get_map_HEIGHT())
-
+            list: raycast.RayHit of each part touched, from the nearest to the farthest
+        """
+        if max_layers is None: max_layers = self.max_layers
+        map_size = self.game.get_map().get_ray_size() # The x pos is the first index of the parts
         self.base_pos = (math.ceil(map_size[0] / 2), math.ceil(map_size[1] / 2))
-        
-        if fov == 0: # If we don't need a FOV
-            vector_direction = mmath.direction_vector(angle)
-            x_to_y = 100000
-            if vector_direction[1] != 0: # Calculate the x ratio to y if y isn't 0
-                x_to_y = vector_direction[0] / (vector_direction[1])
-
-            verticals_intersection_length = mmath.distance2D(0, 0, 2, 2 / x_to_y)
-            verticals_intersection_x = self.get_base_pos()[0] # Calculate the vertical contact pos
-            verticals_intersection_y = self.get_base_pos()[1]
-
-            horizontals_intersection_length = 0
-            horizontals_intersection_x = self.get_base_pos()[0] # Calculate the horizontal contact pos
-            horizontals_intersection_y = self.get_base_pos()[1]
-
-            foo_v = math.floor # Function to apply for the vertical ray cast
-            foo_h = math.floor # Function to apply for the horizontal ray cast
-
-            if angle < 90:
-                foo_h = math.floor
-                foo_v = math.ceil
-            elif angle < 180:
-                foo_h = math.ceil
-                foo_v = math.ceil
-            elif angle < 270:
-                foo_h = math.ceil
-                foo_v = math.floor
-
-            while verticals_intersection_x >= 0 and foo_v(verticals_intersection_y) >= 0 and verticals_intersection_x < map_size[0] and foo_v(verticals_intersection_y) < map_size[1] and (self.game.get_map().get_part(foo_v(verticals_intersection_y), verticals_intersection_x) == 1 or self.game.get_map().get_part(foo_v(verticals_intersection_y), verticals_intersection_x) == 7):
-                # Ray-cast into the verticals axes
-                if angle > 90 and angle < 270:
-                    verticals_intersection_x -= 1
-                    verticals_intersection_y += 1 / x_to_y
-                else:
-                    verticals_intersection_x += 1
-                    verticals_intersection_y -= 1 / x_to_y
-            
-            while foo_h(horizontals_intersection_x) >= 0 and horizontals_intersection_y >= 0 and foo_h(horizontals_intersection_x) < map_size[0] and horizontals_intersection_y < map_size[1] and (self.game.get_map().get_part(horizontals_intersection_y, foo_h(horizontals_intersection_x)) == 1 or self.game.get_map().get_part(horizontals_intersection_y, foo_h(horizontals_intersection_x)) == 7):
-                # Ray-cast into the horizontals axes
-                if angle > 180:
-                    horizontals_intersection_x -= 1 * x_to_y
-                    horizontals_intersection_y += 1
-                else:
-                    horizontals_intersection_x += 1 * x_to_y
-                    horizontals_intersection_y -= 1
-
-            real_horizontals_intersection_length = -1
-            horizontals_intersection_length = mmath.distance2D(self.get_base_pos()[0], self.get_base_pos()[1], horizontals_intersection_x, horizontals_intersection_y) #Calculate total horizontal distance
-            if foo_h(horizontals_intersection_x) >= 0 and horizontals_intersection_y >= 0 and foo_h(horizontals_intersection_x) < map_size[0] and horizontals_intersection_y < map_size[1]:
-                real_horizontals_intersection_length = horizontals_intersection_length
-
-            real_verticals_intersection_length = -1
-            verticals_intersection_length = mmath.distance2D(self.get_base_pos()[0], self.get_base_pos()[1], verticals_intersection_x, verticals_intersection_y) # Calculate total vertical distance
-            if verticals_intersection_x >= 0 and foo_v(verticals_intersection_y) >= 0 and verticals_intersection_x < map_size[0] and foo_v(verticals_intersection_y) < map_size[1]:
-                real_verticals_intersection_length = verticals_intersection_length
-
-            vertical_or_horizontal = "h"
-
-            if verticals_intersection_length < horizontals_intersection_length: # Return the nearest cast length
-                vertical_or_horizontal = "v"
-            
-            side = 0
-            side_length = 0
-            side_percentage = -1
-            if angle < 180: # Calculate the touched side
-                if vertical_or_horizontal == "h":
-                    side = 2
-                else:
-                    if angle < 90:
-                        side = 1
-                    else:
-                        side = 3
-            else:
-                if vertical_or_horizontal == "h":
-                    side = 0
-                else:
-                    if angle > 270:
-                        side = 1
-                    else:
-                        side = 3
-
-            part = 0
-            if vertical_or_horizontal == "v": # Return the nearest cast length
-                if real_verticals_intersection_length != -1:
-                    part = self.game.get_map().get_part(foo_v(verticals_intersection_y), verticals_intersection_x)
-                    part_angle = math.degrees(math.atan((verticals_intersection_x - (self.get_base_pos()[0] + 0.00001)) / (foo_v(verticals_intersection_y) - (self.get_base_pos()[1] + 0.00001))))
-                    part_angle = mmath.normalize_angle(part_angle) # Calculate the angle between the part and the player
-
-                    if side == 0 or side == 2: side_length = math.cos(part_angle)
-                    else: side_length = math.sin(part_angle)
-                    side_percentage = abs(verticals_intersection_y - math.floor(verticals_intersection_y)) # Calculate the purcentage of the part where the ray-cast hit
-                return [real_verticals_intersection_length, (verticals_intersection_x, verticals_intersection_y), part, side, angle, side_percentage, side_length]
-            
-            if real_horizontals_intersection_length != -1:
-                part = self.game.get_map().get_part(horizontals_intersection_y, foo_h(horizontals_intersection_x))
-            side_percentage = abs(horizontals_intersection_x - math.floor(horizontals_intersection_x)) # Calculate the purcentage of the part where the ray-cast hit
-            return [real_horizontals_intersection_length, (horizontals_intersection_x, horizontals_intersection_y), part, side, angle, side_percentage, side_length]
-        # If we need a FOV
-        result = []
-        for i in range(fov_raycast): # Do FOV raycast
-            raycast = self.ray_cast(angle - (-(fov / 2) + fov*((i + 1)/fov_raycast)))
-            raycast += (i,)
-            result.append(raycast)
-
-        return result # Return the result
-    
-    def ray_cast_commander_view(self) -> tuple:
-        """Return the length between the commander view and an object on an angle
+        return self.get_raycast_backend().cast(self.game.get_map(), self.get_base_pos(), angle, self.get_y_offset(), max_layers)
+
+    def ray_cast_view(self, angle: float, fov: float, fov_raycast: int = 255) -> list:
+        """Return the ray-casts of a view, taken from the rays cache or cast on the rays grid shared by every view
+
+        Args:
+            angle (float): angle of the view
+            fov (float): fov of the view
+            fov_raycast (int, optional): number of raycast in the FOV. Defaults to 255.
 
         Returns:
-            tuple: tuple of element containing the length between the object and the turret and a list of point
+            list: list of (index, angle, parts touched) of each ray, with the raycast.RayHit of each part touched
         """
-        return self.ray_cast(self.get_commander_view_angle(), self.get_fov(), 255)
+        if self.ray_cache_y_offset != self.get_y_offset(): # The hidden parts depend on the y offset
+            self.ray_cache.clear()
+            self.ray_cache_y_offset = self.get_y_offset()
+
+        grid_size = round(360 / self.ray_angle_step)
+        indexes = [round(mmath.normalize_angle(angle - (-(fov / 2) + fov*((i + 1)/fov_raycast))) / self.ray_angle_step) % grid_size for i in range(fov_raycast)] # Snap each ray on the grid, so the views share their rays
+        missing = list(dict.fromkeys(index for index in indexes if index not in self.ray_cache))
+        if len(missing) > 0: # Cast every missing ray at once
+            map_size = self.game.get_map().get_ray_size() # The x pos is the first index of the parts
+            self.base_pos = (math.ceil(map_size[0] / 2), math.ceil(map_size[1] / 2))
+            hits = self.get_raycast_backend().cast_many(self.game.get_map(), self.get_base_pos(), [index * self.ray_angle_step for index in missing], self.get_y_offset(), self.max_layers)
+            self.ray_cache.update(zip(missing, hits))
+
+        return [(i, index * self.ray_angle_step, self.ray_cache[index]) for i, index in enumerate(indexes)]
     
-    def ray_cast_turret(self) -> tuple:
-        """Return the length between the turret and an object on an angle
+    def ray_cast_turret(self) -> raycast.RayHit:
+        """Return the first part touched by a ray-cast toward the turret angle
 
         Returns:
-            tuple: tuple of element containing the length between the object and the turret and a list of point
+            raycast.RayHit: first part touched, or None if the ray leaves the map
         """
-        return self.ray_cast(self.get_turret_angle())
+        hits = self.ray_cast_layers(self.get_turret_angle(), 1)
+        return hits[0] if len(hits) > 0 else None
     
+    def set_commander_view_angle(self, angle: float) -> None:
+        """Change the angle of the commander view
+
+        Args:
+            angle (float): new angle of the commander view (like the trigonometrical circle)
+        """
+        self.commander_view_angle = mmath.normalize_angle(angle)
+
+    def set_commander_view_elevation(self, elevation: float) -> None:
+        """Change the elevation of the commander view, kept between its minimum and its maximum
+
+        Args:
+            elevation (float): new elevation of the commander view
+        """
+        if elevation > self.get_commander_view_elevation_maximum(): elevation = self.get_commander_view_elevation_maximum() # Adjust the angle
+        if elevation < self.get_commander_view_elevation_minimum(): elevation = self.get_commander_view_elevation_minimum()
+        self.commander_view_elevation = elevation
+        self.floor_offset = self.game.get_map().get_map_HEIGHT() // 2 + self.get_commander_view_elevation()
+
+    def set_fov(self, view: int, fov: float) -> None:
+        """Change the FOV of a view
+
+        Args:
+            view (int): view changed (0 for the commander view, 1 for the shooter view)
+            fov (float): new FOV of the view
+        """
+        if view == 0: self.commander_view_fov = fov
+        else: self.shooter_view_fov = fov
+        if self.get_view() == view: self.fov = fov
+
+        ray_angle_step = min(self.get_commander_view_fov(), self.get_shooter_view_fov()) / 255
+        if ray_angle_step != self.ray_angle_step: # The rays of the cache are on the old grid
+            self.ray_angle_step = ray_angle_step
+            self.ray_cache.clear()
+
+    def set_raycast_backend(self, name: str) -> None:
+        """Change the implementation of the multi-layer ray-cast
+
+        Args:
+            name (str): name of the backend (see raycast.BACKENDS)
+        """
+        self.raycast_backend = raycast.get_backend(name)
+        self.ray_cache.clear()
+
     def set_view(self, view: int) -> None:
         """Change the current player view
 
@@ -0,0 +1,496 @@
+# Raycast.py
+#
+# ------------ File used to cast the rays through the map ------------
+# Contains the RayHit class to describe a part touched by a ray.
+# Contains the RaycastBackend class, the interface of every ray-cast
+# implementation, and its ReferenceBackend, NumpyBackend and JitBackend
+# implementations (the JitBackend needs numba, or walks the rays in
+# pure Python without it).
+# Contains the conformance and benchmark functions to compare the
+# backends, run with "python raycast.py".
+#
+
+# Import all necessary library
+import math
+import mmath
+import numpy as np
+import time
+from typing import NamedTuple
+
+try:
+    import numba
+except ImportError: # The JitBackend walks the rays in pure Python
+    numba = None
+
+DEFAULT_BACKEND = "numpy" # Backend used by the player if none is chosen
+
+class RayHit(NamedTuple):
+    """Class used to describe a part touched by a ray
+    """
+    length: float # Length of the ray until the part
+    pos: tuple # (x, y) pos where the ray touches the part
+    part: int # Part touched
+    side: int # Side of the part touched
+    angle: float # Angle of the ray
+    side_percentage: float # Purcentage of the side where the ray touches the part
+    cell: tuple # (x, y) pos of the part touched (Map.get_part(y, x))
+
+def cover_span(coverage: list, top: float, bottom: float) -> None:
+    """Add a span to the spans already drawn on a column
+
+    Args:
+        coverage (list): sorted (top, bottom) spans already drawn on the column, merged in place
+        top (float): top of the span drawn
+        bottom (float): bottom of the span drawn
+    """
+    if bottom <= top: return
+    merged = []
+    for span_top, span_bottom in coverage: # Merge every span touching the new one
+        if span_bottom < top or span_top > bottom: merged.append((span_top, span_bottom))
+        else: top, bottom = min(top, span_top), max(bottom, span_bottom)
+    merged.append((top, bottom))
+    coverage[:] = sorted(merged)
+
+def get_farther_span(y_offset: float, maximum_height: float, length: float) -> tuple:
+    """Return the span where any part farther than a length can be drawn on a column (compiled by numba when available)
+
+    Args:
+        y_offset (float): y offset of the view
+        maximum_height (float): height of the highest element, with its leaves
+        length (float): length of the ray until the last part touched
+
+    Returns:
+        tuple: (top, bottom) of the span, as (y - horizon) / screen distance
+    """
+    top = (y_offset - maximum_height) / length # Top of the leaves of the highest part, right behind the last part touched
+    bottom = y_offset / length # Bottom of a part, right behind the last part touched
+    return min(top, 0.0), max(bottom, 0.0) # A view under the ground or above the highest part sees the farthest parts near the horizon
+
+def get_uncovered_spans(coverage: list, top: float, bottom: float) -> list:
+    """Return the parts of a span not drawn yet on a column
+
+    Args:
+        coverage (list): sorted (top, bottom) spans already drawn on the column
+        top (float): top of the span
+        bottom (float): bottom of the span
+
+    Returns:
+        list: (top, bottom) parts of the span not drawn yet
+    """
+    spans = []
+    for span_top, span_bottom in coverage:
+        if span_bottom <= top: continue
+        if span_top >= bottom: break
+        if span_top > top: spans.append((top, span_top))
+        top = max(top, span_bottom)
+    if bottom > top: spans.append((top, bottom))
+    return spans
+
+def make_hit(origin: tuple, direction: tuple, angle: float, length: float, vertical: bool, part: int, cell: tuple) -> RayHit:
+    """Return the description of a part touched by a ray
+
+    Args:
+        origin (tuple): (x, y) pos where the ray starts
+        direction (tuple): (x, y) direction of the ray
+        angle (float): angle of the ray
+        length (float): length of the ray until the part
+        vertical (bool): if the ray touches a vertical side of the part
+        part (int): part touched
+        cell (tuple): (x, y) pos of the part touched
+
+    Returns:
+        RayHit: description of the part touched
+    """
+    pos = (origin[0] + direction[0] * length, origin[1] + direction[1] * length)
+    if vertical: # Calculate the touched side and the purcentage of the side where the ray-cast hit
+        side = 1 if angle < 90 or angle > 270 else 3
+        side_percentage = abs(pos[1] - math.floor(pos[1]))
+    else:
+        side = 2 if angle < 180 else 0
+        side_percentage = abs(pos[0] - math.floor(pos[0]))
+    return RayHit(float(length), pos, int(part), side, angle, side_percentage, (int(cell[0]), int(cell[1])))
+
+def start_ray(origin: tuple, angle: float) -> tuple:
+    """Return the values needed to walk a ray through the parts of the map
+
+    Args:
+        origin (tuple): (x, y) pos where the ray starts
+        angle (float): angle of the ray (normalized)
+
+    Returns:
+        tuple: direction, first part (x, y), step (x, y), length between two verticals and two horizontals, length to the first vertical and horizontal
+    """
+    direction = mmath.direction_vector(angle)
+    direction = (direction[0], -direction[1]) # The y axis of the map goes down
+    part_x = math.floor(origin[0]) - (direction[0] < 0 and origin[0] == math.floor(origin[0])) # Part containing the start of the ray (the part behind a line the ray leaves, so the first line crossed is never at a length of 0)
+    part_y = math.floor(origin[1]) - (direction[1] < 0 and origin[1] == math.floor(origin[1]))
+    step_x = 1 if direction[0] > 0 else -1
+    step_y = 1 if direction[1] > 0 else -1
+    delta_x = abs(1 / direction[0]) if direction[0] != 0 else math.inf # Length of the ray between two verticals
+    delta_y = abs(1 / direction[1]) if direction[1] != 0 else math.inf # Length of the ray between two horizontals
+    next_x = (part_x + (step_x > 0) - origin[0]) / direction[0] if direction[0] != 0 else math.inf # Length of the ray to the next vertical
+    next_y = (part_y + (step_y > 0) - origin[1]) / direction[1] if direction[1] != 0 else math.inf
+    return direction, (part_x, part_y), (step_x, step_y), (delta_x, delta_y), (next_x, next_y)
+
+class RaycastBackend:
+    """Class used as the interface of every ray-cast implementation
+    """
+
+    name = "" # Name of the backend, used to choose it
+
+    def cast(self, game_map, origin: tuple, angle: float, y_offset: float, max_layers: int) -> list:
+        """Return the parts touched by a ray, from the nearest to the farthest, until every farther part is hidden
+
+        Args:
+            game_map (map.Map): map crossed by the ray
+            origin (tuple): (x, y) pos where the ray starts
+            angle (float): angle of the ray (like the trigonometrical circle)
+            y_offset (float): y offset of the view (the hidden parts depend on it)
+            max_layers (int): maximum number of parts touched returned
+
+        Returns:
+            list: RayHit of each part touched
+        """
+        raise NotImplementedError
+
+    def cast_many(self, game_map, origin: tuple, angles, y_offset: float, max_layers: int) -> list:
+        """Return the parts touched by many rays
+
+        Args:
+            game_map (map.Map): map crossed by the rays
+            origin (tuple): (x, y) pos where the rays start
+            angles: angle of each ray
+            y_offset (float): y offset of the view
+            max_layers (int): maximum number of parts touched returned by ray
+
+        Returns:
+            list: list of RayHit of each ray, like cast
+        """
+        return [self.cast(game_map, origin, angle, y_offset, max_layers) for angle in angles]
+
+    def get_name(self) -> str:
+        """Return the name of the backend
+
+        Returns:
+            str: name of the backend
+        """
+        return self.name
+
+class ReferenceBackend(RaycastBackend):
+    """Class used to walk the rays part by part, reading the map one part at a time
+    """
+
+    name = "reference"
+
+    def cast(self, game_map, origin: tuple, angle: float, y_offset: float, max_layers: int) -> list:
+        angle = mmath.normalize_angle(angle)
+        registry = game_map.get_element_registry()
+        heights = registry.get_heights()
+        maximum_height = registry.get_maximum_height()
+        solid = registry.get_solid()
+
+        direction, (part_x, part_y), (step_x, step_y), (delta_x, delta_y), (next_x, next_y) = start_ray(origin, angle)
+        coverage = [] # Spans hidden by the parts touched, as (y - horizon) / screen distance
+        hits = []
+        while True: # Walk the parts crossed by the ray, in order
+            if next_x < next_y:
+                part_x += step_x
+                length = next_x
+                next_x += delta_x
+                vertical = True
+            else:
+                part_y += step_y
+                length = next_y
+                next_y += delta_y
+                vertical = False
+            if not game_map.is_inside(part_x, part_y): break
+
+            part = game_map.get_part(part_y, part_x)
+            if not solid[part]: continue
+
+            hits.append(make_hit(origin, direction, angle, length, vertical, part, (part_x, part_y)))
+            if len(hits) >= max_layers: break
+
+            cover_span(coverage, (y_offset - heights[part]) / length, y_offset / length)
+            if len(get_uncovered_spans(coverage, *get_farther_span(y_offset, maximum_height, length))) == 0: break # Every farther part is hidden
+
+        return hits
+
+class NumpyBackend(RaycastBackend):
+    """Class used to walk many rays at once with numpy, a chunk of parts crossed at a time, keeping the visible ones
+    """
+
+    name = "numpy"
+
+    def __init__(self, chunk_size: int = 32) -> None:
+        """Construct a numpy backend
+
+        Args:
+            chunk_size (int, optional): number of parts crossed by each ray at each step of the walk. Defaults to 32.
+        """
+        self.chunk_size = chunk_size
+
+    def cast(self, game_map, origin: tuple, angle: float, y_offset: float, max_layers: int) -> list:
+        return self.cast_many(game_map, origin, [angle], y_offset, max_layers)[0]
+
+    def cast_many(self, game_map, origin: tuple, angles, y_offset: float, max_layers: int) -> list:
+        angles = [mmath.normalize_angle(angle) for angle in angles]
+        if len(angles) == 0: return []
+        registry = game_map.get_element_registry()
+        heights = registry.get_heights()
+        maximum_height = registry.get_maximum_height()
+        solid = registry.get_solid()
+
+        rays = [start_ray(origin, angle) for angle in angles]
+        directions = [ray[0] for ray in rays]
+        cells = np.array([ray[1] for ray in rays], np.int64) # Last part crossed by each ray
+        steps = np.array([ray[2] for ray in rays], np.int64)
+        deltas = np.array([ray[3] for ray in rays])
+        nexts = np.array([ray[4] for ray in rays]) # Length of each ray to its next vertical and horizontal
+
+        chunk_size = self.chunk_size
+        coverages = [[] for angle in angles] # Spans hidden by the parts touched by each ray
+        result = [[] for angle in angles]
+        active = np.arange(len(angles)) # Rays still walking, until they leave the map or every farther part is hidden
+        while len(active) > 0: # Cross the next parts of every active ray
+            count = len(active)
+            crossings = [] # Length of each ray to its next lines crossed on each axis
+            for axis in (1, 0): # The horizontals come first, so a tie steps on y first like the reference walk
+                lengths = np.empty((count, chunk_size + 1))
+                lengths[:, 0] = nexts[active, axis]
+                lengths[:, 1:] = deltas[active, axis, None]
+                crossings.append(np.cumsum(lengths, axis = 1)) # Same sums as the reference walk
+            lengths = np.concatenate(crossings, axis = 1)
+            order = np.argsort(lengths, axis = 1, kind = "stable")[:, :chunk_size] # Each axis has a line more than the chunk, so the chunk is always the nearest lines
+            lengths = np.take_along_axis(lengths, order, axis = 1)
+            verticals = order > chunk_size
+
+            steps_x = np.cumsum(verticals, axis = 1)
+            steps_y = np.arange(1, chunk_size + 1)[None, :] - steps_x
+            cells_x = cells[active, 0, None] + steps[active, 0, None] * steps_x
+            cells_y = cells[active, 1, None] + steps[active, 1, None] * steps_y
+            cells[active, 0], cells[active, 1] = cells_x[:, -1], cells_y[:, -1]
+            nexts[active, 0] = crossings[1][np.arange(count), steps_x[:, -1]]
+            nexts[active, 1] = crossings[0][np.arange(count), steps_y[:, -1]]
+
+            inside = np.cumprod(game_map.is_inside(cells_x, cells_y), axis = 1, dtype = np.bool_) # Each walk stops when its ray leaves the map
+            rows, columns = np.nonzero(inside)
+            parts = np.zeros(lengths.shape, np.int8)
+            parts[rows, columns] = game_map.get_parts_at(cells_y[rows, columns], cells_x[rows, columns]) # Only the parts crossed are read
+            touched = inside & solid[parts]
+
+            walking = inside[:, -1].copy()
+            for row in np.flatnonzero(touched.any(axis = 1)): # Keep the parts touched by each ray until every farther part is hidden
+                ray = active[row]
+                coverage, hits = coverages[ray], result[ray]
+                for index in np.flatnonzero(touched[row]):
+                    length, part = lengths[row, index], parts[row, index]
+                    hits.append(make_hit(origin, directions[ray], angles[ray], length, verticals[row, index], part, (cells_x[row, index], cells_y[row, index])))
+                    if len(hits) >= max_layers:
+                        walking[row] = False
+                        break
+
+                    cover_span(coverage, (y_offset - heights[part]) / length, y_offset / length)
+                    if len(get_uncovered_spans(coverage, *get_farther_span(y_offset, maximum_height, length))) == 0:
+                        walking[row] = False
+                        break
+            active = active[walking]
+
+        return result
+
+def covered(tops: np.ndarray, bottoms: np.ndarray, count: int, top: float, bottom: float) -> bool:
+    """Return if a span is hidden by other spans (compiled by numba when available)
+
+    Args:
+        tops (np.ndarray): top of each span
+        bottoms (np.ndarray): bottom of each span
+        count (int): number of spans used in the arrays
+        top (float): top of the span
+        bottom (float): bottom of the span
+
+    Returns:
+        bool: if the span is hidden
+    """
+    while top < bottom: # Move the top of the span under each span hiding it
+        moved = False
+        for i in range(count):
+            if tops[i] <= top and top <= bottoms[i] and bottoms[i] > top:
+                top = bottoms[i]
+                moved = True
+        if not moved: return False
+    return True
+
+def walk_ray(parts: np.ndarray, solid: np.ndarray, heights: np.ndarray, maximum_height: float, y_offset: float, part_x: int, part_y: int, step_x: int, step_y: int, delta_x: float, delta_y: float, next_x: float, next_y: float, max_layers: int, lengths: np.ndarray, cells: np.ndarray, verticals: np.ndarray) -> int:
+    """Walk a ray through the parts of the map, like the reference backend (compiled by numba when available)
+
+    Args:
+        parts (np.ndarray): 2D array of every parts (read like Map.get_part)
+        solid (np.ndarray): if each element stops the rays
+        heights (np.ndarray): height of each element
+        maximum_height (float): height of the highest element, with its leaves
+        y_offset (float): y offset of the view
+        part_x, part_y (int): part containing the start of the ray
+        step_x, step_y (int): direction of the ray on each axis
+        delta_x, delta_y (float): length of the ray between two verticals and two horizontals
+        next_x, next_y (float): length of the ray to the first vertical and horizontal
+        max_layers (int): maximum number of parts touched
+        lengths (np.ndarray): filled with the length of the ray until each part touched
+        cells (np.ndarray): filled with the (x, y) pos of each part touched
+        verticals (np.ndarray): filled with if the ray touches a vertical side of each part
+
+    Returns:
+        int: number of parts touched
+    """
+    tops = np.empty(max_layers, np.float64) # Spans hidden by the parts touched
+    bottoms = np.empty(max_layers, np.float64)
+    count = 0
+    while True:
+        if next_x < next_y:
+            part_x += step_x
+            length = next_x
+            next_x += delta_x
+            vertical = True
+        else:
+            part_y += step_y
+            length = next_y
+            next_y += delta_y
+            vertical = False
+        if part_x < 0 or part_y < 0 or part_x >= parts.shape[0] or part_y >= parts.shape[1]: break # Same as Map.is_inside, the shape is Map.get_ray_size
+
+        part = parts[part_x, part_y] # Same as Map.get_part(part_y, part_x)
+        if not solid[part]: continue
+
+        lengths[count] = length
+        cells[count, 0] = part_x
+        cells[count, 1] = part_y
+        verticals[count] = vertical
+        tops[count] = (y_offset - heights[part]) / length
+        bottoms[count] = y_offset / length
+        count += 1
+        if count >= max_layers: break
+        top, bottom = get_farther_span(y_offset, maximum_height, length)
+        if covered(tops, bottoms, count, top, bottom): break # Every farther part is hidden
+
+    return count
+
+if numba is not None: # Compile the walk once, at the first ray
+    covered = numba.njit(cache = True)(covered)
+    get_farther_span = numba.njit(cache = True)(get_farther_span)
+    walk_ray = numba.njit(cache = True)(walk_ray)
+
+class JitBackend(RaycastBackend):
+    """Class used to walk the rays in a function compiled by numba (or in pure Python without numba)
+    """
+
+    name = "jit"
+
+    def __init__(self) -> None:
+        """Construct a JIT backend
+        """
+        self.fallback = NumpyBackend() # Used for a streamed map, which is not one array
+
+    def cast(self, game_map, origin: tuple, angle: float, y_offset: float, max_layers: int) -> list:
+        parts = game_map.get_parts()
+        if not isinstance(parts, np.ndarray): return self.fallback.cast(game_map, origin, angle, y_offset, max_layers)
+
+        angle = mmath.normalize_angle(angle)
+        registry = game_map.get_element_registry()
+        direction, (part_x, part_y), (step_x, step_y), (delta_x, delta_y), (next_x, next_y) = start_ray(origin, angle)
+        lengths = np.empty(max_layers, np.float64)
+        cells = np.empty((max_layers, 2), np.int64)
+        verticals = np.empty(max_layers, np.bool_)
+        count = walk_ray(parts, registry.get_solid(), registry.get_heights(), registry.get_maximum_height(), float(y_offset), part_x, part_y, step_x, step_y, delta_x, delta_y, next_x, next_y, max_layers, lengths, cells, verticals)
+        return [make_hit(origin, direction, angle, lengths[i], verticals[i], parts[cells[i, 0], cells[i, 1]], cells[i]) for i in range(count)]
+
+    def is_compiled(self) -> bool:
+        """Return if the rays are walked by a compiled function
+
+        Returns:
+            bool: if numba is available
+        """
+        return numba is not None
+
+BACKENDS = {backend.name: backend for backend in (ReferenceBackend, NumpyBackend, JitBackend)} # Every backend, by name
+
+def get_backend(name: str = DEFAULT_BACKEND) -> RaycastBackend:
+    """Return a new backend with its name
+
+    Args:
+        name (str, optional): name of the backend. Defaults to DEFAULT_BACKEND.
+
+    Returns:
+        RaycastBackend: backend
+    """
+    if name not in BACKENDS: raise ValueError("unknown raycast backend " + repr(name) + ", expected one of " + ", ".join(BACKENDS))
+    return BACKENDS[name]()
+
+def check_conformance(backend: RaycastBackend, game_map, origin: tuple, angles, y_offsets = (1,), max_layers: int = 6, reference: RaycastBackend = None) -> list:
+    """Return the rays where a backend does not touch the same parts as the reference backend
+
+    Args:
+        backend (RaycastBackend): backend to check
+        game_map (map.Map): map crossed by the rays
+        origin (tuple): (x, y) pos where the rays start
+        angles: angle of each ray to check
+        y_offsets (tuple, optional): y offsets of the view to check. Defaults to (1,).
+        max_layers (int, optional): maximum number of parts touched by ray. Defaults to 6.
+        reference (RaycastBackend, optional): backend giving the expected hits. Defaults to a ReferenceBackend.
+
+    Returns:
+        list: (angle, y offset, expected hits, hits) of each ray which does not conform
+    """
+    if reference is None: reference = ReferenceBackend()
+    failures = []
+    for y_offset in y_offsets:
+        for angle in angles:
+            expected = reference.cast(game_map, origin, angle, y_offset, max_layers)
+            hits = backend.cast(game_map, origin, angle, y_offset, max_layers)
+            same = len(expected) == len(hits)
+            for a, b in zip(expected, hits) if same else ():
+                same = same and a.part == b.part and a.side == b.side and a.cell == b.cell and math.isclose(a.length, b.length, abs_tol = 1e-9) and math.isclose(a.side_percentage, b.side_percentage, abs_tol = 1e-9)
+            if not same: failures.append((angle, y_offset, expected, hits))
+    return failures
+
+def benchmark(backend: RaycastBackend, game_map, origin: tuple, angles, y_offset: float = 1, max_layers: int = 6, repeat: int = 3) -> float:
+    """Return the best time taken by a backend to cast many rays
+
+    Args:
+        backend (RaycastBackend): backend to time
+        game_map (map.Map): map crossed by the rays
+        origin (tuple): (x, y) pos where the rays start
+        angles: angle of each ray
+        y_offset (float, optional): y offset of the view. Defaults to 1.
+        max_layers (int, optional): maximum number of parts touched by ray. Defaults to 6.
+        repeat (int, optional): number of runs, the best is kept. Defaults to 3.
+
+    Returns:
+        float: best time of a run, in seconds
+    """
+    backend.cast(game_map, origin, 0, y_offset, max_layers) # Compile or warm the backend outside of the timing
+    best = math.inf
+    for i in range(repeat):
+        start = time.perf_counter()
+        backend.cast_many(game_map, origin, angles, y_offset, max_layers)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == "__main__":
+    import argparse
+    import simulation
+
+    parser = argparse.ArgumentParser(description = "Check that the raycast backends touch the same parts as the reference backend, and time them")
+    parser.add_argument("--backends", nargs = "+", choices = list(BACKENDS), default = list(BACKENDS), help = "backends to check and time")
+    parser.add_argument("--map", default = "map.agmff", help = "path of the map crossed by the rays")
+    parser.add_argument("--rays", type = int, default = 1440, help = "number of rays, spread on a full turn")
+    parser.add_argument("--layers", type = int, default = 6, help = "maximum number of parts touched by ray")
+    arguments = parser.parse_args()
+
+    game = simulation.Simulation(map_path = arguments.map)
+    game_map = game.get_map()
+    origin = game.get_player().get_base_pos()
+    angles = [360 * i / arguments.rays for i in range(arguments.rays)]
+    for name in arguments.backends:
+        backend = get_backend(name)
+        failures = check_conformance(backend, game_map, origin, angles, (1, 0.5, -50), arguments.layers)
+        duration = benchmark(backend, game_map, origin, angles, 1, arguments.layers)
+        print(name + ": " + ("conform" if len(failures) == 0 else str(len(failures)) + " rays differ (first at " + str(failures[0][0]) + " degrees)") + ", " + str(round(duration * 1000, 2)) + " ms for " + str(arguments.rays) + " rays")
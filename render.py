@@ -0,0 +1,224 @@
+# Render.py
+#
+# --------- File used to render camera paths without window ---------
+# Contains the RenderScene class to render the 3D view without window.
+# The RenderScene class loads a map, its textures and a layout of
+# vehicles once, and renders the frames of a list of camera states.
+# Contains the functions to spread the frames of a camera path on a
+# process pool, each worker loading the scene once, and to write the
+# frames into PNG files or raw arrays.
+#
+
+# Import all necessary library
+import bake
+import json
+import math
+import numpy as np
+import os
+import pygame
+import simulation
+import texture
+import time
+
+DEFAULT_CAMERA = {"view": 0, "commander_view_angle": 0, "elevation": 0, "fov": None} # Camera state used for each key not given (a FOV of None is the default FOV of the view)
+
+class RenderScene(simulation.Simulation):
+    """Class used to render the 3D view of a simulation without window
+    """
+
+    def __init__(self, map_path: str = "map.agmff", layout: list = None, screen_size: tuple = (505, 505), y_offset: float = 5) -> None:
+        """Create a render scene, with its map, its textures and its vehicles loaded now
+
+        Args:
+            map_path (str, optional): path of the map to render (or of its baked map). Defaults to "map.agmff".
+            layout (list, optional): {"x", "y", "heading", "type"} of each vehicle, or None to keep the vehicles of the simulation. Defaults to None.
+            screen_size (tuple, optional): width and height of each frame. Defaults to (505, 505).
+            y_offset (float, optional): height of the view, like the game. Defaults to 5.
+        """
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # No window is ever opened
+        pygame.init()
+
+        self.SCREEN_WIDTH, self.SCREEN_HEIGHT = screen_size
+
+        manifest = bake.read_manifest()
+        baked_map = bake.find_baked(manifest, map_path)
+        super().__init__(0, True, map_path if baked_map is None else baked_map)
+        if layout is not None: # Replace the vehicles of the simulation with the layout
+            self.entities.alive[:] = False
+            for vehicle in layout:
+                self.entities.spawn(vehicle["x"], vehicle["y"], vehicle.get("heading", 0), vehicle.get("type", 0))
+        self.map.flush_changes()
+
+        self.textures = texture.TextureRegistry(self) # Load every texture now, baked if it is up to date
+        for texture_id, (name, path) in enumerate(self.map.get_element_registry().get_textures()):
+            baked_path = bake.find_baked(manifest, path)
+            if baked_path is not None: self.textures.register(texture_id, self.textures.decode_baked_texture(baked_path))
+            elif path != "" and os.path.exists(path): self.textures.register(texture_id, self.textures.decode_texture(path))
+        for s in self.entities.types_sprite:
+            baked_path = bake.find_baked(manifest, s.get_texture_path())
+            if baked_path is not None: s.set_texture(*s.decode_baked_texture(baked_path))
+            else: s.load_texture(s.get_texture_path())
+
+        self.player.y_offset = y_offset
+        self.default_fovs = (self.player.get_commander_view_fov(), self.player.get_shooter_view_fov()) # FOV of each view, restored by each frame without FOV
+
+    def get_default_fovs(self) -> tuple:
+        """Return the FOV of each view when the scene was loaded
+
+        Returns:
+            tuple: FOV of the commander view and of the shooter view
+        """
+        return self.default_fovs
+
+    def get_SCREEN_HEIGHT(self) -> int:
+        """Return the height of the frames
+
+        Returns:
+            int: height of the frames
+        """
+        return self.SCREEN_HEIGHT
+
+    def get_SCREEN_WIDTH(self) -> int:
+        """Return the width of the frames
+
+        Returns:
+            int: width of the frames
+        """
+        return self.SCREEN_WIDTH
+
+    def get_textures(self) -> texture.TextureRegistry:
+        """Return the texture of each element of the map
+
+        Returns:
+            texture.TextureRegistry: texture of each element of the map
+        """
+        return self.textures
+
+    def render(self, camera: dict) -> pygame.Surface:
+        """Render the 3D view of a camera state
+
+        Args:
+            camera (dict): "view", "commander_view_angle", "elevation" and "fov" of the camera (see DEFAULT_CAMERA)
+
+        Returns:
+            pygame.Surface: rendered frame
+        """
+        camera = {**DEFAULT_CAMERA, **camera}
+        self.player.set_view(camera["view"])
+        for view, fov in enumerate(self.get_default_fovs()): self.player.set_fov(view, fov) # A frame never keeps the FOV of the frame before
+        if camera["fov"] is not None: self.player.set_fov(camera["view"], camera["fov"])
+        self.player.set_commander_view_angle(camera["commander_view_angle"])
+        self.player.set_commander_view_elevation(camera["elevation"])
+        return self.player.projection3D()
+
+def read_json(path: str):
+    """Read a JSON file (a layout of vehicles or a camera path)
+
+    Args:
+        path (str): path of the file
+
+    Returns:
+        content of the file
+    """
+    file = open(path, "r")
+    content = json.load(file)
+    file.close()
+    return content
+
+scene = None # Render scene of the worker process, loaded once by init_worker
+
+def init_worker(map_path: str, layout: list, screen_size: tuple) -> None:
+    """Load the render scene of a worker process, once for every frame it renders
+
+    Args:
+        map_path (str): path of the map to render
+        layout (list): layout of the vehicles, or None
+        screen_size (tuple): width and height of each frame
+    """
+    global scene
+    scene = RenderScene(map_path, layout, screen_size)
+
+def render_frame(index: int, camera: dict, output: str, output_format: str) -> tuple:
+    """Render a frame in the scene of the worker, and write it
+
+    Args:
+        index (int): number of the frame, in the name of its file
+        camera (dict): camera state of the frame
+        output (str): directory where the frame is written
+        output_format (str): "png" for a PNG file, "raw" for a (height, width, 3) uint8 .npy array
+
+    Returns:
+        tuple: number of the frame, path of its file and time taken by the render (without the writing), in seconds
+    """
+    start = time.perf_counter()
+    surface = scene.render(camera)
+    duration = time.perf_counter() - start
+
+    path = os.path.join(output, "frame_" + str(index).zfill(5) + (".png" if output_format == "png" else ".npy"))
+    if output_format == "png": pygame.image.save(surface, path)
+    else: np.save(path, pygame.surfarray.array3d(surface).transpose(1, 0, 2))
+    return index, path, duration
+
+def render_path(cameras: list, output: str, map_path: str = "map.agmff", layout: list = None, screen_size: tuple = (505, 505), output_format: str = "png", workers: int = None) -> dict:
+    """Render every frame of a camera path on a process pool
+
+    Args:
+        cameras (list): camera state of each frame (see DEFAULT_CAMERA)
+        output (str): directory where the frames are written
+        map_path (str, optional): path of the map to render. Defaults to "map.agmff".
+        layout (list, optional): layout of the vehicles, or None to keep the vehicles of the simulation. Defaults to None.
+        screen_size (tuple, optional): width and height of each frame. Defaults to (505, 505).
+        output_format (str, optional): "png" or "raw". Defaults to "png".
+        workers (int, optional): number of worker processes. Defaults to the number of cores.
+
+    Returns:
+        dict: path of each frame, in order, with the measures of the render
+    """
+    import multiprocessing
+
+    os.makedirs(output, exist_ok = True)
+    if workers is None: workers = os.cpu_count() or 1
+    start = time.perf_counter()
+    with multiprocessing.Pool(workers, init_worker, (map_path, layout, tuple(screen_size))) as pool:
+        results = pool.starmap(render_frame, [(i, camera, output, output_format) for i, camera in enumerate(cameras)], chunksize = max(1, len(cameras) // (workers * 4)))
+        pool.close()
+        pool.join() # SDL catches SIGTERM in the workers, so they have to stop by themselves
+    wall_time = time.perf_counter() - start
+
+    durations = [duration for index, path, duration in results]
+    return {"paths": [path for index, path, duration in sorted(results)], "frames": len(results), "wall time": wall_time, "workers": workers,
+            "render time": sum(durations) / max(len(durations), 1), "frames by second": len(results) / wall_time if wall_time > 0 else math.inf}
+
+def sweep_cameras(frames: int, view: int = 0, elevation: float = 0, fov: float = None) -> list:
+    """Return a camera path turning the commander view on a full turn
+
+    Args:
+        frames (int): number of frames of the turn
+        view (int, optional): view rendered. Defaults to 0.
+        elevation (float, optional): elevation of the commander view. Defaults to 0.
+        fov (float, optional): FOV of the view. Defaults to the FOV of the view.
+
+    Returns:
+        list: camera state of each frame
+    """
+    return [{"view": view, "commander_view_angle": 360 * i / frames, "elevation": elevation, "fov": fov} for i in range(frames)]
+
+# If the user directly executes the file
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description = "Render the frames of a camera path without window, on every core")
+    parser.add_argument("output", help = "directory where the frames are written")
+    parser.add_argument("--map", default = "map.agmff", help = "path of the map to render")
+    parser.add_argument("--layout", default = None, help = "JSON file with the {\"x\", \"y\", \"heading\", \"type\"} of each vehicle (defaults to the vehicles of the simulation)")
+    parser.add_argument("--cameras", default = None, help = "JSON file with the {\"view\", \"commander_view_angle\", \"elevation\", \"fov\"} of each frame")
+    parser.add_argument("--sweep", type = int, default = 360, help = "number of frames of a full turn of the commander view, without --cameras")
+    parser.add_argument("--size", type = int, nargs = 2, default = (505, 505), help = "width and height of each frame")
+    parser.add_argument("--format", choices = ["png", "raw"], default = "png", help = "PNG files, or raw (height, width, 3) .npy arrays")
+    parser.add_argument("--workers", type = int, default = None, help = "number of worker processes (defaults to the number of cores)")
+    arguments = parser.parse_args()
+
+    cameras = sweep_cameras(arguments.sweep) if arguments.cameras is None else read_json(arguments.cameras)
+    layout = None if arguments.layout is None else read_json(arguments.layout)
+    measures = render_path(cameras, arguments.output, arguments.map, layout, arguments.size, arguments.format, arguments.workers)
+    print(measures["frames"], "frames on", measures["workers"], "workers in", round(measures["wall time"], 2), "s :", round(measures["frames by second"], 1), "frames by second,", round(measures["render time"] * 1000, 2), "ms by projection3D")
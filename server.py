@@ -0,0 +1,519 @@
+# Server.py
+#
+# ------------- File used to serve the simulation -----------------
+# Contains the Server class to run a headless simulation.
+# The Server class sends a delta-compressed snapshot of the simulation
+# to each connected client at each tick, and applies their inputs.
+# The snapshots are queued into a buffer by client, sent without
+# blocking when its socket is writable, so a slow client never stalls
+# the tick loop.
+# Contains the Client class to mirror a served simulation.
+#
+
+# Import all necessary library
+import numpy as np
+import selectors
+import simulation
+import socket
+import struct
+import time
+import zlib
+
+ENTITY_FIELDS = ("alive", "destroyed_modules", "heading", "health", "vehicle_type", "x", "y") # Fields of the vehicles sent in the snapshots
+FULL = 1 # Flag of a snapshot sent without baseline
+INPUT_FORMAT = "<BH" # Pressed keys bits and number of shells fired
+LENGTH_FORMAT = "<I" # Length of a message before its content
+REGION_FORMAT = "<IIII" # Region of the map changed (x, y, width, height)
+SNAPSHOT_FORMAT = "<IBBfffI" # Tick, flags, view, turret angle, commander view angle, commander view elevation, vehicles capacity
+
+def decode_input(data: bytes) -> tuple:
+    """Decode an input message of a client
+
+    Args:
+        data (bytes): input message
+
+    Returns:
+        tuple: set of the pressed keys and number of shells fired
+    """
+    bits, fires = struct.unpack(INPUT_FORMAT, data)
+    return set(key for i, key in enumerate(simulation.KEYS) if bits & (1 << i)), fires
+
+def encode_input(pressed_keys, fires: int = 0) -> bytes:
+    """Encode an input message of a client
+
+    Args:
+        pressed_keys: collection of the names of the pressed keys (see simulation.KEYS)
+        fires (int, optional): number of shells fired since the last input. Defaults to 0.
+
+    Returns:
+        bytes: input message
+    """
+    bits = sum(1 << i for i, key in enumerate(simulation.KEYS) if key in pressed_keys)
+    return struct.pack(INPUT_FORMAT, bits, min(fires, 0xFFFF))
+
+def frame(data: bytes) -> bytes:
+    """Prefix a message with its length
+
+    Args:
+        data (bytes): message
+
+    Returns:
+        bytes: framed message
+    """
+    return struct.pack(LENGTH_FORMAT, len(data)) + data
+
+class Server:
+    """Class used to run a simulation headless, and serve it to clients through a local socket
+    """
+
+    def __init__(self, simulation_to_serve, host: str = "127.0.0.1", port: int = 0, tick_rate: float = 60, max_outgoing: int = 16 * 1024 * 1024) -> None:
+        """Construct a simulation server
+
+        Args:
+            simulation_to_serve (simulation.Simulation): simulation run by the server
+            host (str, optional): address where the server listens. Defaults to "127.0.0.1".
+            port (int, optional): port where the server listens (0 for a free port). Defaults to 0.
+            tick_rate (float, optional): number of ticks by second. Defaults to 60.
+            max_outgoing (int, optional): maximum size in bytes of the snapshots waiting to be sent to a client, before it is disconnected. Defaults to 16 MiB.
+        """
+        self.clients = {} # Every connected client socket, with its state
+        self.dirty_regions = [] # Regions of the map changed since the last tick
+        self.max_outgoing = max_outgoing
+        self.selector = selectors.DefaultSelector()
+        self.simulation = simulation_to_serve
+        self.tick = 0 # Number of the current tick
+        self.tick_rate = tick_rate
+
+        self.socket = socket.create_server((host, port))
+        self.socket.setblocking(False)
+        self.selector.register(self.socket, selectors.EVENT_READ)
+        self.simulation.get_map().subscribe(self.dirty_regions.append)
+
+    def accept(self) -> None:
+        """Accept a new client
+        """
+        connection, address = self.socket.accept()
+        connection.setblocking(False)
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.clients[connection] = {"baseline": None, "buffer": b"", "events": selectors.EVENT_READ, "fires": 0, "keys": set(), "outgoing": bytearray(), "sent": 0}
+        self.selector.register(connection, selectors.EVENT_READ)
+
+    def close(self) -> None:
+        """Disconnect every client and stop listening
+        """
+        for connection in list(self.clients): self.disconnect(connection)
+        self.selector.unregister(self.socket)
+        self.socket.close()
+        self.selector.close()
+
+    def disconnect(self, connection: socket.socket) -> None:
+        """Disconnect a client
+
+        Args:
+            connection (socket.socket): socket of the client
+        """
+        self.selector.unregister(connection)
+        connection.close()
+        del self.clients[connection]
+
+    def encode_snapshot(self, baseline: dict) -> tuple:
+        """Encode the state of the simulation, only with the vehicles changed since a baseline
+
+        Args:
+            baseline (dict): vehicles fields last sent to the client, or None to send the whole state
+
+        Returns:
+            tuple: compressed snapshot, and the new baseline of the client
+        """
+        entities = self.simulation.get_entities()
+        game_map = self.simulation.get_map()
+        player_state = self.simulation.get_player()
+        capacity = len(entities.alive)
+
+        fields = {name: getattr(entities, name) for name in ENTITY_FIELDS}
+        if baseline is None:
+            changed = np.arange(capacity)
+            regions = [(0, 0, game_map.get_map_WIDTH(), game_map.get_map_HEIGHT())]
+        else:
+            changed = np.zeros(capacity, np.bool_)
+            for name, array in fields.items(): # Compare each field with what the client already has
+                old = baseline[name]
+                changed[:len(old)] |= array[:len(old)] != old
+                changed[len(old):] |= array[len(old):] != 0
+            changed = np.flatnonzero(changed)
+            regions = self.dirty_regions
+
+        data = [struct.pack(SNAPSHOT_FORMAT, self.tick, FULL if baseline is None else 0, player_state.get_view(), player_state.get_turret_angle(), player_state.get_commander_view_angle(), player_state.get_commander_view_elevation(), capacity)]
+        data.append(struct.pack("<I", len(changed)))
+        data.append(changed.astype(np.uint32).tobytes())
+        for array in fields.values(): data.append(array[changed].tobytes())
+
+        flying = self.simulation.get_ballistics().get_flying()
+        shells = np.stack((self.simulation.get_ballistics().x[flying], self.simulation.get_ballistics().y[flying], self.simulation.get_ballistics().z[flying]), 1).astype(np.float32)
+        data.append(struct.pack("<I", len(flying)))
+        data.append(shells.tobytes())
+
+        data.append(struct.pack("<I", len(regions)))
+        for x, y, width, height in regions: # Send the parts of each changed region
+            data.append(struct.pack(REGION_FORMAT, x, y, width, height))
+            data.append(np.ascontiguousarray(game_map.get_parts()[y:y + height, x:x + width], np.int8).tobytes())
+
+        return zlib.compress(b"".join(data), 1), {name: array.copy() for name, array in fields.items()}
+
+    def get_clients(self) -> dict:
+        """Return every connected client, with its state
+
+        Returns:
+            dict: every connected client, with its state
+        """
+        return self.clients
+
+    def get_port(self) -> int:
+        """Return the port where the server listens
+
+        Returns:
+            int: port where the server listens
+        """
+        return self.socket.getsockname()[1]
+
+    def get_simulation(self):
+        """Return the simulation run by the server
+
+        Returns:
+            simulation.Simulation: simulation run by the server
+        """
+        return self.simulation
+
+    def poll(self, timeout: float = 0) -> None:
+        """Accept the new clients and read their inputs
+
+        Args:
+            timeout (float, optional): maximum time waiting for an event, in seconds. Defaults to 0.
+        """
+        for key, events in self.selector.select(timeout):
+            if key.fileobj is self.socket:
+                self.accept()
+                continue
+
+            connection = key.fileobj
+            if events & selectors.EVENT_WRITE:
+                self.send(connection)
+                if connection not in self.clients: continue # Disconnected while sending
+            if not events & selectors.EVENT_READ: continue
+            try:
+                data = connection.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                continue
+            except OSError:
+                data = b""
+            if data == b"": # The client left
+                self.disconnect(connection)
+                continue
+
+            client = self.clients[connection]
+            client["buffer"] += data
+            size = struct.calcsize(INPUT_FORMAT)
+            while len(client["buffer"]) >= size: # Only the last pressed keys matter, the fired shells are added
+                client["keys"], fires = decode_input(client["buffer"][:size])
+                client["fires"] += fires
+                client["buffer"] = client["buffer"][size:]
+
+    def run(self, ticks: int = None) -> None:
+        """Run the server at its tick rate
+
+        Args:
+            ticks (int, optional): number of ticks to run, or None to run forever. Defaults to None.
+        """
+        delta_time = 1 / self.tick_rate
+        next_tick = time.perf_counter()
+        while ticks is None or ticks > 0:
+            self.poll(max(0, next_tick - time.perf_counter()))
+            if time.perf_counter() < next_tick: continue
+            self.step(delta_time)
+            next_tick += delta_time
+            if ticks is not None: ticks -= 1
+
+    def send(self, connection: socket.socket) -> None:
+        """Send as much of the snapshots waiting for a client as its socket takes without blocking
+
+        Args:
+            connection (socket.socket): socket of the client
+        """
+        client = self.clients[connection]
+        try:
+            sent = connection.send(client["outgoing"]) if len(client["outgoing"]) > 0 else 0
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        except OSError:
+            self.disconnect(connection)
+            return
+        del client["outgoing"][:sent]
+        client["sent"] += sent
+
+        events = selectors.EVENT_READ | selectors.EVENT_WRITE if len(client["outgoing"]) > 0 else selectors.EVENT_READ # Only wait for the socket to be writable while something waits
+        if events != client["events"]:
+            self.selector.modify(connection, events)
+            client["events"] = events
+
+    def send_snapshots(self) -> None:
+        """Queue a snapshot for each client, delta-compressed against the last snapshot queued for it, and send what the sockets take
+        """
+        full = None # Snapshot shared by every new client
+        for connection, client in list(self.clients.items()):
+            if client["baseline"] is None:
+                if full is None: full = self.encode_snapshot(None)
+                snapshot, client["baseline"] = full[0], {name: array.copy() for name, array in full[1].items()}
+            else:
+                snapshot, client["baseline"] = self.encode_snapshot(client["baseline"])
+
+            client["outgoing"] += frame(snapshot) # The socket is a stream, so a snapshot queued is always received before the next one
+            self.send(connection)
+            if connection in self.clients and len(client["outgoing"]) > self.max_outgoing: # The client does not read its snapshots anymore
+                self.disconnect(connection)
+        self.dirty_regions.clear()
+
+    def step(self, delta_time: float) -> None:
+        """Run one tick of the simulation, and send the snapshots
+
+        Args:
+            delta_time (float): time of a tick, in seconds
+        """
+        pressed_keys = set()
+        for client in self.clients.values(): # Every client drives the same player tank
+            pressed_keys |= client["keys"]
+            for i in range(client["fires"]): self.simulation.get_player().fire()
+            client["fires"] = 0
+        self.simulation.apply_input(pressed_keys, delta_time)
+        self.simulation.update(delta_time)
+        self.tick += 1
+        self.send_snapshots()
+
+class Client:
+    """Class used to mirror a simulation served by a server
+    """
+
+    def __init__(self, mirror, host: str = "127.0.0.1", port: int = 0) -> None:
+        """Construct a client, connected to a server
+
+        Args:
+            mirror (simulation.Simulation): simulation updated with the snapshots of the server
+            host (str, optional): address of the server. Defaults to "127.0.0.1".
+            port (int, optional): port of the server. Defaults to 0.
+        """
+        self.buffer = b"" # Received datas not decoded yet
+        self.connected = True # If the server is still connected
+        self.mirror = mirror
+        self.received = 0 # Number of bytes received
+        self.shells = np.zeros((0, 3), np.float32) # Pos of each flying shell
+        self.tick = -1 # Tick of the last snapshot applied
+
+        self.selector = selectors.DefaultSelector()
+        self.socket = socket.create_connection((host, port))
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.socket.setblocking(False)
+        self.selector.register(self.socket, selectors.EVENT_READ)
+
+    def apply_snapshot(self, snapshot: bytes) -> None:
+        """Apply a snapshot of the server on the mirror
+
+        Args:
+            snapshot (bytes): compressed snapshot
+        """
+        data = memoryview(zlib.decompress(snapshot))
+        tick, flags, view, turret_angle, commander_view_angle, commander_view_elevation, capacity = struct.unpack_from(SNAPSHOT_FORMAT, data)
+        offset = struct.calcsize(SNAPSHOT_FORMAT)
+
+        player_state = self.mirror.get_player()
+        player_state.set_view(view)
+        player_state.turret_angle = turret_angle
+        player_state.commander_view_angle = commander_view_angle
+        player_state.commander_view_elevation = commander_view_elevation
+        player_state.raise_commander_view(0) # Update the floor offset
+
+        entities = self.mirror.get_entities()
+        if len(entities.alive) < capacity: entities.grow(capacity)
+        count = struct.unpack_from("<I", data, offset)[0]
+        offset += 4
+        changed = np.frombuffer(data, np.uint32, count, offset).astype(np.int64)
+        offset += count * 4
+        for name in ENTITY_FIELDS: # Update the changed vehicles
+            array = getattr(entities, name)
+            array[changed] = np.frombuffer(data, array.dtype, count, offset)
+            offset += count * array.itemsize
+
+        count = struct.unpack_from("<I", data, offset)[0]
+        offset += 4
+        self.shells = np.frombuffer(data, np.float32, count * 3, offset).reshape(count, 3).copy()
+        offset += self.shells.nbytes
+
+        game_map = self.mirror.get_map()
+        count = struct.unpack_from("<I", data, offset)[0]
+        offset += 4
+        for i in range(count): # Update the changed regions of the map
+            x, y, width, height = struct.unpack_from(REGION_FORMAT, data, offset)
+            offset += struct.calcsize(REGION_FORMAT)
+            parts = np.frombuffer(data, np.int8, width * height, offset).reshape(height, width).copy()
+            offset += width * height
+            if flags & FULL and i == 0: game_map.set_parts(width, height, parts)
+            else: game_map.set_region(x, y, width, height, parts)
+        if count > 0: game_map.flush_changes()
+
+        self.tick = tick
+
+    def close(self) -> None:
+        """Disconnect from the server
+        """
+        self.connected = False
+        self.selector.close()
+        self.socket.close()
+
+    def get_connected(self) -> bool:
+        """Return if the server is still connected
+
+        Returns:
+            bool: if the server is still connected
+        """
+        return self.connected
+
+    def get_mirror(self):
+        """Return the simulation updated with the snapshots of the server
+
+        Returns:
+            simulation.Simulation: simulation updated with the snapshots
+        """
+        return self.mirror
+
+    def get_shells(self) -> np.ndarray:
+        """Return the pos of each flying shell
+
+        Returns:
+            np.ndarray: (n, 3) pos of each flying shell
+        """
+        return self.shells
+
+    def get_tick(self) -> int:
+        """Return the tick of the last snapshot applied
+
+        Returns:
+            int: tick of the last snapshot applied, or -1
+        """
+        return self.tick
+
+    def receive(self, timeout: float = 0) -> int:
+        """Apply every snapshot received since the last call, the client is disconnected when the server left (see get_connected)
+
+        Args:
+            timeout (float, optional): maximum time waiting for datas when none are available, in seconds. Defaults to 0.
+
+        Returns:
+            int: number of snapshots applied
+        """
+        if self.connected and timeout > 0: self.selector.select(timeout)
+        while self.connected: # Read everything available
+            try:
+                data = self.socket.recv(1 << 20)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                data = b""
+            if data == b"": # The server left
+                self.connected = False
+                break
+            self.buffer += data
+            self.received += len(data)
+
+        applied = 0
+        size = struct.calcsize(LENGTH_FORMAT)
+        while len(self.buffer) >= size: # Apply each complete snapshot
+            length = struct.unpack_from(LENGTH_FORMAT, self.buffer)[0]
+            if len(self.buffer) < size + length: break
+            self.apply_snapshot(self.buffer[size:size + length])
+            self.buffer = self.buffer[size + length:]
+            applied += 1
+        return applied
+
+    def send_input(self, pressed_keys, fires: int = 0) -> None:
+        """Send the input of the player to the server
+
+        Args:
+            pressed_keys: collection of the names of the pressed keys (see simulation.KEYS)
+            fires (int, optional): number of shells fired since the last input. Defaults to 0.
+        """
+        if not self.connected: return
+        try:
+            self.socket.setblocking(True)
+            self.socket.sendall(encode_input(pressed_keys, fires))
+            self.socket.setblocking(False)
+        except OSError: # The server left
+            self.connected = False
+
+def run_instance(enemies: int, port: int, tick_rate: float, ticks: int, loopback: int, timeout: float = 30) -> dict:
+    """Run a server with loopback clients, and measure it
+
+    Args:
+        enemies (int): number of enemy vehicles crossing the map
+        port (int): port where the server listens (0 for a free port)
+        tick_rate (float): number of ticks by second
+        ticks (int): number of ticks to run
+        loopback (int): number of loopback clients connected to the server
+        timeout (float, optional): maximum time waiting for the clients to connect, and for their last snapshots, in seconds. Defaults to 30.
+
+    Returns:
+        dict: measures of the instance
+    """
+    server = Server(simulation.Simulation(enemies), port = port, tick_rate = tick_rate)
+    clients = [Client(simulation.Simulation(load = False), port = server.get_port()) for i in range(loopback)]
+    deadline = time.perf_counter() + timeout
+    while len(server.get_clients()) < loopback: # Wait for the loopback clients
+        if time.perf_counter() > deadline: raise TimeoutError("Only " + str(len(server.get_clients())) + " of the " + str(loopback) + " loopback clients connected")
+        server.poll(0.1)
+
+    simulation_time = 0
+    for tick in range(ticks):
+        for i, client in enumerate(clients): # Each client turns the turret and fires from time to time
+            client.send_input({"left"} if i % 2 == 0 else {"right"}, 1 if tick % 30 == 0 else 0)
+        server.poll()
+        start = time.perf_counter()
+        server.step(1 / tick_rate)
+        simulation_time += time.perf_counter() - start
+        for client in clients: client.receive()
+
+    deadline = time.perf_counter() + timeout
+    for client in clients: # Wait for the last snapshots, the server sends what is still queued
+        while client.get_tick() < ticks:
+            if not client.get_connected(): raise ConnectionError("Loopback client disconnected at tick " + str(client.get_tick()))
+            if time.perf_counter() > deadline: raise TimeoutError("Loopback client stuck at tick " + str(client.get_tick()) + " of " + str(ticks))
+            server.poll()
+            client.receive(0.01)
+    measures = {"tick time": simulation_time / max(ticks, 1), "bytes sent by client": [c["sent"] for c in server.get_clients().values()]}
+    measures["mirrors match"] = all(np.array_equal(c.get_mirror().get_entities().x[:len(server.get_simulation().get_entities().x)], server.get_simulation().get_entities().x) for c in clients)
+    for client in clients: client.close()
+    server.close()
+    return measures
+
+# If the user directly executes the file
+if __name__ == "__main__":
+    import argparse
+    import multiprocessing
+
+    parser = argparse.ArgumentParser(description = "Run a headless simulation server")
+    parser.add_argument("--enemies", type = int, default = 0, help = "number of enemy vehicles crossing the map")
+    parser.add_argument("--port", type = int, default = 5000, help = "port where the server listens (0 for a free port)")
+    parser.add_argument("--tick-rate", type = float, default = 60, help = "number of ticks by second")
+    parser.add_argument("--loopback", type = int, default = 0, help = "number of loopback clients, to test the server without rendering")
+    parser.add_argument("--ticks", type = int, default = 600, help = "number of ticks run with loopback clients")
+    parser.add_argument("--instances", type = int, default = 1, help = "number of servers run in parallel with loopback clients")
+    arguments = parser.parse_args()
+
+    if arguments.loopback == 0: # Serve render clients until stopped
+        server = Server(simulation.Simulation(arguments.enemies), port = arguments.port, tick_rate = arguments.tick_rate)
+        print("Listening on port", server.get_port())
+        try:
+            server.run()
+        except KeyboardInterrupt:
+            server.close()
+    else: # Load test with loopback clients, each instance on its own free port
+        with multiprocessing.Pool(arguments.instances) as pool:
+            results = pool.starmap(run_instance, [(arguments.enemies, 0, arguments.tick_rate, arguments.ticks, arguments.loopback)] * arguments.instances)
+        for i, measures in enumerate(results):
+            print("Instance", i, "tick", round(measures["tick time"] * 1000, 3), "ms, bytes sent by client", measures["bytes sent by client"], ", mirrors match", measures["mirrors match"])
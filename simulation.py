@@ -0,0 +1,147 @@
+# Simulation.py
+#
+# ------------- File used to simulate the game world --------------
+# Contains the Simulation class to simulate the game world.
+# The Simulation class owns the map, the player tank and the vehicles,
+# and can run without any window (for a headless server).
+#
+
+# Import all necessary library
+import ballistics
+import damage
+import entity
+import map
+import pathfinding
+import player
+import visibility
+
+KEYS = ("left", "right", "q", "d", "a", "e", "z", "s") # Every key with an effect on the simulation, in the order of their bit
+
+class Simulation:
+    """Class used to simulate the game world, without rendering it
+    """
+
+    def __init__(self, enemies: int = 0, load: bool = True, map_path: str = "map.agmff") -> None:
+        """Create a simulation object
+
+        Args:
+            enemies (int, optional): number of enemy vehicles crossing the map. Defaults to 0.
+            load (bool, optional): if the map is loaded now, or filled with "nothing" until a later load. Defaults to True.
+            map_path (str, optional): path of the map to load. Defaults to "map.agmff".
+        """
+        self.map = map.Map(self, map_path, load) # Create the map
+        self.player = player.Player(self) # Create the player
+        self.visibility = visibility.VisibilityField(self) # Create the parts visible from the turret
+        self.map.get_minimap().set_fog(self.visibility)
+        self.ballistics = ballistics.Ballistics(self) # Create the simulation of the fired shells
+        self.pathfinding = pathfinding.Pathfinding(self) # Create the flow fields shared by the enemy vehicles
+        self.entities = entity.EntityStore(self) # Create the enemy vehicles
+        self.entities.spawn(252, 200, 0, 0, 0) #Create a Leopard 2
+        self.entities.spawn_column(enemies)
+        self.damage = damage.DamageModel(self) # Create the damage model of the vehicles
+
+    def apply_input(self, pressed_keys, delta_time: float) -> None:
+        """Apply the keys pressed by the player during a frame
+
+        Args:
+            pressed_keys: collection of the names of the pressed keys (see KEYS)
+            delta_time (float): time between the last frame and this frame
+        """
+        if "left" in pressed_keys: # If the left arrow is pressed, turn at the left
+            self.player.turn_turret(delta_time)
+
+        if "right" in pressed_keys: # If the right arrow is pressed, turn at the right
+            self.player.turn_turret(delta_time, -1)
+
+        if "q" in pressed_keys: # If the Q key is pressed, turn at left
+            self.player.turn_commander_view(delta_time)
+
+        if "d" in pressed_keys: # If the D key is pressed, turn at left
+            self.player.turn_commander_view(delta_time, -1)
+
+        if "a" in pressed_keys: # Set commander view
+            self.player.set_view(0)
+
+        if "e" in pressed_keys: # Set shooter view
+            self.player.set_view(1)
+
+        if "s" in pressed_keys: # Set commander view elevation
+            self.player.raise_commander_view(delta_time)
+
+        if "z" in pressed_keys: # Set shooter view elevation
+            self.player.raise_commander_view(delta_time, -1)
+
+    def get_ballistics(self) -> ballistics.Ballistics:
+        """Return the simulation of the fired shells
+
+        Returns:
+            ballistics.Ballistics: simulation of the fired shells
+        """
+        return self.ballistics
+
+    def get_damage(self) -> damage.DamageModel:
+        """Return the damage model of the vehicles
+
+        Returns:
+            damage.DamageModel: damage model of the vehicles
+        """
+        return self.damage
+
+    def get_entities(self) -> entity.EntityStore:
+        """Return the store of the enemy vehicles
+
+        Returns:
+            entity.EntityStore: store of the enemy vehicles
+        """
+        return self.entities
+
+    def get_map(self) -> map.Map:
+        """Return the main Map in the simulation
+
+        Returns:
+            map.Map: main Map in the simulation
+        """
+        return self.map
+
+    def get_pathfinding(self) -> pathfinding.Pathfinding:
+        """Return the flow fields shared by the enemy vehicles
+
+        Returns:
+            pathfinding.Pathfinding: flow fields shared by the enemy vehicles
+        """
+        return self.pathfinding
+
+    def get_player(self) -> player.Player:
+        """Return the player
+
+        Returns:
+            player.Player: player
+        """
+        return self.player
+
+    def get_sprites(self) -> list:
+        """Return a list of all the sprites in the simulation
+
+        Returns:
+            list: list of all the sprites in the simulation
+        """
+        return self.get_entities().get_sprites()
+
+    def get_visibility(self) -> visibility.VisibilityField:
+        """Return the parts visible from the turret
+
+        Returns:
+            visibility.VisibilityField: parts visible from the turret
+        """
+        return self.visibility
+
+    def update(self, delta_time: float) -> None:
+        """Update the simulation for one frame
+
+        Args:
+            delta_time (float): time between the last frame and this frame
+        """
+        self.get_map().flush_changes() # Update everything built from the map where it changed
+        self.get_entities().update(delta_time) # Move the enemy vehicles
+        self.get_ballistics().update(delta_time) # Move the fired shells
+        self.get_damage().resolve_impacts(self.get_ballistics().get_impacts()) # Damage the vehicles hit
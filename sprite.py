@@ -1,9 +1,9 @@
 # Sprite.py
 #
 # ---------------- File used to handle a sprite -------------------
-# Contains the Player class to handle the player.
-# The Player class provides the player handling.
-#
+# Contains the Sprite class to handle a sprite.
+# Contains the SpriteView class to display a vehicle of an entity store
+# as a sprite, sharing the texture of its vehicle type.
 #
 
 # Import all necessary library
@@ -13,17 +13,19 @@ import os
 import pygame
 import random
 import struct
+import texture
 
 class Sprite:
     """Class used to handle a sprite
     """
 
-    def __init__(self, game, pos: tuple, height: float = 1, length: float = 10, texture_path = "") -> None:
+    def __init__(self, game, pos: tuple, height: float = 1, length: float = 10, texture_path = "", load: bool = True) -> None:
         """Construct a sprite
 
         Args:
             game: main game object
             pos (tuple): pos of the sprite in the map
+            load (bool, optional): if the texture is loaded now, or replaced by a placeholder until a later load. Defaults to True.
         """
         self.game = game
 
@@ -35,7 +37,37 @@ class Sprite:
         self.texture_size = (0, 0)
         self.texture_path = texture_path
 
-        self.load_texture(self.get_texture_path())
+        if load:
+            self.load_texture(self.get_texture_path())
+        else:
+            self.set_texture(*self.placeholder_texture())
+
+    def decode_baked_texture(self, baked_path: str) -> tuple:
+        """Load a baked texture, already decoded with each column contiguous (can be called from another thread)
+
+        Args:
+            baked_path (str): path of the baked texture
+
+        Returns:
+            tuple: surface of the texture and list of every column of the texture
+        """
+        surface = texture.load_baked_levels(baked_path)[0]
+        return surface, [surface.subsurface((i, 0, 1, surface.get_height())) for i in range(surface.get_width())]
+
+    def decode_texture(self, texture_path: str) -> tuple:
+        """Decode a texture and cut it into column, without modifying the sprite (can be called from another thread)
+
+        Args:
+            texture_path (str): path of the texture to decode
+
+        Returns:
+            tuple: surface of the texture and list of every column of the texture
+        """
+        texture = pygame.image.load(texture_path)
+        texture_column = []
+        for i in range(texture.get_width()): # Cut the texture into column
+            texture_column.append(texture.subsurface((i, 0, 1, texture.get_height())).copy())
+        return texture, texture_column
 
     def get_height(self) -> float:
         """Return the height of the sprite
@@ -103,21 +135,116 @@ class Sprite:
             texture_path (str): texture of the sprite
         """
         if self.get_texture_path() != "" and os.path.exists(self.get_texture_path()):
-            self.texture = pygame.image.load(self.get_texture_path())
-            self.texture_column.clear()
-            self.texture_size = (self.texture.get_width(), self.texture.get_height())
+            self.set_texture(*self.decode_texture(self.get_texture_path()))
 
-            for i in range(self.get_texture_size()[0]): # Cut the texture into column
-                new_surface = pygame.Surface((1, self.texture_size[1]), pygame.SRCALPHA)
+    def placeholder_texture(self) -> tuple:
+        """Return a placeholder texture, displayed until the real texture is loaded
+
+        Returns:
+            tuple: surface of the placeholder texture and list of every column of the texture
+        """
+        texture = pygame.Surface((1, 1), pygame.SRCALPHA)
+        texture.fill((128, 128, 128))
+        return texture, [texture]
 
-                for j in range(self.get_texture_size()[1]):
-                    pygame.draw.rect(new_surface, self.texture.get_at((i, j)), (0, j, 1, 1))
+    def set_texture(self, texture: pygame.Surface, texture_column: list) -> None:
+        """Swap the texture of the sprite
 
-                self.texture_column.append(new_surface)
+        Args:
+            texture (pygame.Surface): surface of the new texture
+            texture_column (list): list of every column of the new texture
+        """
+        self.texture = texture
+        self.texture_column = texture_column
+        self.texture_size = (texture.get_width(), texture.get_height())
 
     def update(self, delta_time: float) -> None:
         """Update the sprite for one frame
 
         Args:
             delta_time (float): time in seconds between this frame and the last frame
-        """
\ No newline at end of file
+        """
+
+
+class SpriteView:
+    """Class used to display a vehicle of an entity store as a sprite, without copying its datas
+    """
+
+    __slots__ = ("index", "store")
+
+    def __init__(self, store, index: int) -> None:
+        """Construct a sprite view
+
+        Args:
+            store (entity.EntityStore): store of the vehicle
+            index (int): index of the vehicle in the store
+        """
+        self.index = index
+        self.store = store
+
+    def get_height(self) -> float:
+        """Return the height of the sprite
+
+        Returns:
+            float: height of the sprite
+        """
+        return float(self.store.get_height(self.index))
+
+    def get_index(self) -> int:
+        """Return the index of the vehicle in the store
+
+        Returns:
+            int: index of the vehicle in the store
+        """
+        return self.index
+
+    def get_length(self) -> float:
+        """Return the length of the sprite
+
+        Returns:
+            float: length of the sprite
+        """
+        return float(self.store.get_length(self.index))
+
+    def get_pos(self) -> tuple:
+        """Return the pos of the sprite
+
+        Returns:
+            tuple: pos of the sprite
+        """
+        return (float(self.store.x[self.index]), float(self.store.y[self.index]))
+
+    def get_texture(self) -> pygame.Surface:
+        """Return the surface of the texture, shared by every vehicle of the same type
+
+        Returns:
+            pygame.Surface: surface of the texture
+        """
+        return self.get_type_sprite().get_texture()
+
+    def get_texture_column(self, y: int) -> pygame.Surface:
+        """Return a column of the texture
+
+        Args:
+            y (int): y pos of the texture
+
+        Returns:
+            pygame.Surface: column of the texture
+        """
+        return self.get_type_sprite().get_texture_column(y)
+
+    def get_texture_size(self) -> tuple:
+        """Return the size of the texture
+
+        Returns:
+            tuple: size of the texture
+        """
+        return self.get_type_sprite().get_texture_size()
+
+    def get_type_sprite(self) -> Sprite:
+        """Return the sprite sharing the texture of the vehicle type
+
+        Returns:
+            Sprite: sprite sharing the texture of the vehicle type
+        """
+        return self.store.get_type_sprite(int(self.store.vehicle_type[self.index]))
@@ -0,0 +1,56 @@
+# Conftest.py
+#
+# ------------- File used to share the fixtures of the tests -------------
+# Contains the fixtures used by the tests, which run without window from
+# any directory, with simulations built on small generated maps.
+#
+
+# Import all necessary library
+import os
+import sys
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # No window is ever opened
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # The modules of the game are at the root of the project
+
+import agmff
+import element
+import numpy as np
+import pytest
+import simulation
+
+def random_parts(rng: np.random.Generator, width: int, height: int, density: float = 0.05) -> np.ndarray:
+    """Return random parts, mostly "nothing" with some trees and brick walls
+
+    Args:
+        rng (np.random.Generator): random generator
+        width (int): width of the map
+        height (int): height of the map
+        density (float, optional): part of the map stopping the sight. Defaults to 0.05.
+
+    Returns:
+        np.ndarray: (height, width) parts
+    """
+    registry = element.ElementRegistry()
+    parts = np.full((height, width), registry.get_number("nothing"), np.int8)
+    solid = rng.random((height, width)) < density
+    parts[solid] = rng.choice([registry.get_number("tree"), registry.get_number("brick wall")], int(solid.sum()))
+    return parts
+
+@pytest.fixture
+def rng() -> np.random.Generator:
+    """Return a random generator, the same at each run
+    """
+    return np.random.default_rng(1234)
+
+@pytest.fixture
+def make_simulation(tmp_path):
+    """Return a function creating a simulation on given parts, with its first changes flushed
+    """
+    def make(parts: np.ndarray) -> simulation.Simulation:
+        path = str(tmp_path / "map.agmff")
+        agmff.write_v1(path, parts)
+        created = simulation.Simulation(0, True, path)
+        created.get_map().flush_changes()
+        return created
+    return make
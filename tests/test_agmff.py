@@ -0,0 +1,108 @@
+# Test_agmff.py
+#
+# ------------- File used to test the .agmff files -------------
+# Contains the tests of the read and write functions of every .agmff
+# version, and of the TiledParts class streaming the v2 maps.
+#
+
+# Import all necessary library
+import agmff
+import numpy as np
+import pytest
+from conftest import random_parts
+
+@pytest.mark.parametrize("width, height", [(1, 1), (37, 53), (300, 20)])
+def test_v1_round_trip(tmp_path, rng, width, height):
+    parts = random_parts(rng, width, height, 0.3)
+    path = str(tmp_path / "map.agmff")
+    agmff.write_v1(path, parts)
+
+    loaded_width, loaded_height, loaded = agmff.load(path)
+    assert (loaded_width, loaded_height) == (width, height)
+    assert np.array_equal(loaded, parts)
+
+def test_v1_too_big(tmp_path):
+    path = tmp_path / "map.agmff"
+    with pytest.raises(ValueError):
+        agmff.write_v1(str(path), np.ones((2, agmff.V1_MAX_SIZE + 1), np.int8))
+    assert not path.exists() # No corrupted map is left
+
+@pytest.mark.parametrize("tile_size", [1, 7, 16, 256])
+def test_chunked_round_trip(tmp_path, rng, tile_size):
+    parts = random_parts(rng, 45, 31, 0.3)
+    path = str(tmp_path / "map.agmff")
+    agmff.write_v2(path, parts, tile_size)
+
+    width, height, loaded = agmff.load(path, 64) # Tiny budget, so tiles are evicted
+    try:
+        assert isinstance(loaded, agmff.TiledParts)
+        assert (width, height) == (45, 31) and loaded.shape == parts.shape
+        assert np.array_equal(loaded[:, :], parts)
+        assert np.array_equal(loaded[3:20, 5:44], parts[3:20, 5:44])
+        assert loaded[30, 44] == parts[30, 44] and loaded[-1, -1] == parts[-1, -1]
+        y = rng.integers(0, 31, 100)
+        x = rng.integers(0, 45, 100)
+        assert np.array_equal(loaded.take(y, x), parts[y, x])
+    finally:
+        loaded.close()
+
+def test_tiled_parts_changes(tmp_path, rng):
+    parts = random_parts(rng, 40, 40, 0.3)
+    path = str(tmp_path / "map.agmff")
+    agmff.write_v2(path, parts, 8)
+
+    width, height, loaded = agmff.load(path, 64)
+    try:
+        loaded[5:20, 3:30] = 4
+        parts[5:20, 3:30] = 4
+        loaded[39, 0] = 2
+        parts[39, 0] = 2
+        for ty in range(5):
+            for tx in range(5): loaded.get_tile(ty, tx) # Go through the whole cache, the changed tiles are kept
+        assert np.array_equal(loaded[:, :], parts)
+    finally:
+        loaded.close()
+
+@pytest.mark.parametrize("step", [1, 3, 8, 20])
+def test_tiled_parts_sampled_regions(tmp_path, rng, monkeypatch, step):
+    parts = random_parts(rng, 90, 70, 0.3)
+    path = str(tmp_path / "map.agmff")
+    agmff.write_v2(path, parts, 8)
+
+    width, height, loaded = agmff.load(path)
+    try:
+        read_tiles = []
+        get_tile = loaded.get_tile
+        monkeypatch.setattr(loaded, "get_tile", lambda ty, tx: read_tiles.append((ty, tx)) or get_tile(ty, tx))
+        for y, x in [(slice(None, None, step), slice(None, None, step)), (slice(5, 61, step), slice(11, 90, step)), (slice(3, 4, step), slice(0, 90, step))]:
+            read_tiles.clear()
+            assert np.array_equal(loaded[y, x], parts[y, x])
+            rows, columns = range(*y.indices(70)), range(*x.indices(90))
+            assert sorted(set(read_tiles)) == sorted({(i // 8, j // 8) for i in rows for j in columns}) # Only the tiles of the parts taken are read
+    finally:
+        loaded.close()
+
+def test_raw_round_trip(tmp_path, rng):
+    parts = random_parts(rng, 70, 33, 0.3)
+    path = str(tmp_path / "map.agmff")
+    agmff.write_raw(path, parts)
+
+    width, height, loaded = agmff.load(path)
+    assert (width, height) == (70, 33)
+    assert np.array_equal(loaded, parts)
+
+@pytest.mark.parametrize("map_format", ["v1", "chunked", "raw"])
+def test_convert(tmp_path, rng, map_format):
+    parts = random_parts(rng, 50, 60, 0.3)
+    source = str(tmp_path / "chunked.agmff")
+    destination = str(tmp_path / "converted.agmff")
+    agmff.write_v2(source, parts, 16)
+    agmff.convert(source, destination, map_format, 32)
+
+    width, height, loaded = agmff.load(destination)
+    assert np.array_equal(loaded[:, :], parts)
+    if isinstance(loaded, agmff.TiledParts): loaded.close()
+
+def test_bad_tile_size(tmp_path):
+    with pytest.raises(ValueError):
+        agmff.write_v2(str(tmp_path / "map.agmff"), np.ones((4, 4), np.int8), agmff.V1_MAX_SIZE + 1)
@@ -0,0 +1,70 @@
+# Test_bake.py
+#
+# ------------- File used to test the baked assets -------------
+# Contains the tests of the bake of the textures and of the maps, which
+# must load like their source, and be baked again only when their
+# source changes.
+#
+
+# Import all necessary library
+import agmff
+import bake
+import numpy as np
+import os
+import pygame
+import shutil
+import texture
+from conftest import random_parts
+
+TEXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ressources", "textures") # Textures of the game
+
+def test_baked_assets_load_like_their_source(tmp_path, rng):
+    shutil.copy(os.path.join(TEXTURES, "t90.png"), tmp_path / "t90.png")
+    shutil.copy(os.path.join(TEXTURES, "wood.pixil"), tmp_path / "wood.pixil") # Asked as wood.png
+    parts = random_parts(rng, 40, 30, 0.2)
+    map_path = str(tmp_path / "map.agmff")
+    agmff.write_v1(map_path, parts)
+    directory = str(tmp_path / "baked")
+    textures = [str(tmp_path / "t90.png"), str(tmp_path / "wood.png")]
+
+    result = bake.bake(textures, [map_path], directory)
+    assert sorted(result["baked"]) == sorted(os.path.normpath(path) for path in textures + [map_path])
+    manifest = bake.read_manifest(directory)
+
+    width, height, baked_parts = agmff.load(bake.find_baked(manifest, map_path, directory))
+    assert (width, height) == (40, 30) and np.array_equal(baked_parts, parts)
+    for path, source in zip(textures, [textures[0], str(tmp_path / "wood.pixil")]):
+        levels = texture.load_baked_levels(bake.find_baked(manifest, path, directory))
+        expected = texture.mip_levels(bake.decode_image(source))
+        assert len(levels) == len(expected)
+        for level, expected_level in zip(levels, expected):
+            assert np.array_equal(pygame.surfarray.array3d(level), pygame.surfarray.array3d(expected_level))
+
+def test_only_changed_assets_are_baked_again(tmp_path, rng):
+    map_path = str(tmp_path / "map.agmff")
+    other_path = str(tmp_path / "other.agmff")
+    agmff.write_v1(map_path, random_parts(rng, 20, 20))
+    agmff.write_v1(other_path, random_parts(rng, 20, 20))
+    directory = str(tmp_path / "baked")
+
+    assert len(bake.bake([], [map_path, other_path], directory)["baked"]) == 2
+    result = bake.bake([], [map_path, other_path], directory)
+    assert result["baked"] == [] and len(result["unchanged"]) == 2
+
+    agmff.write_v1(map_path, random_parts(rng, 20, 20, 0.5))
+    assert bake.find_baked(bake.read_manifest(directory), map_path, directory) is None # Changed since the bake
+    result = bake.bake([], [map_path, other_path], directory)
+    assert result["baked"] == [os.path.normpath(map_path)] and result["unchanged"] == [os.path.normpath(other_path)]
+    assert bake.find_baked(bake.read_manifest(directory), map_path, directory) is not None
+
+    baked_other = bake.find_baked(bake.read_manifest(directory), other_path, directory)
+    os.remove(other_path)
+    result = bake.bake([], [map_path], directory)
+    assert result["removed"] == [os.path.normpath(other_path)] and not os.path.exists(baked_other)
+    assert bake.find_baked(bake.read_manifest(directory), other_path, directory) is None
+
+def test_manifest_of_another_version_is_ignored(tmp_path):
+    directory = str(tmp_path / "baked")
+    assert bake.read_manifest(directory) == {"version": bake.MANIFEST_VERSION, "assets": {}}
+    bake.write_manifest(directory, {"version": bake.MANIFEST_VERSION + 1, "assets": {"map.agmff": {}}})
+    assert bake.read_manifest(directory)["assets"] == {}
@@ -0,0 +1,38 @@
+# Test_ballistics.py
+#
+# ------------- File used to test the fired shells -------------
+# Contains the tests of the Ballistics class, whose shells must stop on
+# the thinnest walls whatever their speed and their batch.
+#
+
+# Import all necessary library
+import ballistics
+import numpy as np
+import pytest
+from conftest import random_parts
+
+@pytest.mark.parametrize("max_samples", [1 << 20, 300, 1])
+@pytest.mark.parametrize("vertical", [False, True])
+def test_shells_never_skip_a_wall_of_one_part(rng, make_simulation, max_samples, vertical):
+    parts = random_parts(rng, 128, 128, 0)
+    if vertical: parts[:, 90] = 4 # Brick wall of one part, crossed along the y pos
+    else: parts[90, :] = 4 # Crossed along the x pos (the first index of the parts)
+    created = make_simulation(parts)
+    shells = created.get_ballistics()
+    shells.max_samples = max_samples
+
+    count = 500
+    start = rng.uniform(55, 75, count) # Pos along the crossing axis, before the wall
+    side = rng.uniform(40, 88, count)
+    angle = rng.uniform(-45, 45, count) # Toward the wall, reached before the sides of the map
+    if vertical: fired = shells.fire_batch(side, start, 1, 270 + angle, 0, rng.uniform(100, 2000, count)) # The y axis of the map goes down
+    else: fired = shells.fire_batch(start, side, 1, angle, 0, rng.uniform(100, 2000, count))
+
+    impacts = []
+    for frame in range(10):
+        shells.update(0.1) # Up to 200 parts crossed by frame
+        impacts.append(shells.get_impacts())
+    impacts = np.concatenate(impacts)
+    assert sorted(impacts["shell"]) == sorted(fired)
+    assert np.all(impacts["state"] == ballistics.HIT_PART)
+    assert np.all(np.floor(impacts["y" if vertical else "x"]) == 90)
@@ -0,0 +1,61 @@
+# Test_damage.py
+#
+# ------------- File used to test the damages of the vehicles -------------
+# Contains the tests of the DamageModel class, for the effects of the
+# destroyed modules applied on the vehicles.
+#
+
+# Import all necessary library
+import damage
+import numpy as np
+import pytest
+from conftest import random_parts
+
+MODULE = {name: i for i, name in enumerate(damage.MODULES)} # Index of each module
+
+@pytest.fixture
+def created(rng, make_simulation):
+    """Return a simulation without obstacle
+    """
+    return make_simulation(random_parts(rng, 64, 64, 0))
+
+def spawn(created, count: int) -> np.ndarray:
+    """Spawn stopped Leopard 2 on the map
+
+    Args:
+        created (simulation.Simulation): simulation where the vehicles are spawned
+        count (int): number of vehicles
+
+    Returns:
+        np.ndarray: index of each spawned vehicle
+    """
+    return created.get_entities().spawn(np.arange(count) * 10 + 5, 20, 0, 0)
+
+def test_module_hit_twice_in_a_batch(created):
+    entities = created.get_entities()
+    vehicles = spawn(created, 2)
+    health = entities.health[vehicles].copy()
+    crew_damage = created.get_damage().crew_damage
+
+    created.get_damage().apply(vehicles[[0, 0, 1]], np.array([MODULE["driver"], MODULE["driver"], MODULE["gunner"]]))
+    assert np.allclose(entities.health[vehicles], health - crew_damage) # The driver is only knocked out once
+    created.get_damage().apply(vehicles[[0]], np.array([MODULE["driver"]]))
+    assert np.allclose(entities.health[vehicles], health - crew_damage) # Already knocked out
+    assert entities.destroyed_modules[vehicles[0]] == 1 << MODULE["driver"]
+
+def test_hull_penetrations_add_up(created):
+    entities = created.get_entities()
+    vehicles = spawn(created, 1)
+    health = float(entities.health[vehicles[0]])
+
+    created.get_damage().apply(vehicles[[0, 0, 0]], np.full(3, MODULE["hull"]))
+    assert entities.health[vehicles[0]] == pytest.approx(health - 3 * created.get_damage().hull_damage) # Each shell damages the hull
+
+def test_effects(created):
+    entities = created.get_entities()
+    vehicles = spawn(created, 3)
+
+    created.get_damage().apply(vehicles[[0, 1, 2, 2, 2]], np.array([MODULE["left track"], MODULE["ammo rack"], MODULE["driver"], MODULE["gunner"], MODULE["commander"]]))
+    assert entities.speed[vehicles[0]] == 0 and entities.alive[vehicles[0]]
+    assert not entities.alive[vehicles[1]] # Ammo rack
+    assert not entities.alive[vehicles[2]] # Whole crew
@@ -0,0 +1,39 @@
+# Test_entity.py
+#
+# ------------- File used to test the entity store -------------
+# Contains the tests of the EntityStore class, for the vehicle types
+# and the moves of the vehicles on the map.
+#
+
+# Import all necessary library
+import numpy as np
+import os
+from conftest import random_parts
+
+def test_vehicle_types_have_textures(rng, make_simulation):
+    created = make_simulation(random_parts(rng, 32, 32))
+    vehicle_types = created.get_entities().vehicle_types
+    for vehicle_type in vehicle_types.values():
+        assert os.path.exists(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), vehicle_type["texture"])), vehicle_type["name"]
+
+def test_only_solid_parts_block(rng, make_simulation):
+    created = make_simulation(random_parts(rng, 32, 32, 0))
+    game_map = created.get_map()
+    entities = created.get_entities()
+    game_map.set_part(5, 11, game_map.get_elements("brick wall")) # Part (11, 5) with the ray-cast convention
+    game_map.set_part(20, 11, game_map.get_elements("player's tank")) # Not solid
+    game_map.flush_changes()
+    vehicles = entities.spawn(np.array([10.5, 10.5]), np.array([5.5, 20.5]), 0, 0, 1)
+
+    entities.update(1)
+    assert entities.x[vehicles[0]] == 10.5 and entities.heading[vehicles[0]] != 0 # Blocked by the wall, turns around it
+    assert entities.x[vehicles[1]] == 11.5 # Goes through
+
+def test_spawn_column_without_vehicles(rng, make_simulation):
+    created = make_simulation(random_parts(rng, 32, 32))
+    entities = created.get_entities()
+    alive = entities.alive.copy()
+    for count in (0, -1):
+        assert len(entities.spawn_column(count)) == 0
+    assert np.array_equal(entities.alive, alive)
+    assert len(entities.spawn_column(3)) == 3
@@ -0,0 +1,67 @@
+# Test_loader.py
+#
+# ------------- File used to test the background loader -------------
+# Contains the tests of the Loader class, for the errors of the loaded
+# assets and the maps swapped in with their structures already built.
+#
+
+# Import all necessary library
+import agmff
+import loader
+import numpy as np
+import pathfinding
+import pytest
+from conftest import random_parts
+
+def fail(message: str) -> None:
+    """Decode function always failing
+
+    Args:
+        message (str): message of the error
+    """
+    raise ValueError(message)
+
+def test_error_keeps_other_assets(tmp_path):
+    background = loader.Loader(None, 1, str(tmp_path / "baked"))
+    applied = []
+    try:
+        futures = [background.load(fail, ("broken",), applied.append)]
+        futures += [background.load(lambda value: value, (i,), applied.append) for i in range(3)]
+        for future in futures: future.result(5)
+
+        with pytest.raises(ValueError, match = "broken"):
+            while background.apply_pending() > 0: pass
+        while background.apply_pending() > 0: pass
+    finally:
+        background.stop()
+
+    assert sorted(applied) == [0, 1, 2]
+    assert not background.get_loading()
+
+def test_map_swap_builds_flow_fields(tmp_path, rng, make_simulation, monkeypatch):
+    parts = random_parts(rng, 48, 40, 0.2)
+    new_parts = random_parts(rng, 48, 40, 0.2)
+    for grid in (parts, new_parts): grid[5, 5] = grid[5, 6] = 1 # The goals stay on "nothing"
+    created = make_simulation(parts)
+    flow_field = created.get_pathfinding().get_flow_field([(5, 5), (6, 5)])
+
+    path = str(tmp_path / "new_map.agmff")
+    agmff.write_v1(path, new_parts)
+    background = loader.Loader(created, 1, str(tmp_path / "baked"))
+    try:
+        background.load_map(created.get_map(), path).result(5)
+    finally:
+        background.stop()
+
+    def compute(self, parts = None) -> None:
+        raise AssertionError("flow field computed again in the main thread")
+    with monkeypatch.context() as patch:
+        patch.setattr(pathfinding.FlowField, "compute", compute)
+        assert background.apply_pending() == 1
+        created.get_map().flush_changes()
+
+    assert created.get_pathfinding().get_flow_field([(6, 5), (5, 5)]) is flow_field # The vehicles keep following the same object
+    expected = pathfinding.FlowField(created, flow_field.goals)
+    assert np.array_equal(flow_field.walkable, expected.walkable)
+    assert np.array_equal(flow_field.integration, expected.integration)
+    assert np.array_equal(flow_field.direction, expected.direction)
@@ -0,0 +1,128 @@
+# Test_map.py
+#
+# ------------- File used to test the changes of a map -------------
+# Contains the tests of the mutation API of the Map class, of the
+# changed regions given to its subscribers when they are flushed, and
+# of the line of sight, checked against the walk of the ray-cast.
+#
+
+# Import all necessary library
+import agmff
+import map
+import math
+import numpy as np
+import pytest
+import raycast
+from conftest import random_parts
+
+@pytest.fixture
+def game_map(tmp_path, rng):
+    """Return a 30x20 map with its first changes flushed, and the list of every region its test subscriber got
+    """
+    path = str(tmp_path / "map.agmff")
+    agmff.write_v1(path, random_parts(rng, 30, 20, 0.3))
+    created = map.Map(None, path)
+    created.flush_changes()
+    regions = []
+    created.subscribe(regions.append)
+    return created, regions
+
+def test_subscribers_only_notified_at_flush(game_map):
+    created, regions = game_map
+    created.set_part(3, 4, 4)
+    created.set_region(10, 5, 4, 2, 2)
+    assert regions == [] # Nothing is notified before the flush
+
+    assert created.flush_changes() == 2
+    assert regions == [(3, 4, 1, 1), (10, 5, 4, 2)]
+    assert created.get_part(3, 4) == 4
+    assert np.all(created.get_parts()[5:7, 10:14] == 2)
+    assert created.flush_changes() == 0 # Each change is only notified once
+    assert len(regions) == 2
+
+def test_set_region_clipped(game_map):
+    created, regions = game_map
+    expected = np.array(created.get_parts(), copy = True)
+    new_parts = np.arange(40, dtype = np.int8).reshape(5, 8) % 5
+    created.set_region(-3, 17, 8, 5, new_parts) # Out of the left and the bottom of the map
+    expected[17:20, 0:5] = new_parts[:3, 3:]
+    created.set_region(40, 0, 5, 5, 4) # Out of the map
+    created.flush_changes()
+
+    assert regions == [(0, 17, 5, 3)]
+    assert np.array_equal(created.get_parts(), expected)
+
+def test_set_part_out_of_the_map(game_map):
+    created, regions = game_map
+    with pytest.raises(IndexError):
+        created.set_part(30, 0, 4)
+    assert created.flush_changes() == 0
+
+def test_set_parts_notifies_the_whole_map(game_map, rng):
+    created, regions = game_map
+    built = []
+    created.add_builder(lambda width, height, parts: (width, height), built.append)
+    parts = random_parts(rng, 12, 9)
+    created.set_parts(12, 9, parts, created.prepare(12, 9, parts))
+    assert built == [(12, 9)] # The structures are installed with the parts, before the flush
+    created.flush_changes()
+    assert regions == [(0, 0, 12, 9)]
+
+def test_set_region_streamed(tmp_path, rng):
+    parts = random_parts(rng, 40, 30, 0.3)
+    path = str(tmp_path / "map.agmff")
+    agmff.write_v2(path, parts, 8)
+    created = map.Map(None, path)
+    try:
+        created.flush_changes()
+        regions = []
+        created.subscribe(regions.append)
+        created.set_region(5, 6, 20, 10, 4)
+        parts[6:16, 5:25] = 4
+        created.flush_changes()
+
+        assert regions == [(5, 6, 20, 10)]
+        assert np.array_equal(created.get_parts()[:, :], parts)
+    finally:
+        created.get_parts().close()
+
+def walk_segment(game_map, x0: float, y0: float, x1: float, y1: float) -> tuple:
+    """Return if the end of a segment is visible with the reference ray-cast, walked on both sides of the segment (a corner touched blocks it)
+
+    Args:
+        game_map (map.Map): map of the segment
+        x0, y0 (float): start of the segment
+        x1, y1 (float): end of the segment
+
+    Returns:
+        tuple: if the end is visible, the distance of the first blocking part and the cells blocking at this distance
+    """
+    length = math.hypot(x1 - x0, y1 - y0)
+    if length == 0: return True, -1, []
+    blockers = []
+    for shift in (-1e-6, 1e-6): # Rays right beside the segment, each taking one side of the corners crossed
+        hits = raycast.ReferenceBackend().cast(game_map, (x0, y0), math.degrees(math.atan2(y0 - y1, x1 - x0)) + shift, 1, 1)
+        if len(hits) > 0 and hits[0].cell != (math.floor(x1), math.floor(y1)) and hits[0].length < length: blockers.append((hits[0].length, hits[0].cell))
+    if len(blockers) == 0: return True, -1, []
+    distance = min(blockers)[0]
+    return False, distance, [cell for blocker_distance, cell in blockers if blocker_distance == pytest.approx(distance)]
+
+def test_line_of_sight_matches_the_ray_cast(game_map, rng):
+    created, regions = game_map
+    size_x, size_y = created.get_ray_size() # The x pos is the first index of the parts
+    segments = [tuple(rng.uniform(0, [size_x, size_y, size_x, size_y])) for i in range(1000)]
+    for i in range(100): # From the center of a part: along an axis, on an exact diagonal and of a length of 0
+        x, y = rng.integers(0, [size_x, size_y]) + 0.5
+        size = int(rng.integers(1, 8))
+        step_x, step_y = rng.choice([-1, 1], 2)
+        segments += [(x, y, x + step_x * size, y), (x, y, x, y + step_y * size), (x, y, x + step_x * size, y + step_y * size), (x, y, x, y)]
+    segments = np.array([s for s in segments if 0 <= min(s[0], s[2]) and max(s[0], s[2]) < size_x and 0 <= min(s[1], s[3]) and max(s[1], s[3]) < size_y])
+
+    visible, blocker_x, blocker_y, blocker_part, blocker_distance = created.line_of_sight(*segments.T)
+    for i, segment in enumerate(segments):
+        expected_visible, expected_distance, expected_cells = walk_segment(created, *segment)
+        assert visible[i] == expected_visible, segment
+        if expected_visible: continue
+        assert (blocker_x[i], blocker_y[i]) in expected_cells, segment
+        assert blocker_distance[i] == pytest.approx(expected_distance), segment
+        assert blocker_part[i] == created.get_part(blocker_y[i], blocker_x[i])
@@ -0,0 +1,53 @@
+# Test_minimap.py
+#
+# ------------- File used to test the minimap -------------
+# Contains the tests of the Minimap class, whose updated regions must
+# be the minimap built again on the whole map, with its fog of war,
+# without reading the fog of the whole map.
+#
+
+# Import all necessary library
+import agmff
+import map
+import numpy as np
+import pygame
+import pytest
+import simulation
+import visibility
+from conftest import random_parts
+
+def assert_built_again(created) -> None:
+    """Check that the minimap of a simulation is the minimap built again on the whole map
+
+    Args:
+        created (simulation.Simulation): simulation of the minimap
+    """
+    minimap = created.get_map().get_minimap()
+    surface = minimap.get_surface() # Updated first, with the step of the map size
+    step = minimap.step
+    colors = minimap.palette[np.asarray(created.get_map().get_parts()[::step, ::step]).view(np.uint8)]
+    colors[~visibility.VisibilityField.get_visible(created.get_visibility())[::step, ::step]] //= 3 # The whole bitmap, even if the field forbids it
+    assert step > 1 or minimap.max_size >= 90
+    assert np.array_equal(pygame.surfarray.array3d(surface).transpose(1, 0, 2), colors)
+
+@pytest.mark.parametrize("max_size", [1024, 30, 7])
+@pytest.mark.parametrize("streamed", [False, True])
+def test_dirty_regions_match_the_whole_minimap(tmp_path, rng, monkeypatch, max_size, streamed):
+    parts = random_parts(rng, 90, 70, 0.1)
+    path = str(tmp_path / "map.agmff")
+    if streamed: agmff.write_v2(path, parts, 16)
+    else: agmff.write_v1(path, parts)
+    created = simulation.Simulation(0, True, path)
+    game_map = created.get_map()
+    try:
+        game_map.get_minimap().max_size = max_size
+        game_map.flush_changes()
+        assert_built_again(created)
+        monkeypatch.setattr(created.get_visibility(), "get_visible", None) # Only the fog of the dirty regions is read
+        for trial in range(20): # The fog changes with the parts
+            x, y = rng.integers(-2, [90, 70])
+            game_map.set_region(x, y, *rng.integers(1, 12, 2), game_map.get_elements("brick wall" if rng.random() < 0.5 else "nothing"))
+            game_map.flush_changes()
+            assert_built_again(created)
+    finally:
+        if isinstance(game_map.get_parts(), agmff.TiledParts): game_map.get_parts().close()
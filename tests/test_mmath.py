@@ -0,0 +1,44 @@
+# Test_mmath.py
+#
+# ------------- File used to test the math functions -------------
+# Contains the tests of the array functions of mmath, which must give
+# the results of their scalar functions for each element.
+#
+
+# Import all necessary library
+import mmath
+import numpy as np
+import pytest
+
+ANGLES = [0, -0.0, 360, 720, -360, -720, 1e-9, -1e-9, -1e-20, 359.9999, -90, -180.5, 45, 90, 180, 270, 1000.25, -1000.25] # Full turns, and angles right beside them
+
+def test_normalize_angles_matches_normalize_angle():
+    normalized = mmath.normalize_angles(np.array(ANGLES))
+    for angle, result in zip(ANGLES, normalized):
+        assert result == mmath.normalize_angle(angle), angle
+        assert 0 <= result <= 360, angle
+    assert mmath.normalize_angle(0) == 0 and mmath.normalize_angle(360) == 360 and mmath.normalize_angle(-360) == 0 # A positive full turn stays 360
+    assert mmath.normalize_angles(np.zeros((2, 3))).shape == (2, 3)
+
+def test_direction_vectors_match_direction_vector():
+    x, y = mmath.direction_vectors(np.array(ANGLES))
+    for angle, vector_x, vector_y in zip(ANGLES, x, y):
+        assert (vector_x, vector_y) == pytest.approx(mmath.direction_vector(angle), abs = 1e-12), angle
+    radians = np.radians(ANGLES)
+    x, y = mmath.direction_vectors_from_radians(radians)
+    for radian, vector_x, vector_y in zip(radians, x, y):
+        assert (vector_x, vector_y) == mmath.direction_vector_from_radian(radian)
+
+def test_distances2D_matches_distance2D(rng):
+    points = rng.uniform(-100, 100, (4, 200))
+    points[:, :3] = [[0, 5, -3], [0, 5, 4], [0, 5, 0], [0, 5, 0]] # The same point, and negative coordinates
+    distances = mmath.distances2D(*points)
+    for i in range(points.shape[1]):
+        assert distances[i] == pytest.approx(mmath.distance2D(*points[:, i]), rel = 1e-12)
+    assert distances[0] == 0 and distances[1] == 0 and distances[2] == 5
+
+def test_vectors_with_one_as_a_part_match_vector_with_one_as_a_part(rng):
+    vectors = np.concatenate((rng.uniform(-10, 10, (2, 50)), [[0, 3, 0, -2], [4, 0, 0, -2]]), 1) # With a coordinate of 0
+    x, y = mmath.vectors_with_one_as_a_part(*vectors)
+    for i in range(vectors.shape[1]):
+        assert (x[i], y[i]) == pytest.approx(mmath.vector_with_one_as_a_part(tuple(vectors[:, i])), rel = 1e-12)
@@ -0,0 +1,61 @@
+# Test_pathfinding.py
+#
+# ------------- File used to test the flow fields -------------
+# Contains the tests of the FlowField class, whose repair after a
+# change of the map must give the field computed again from scratch.
+#
+
+# Import all necessary library
+import numpy as np
+import pathfinding
+import pytest
+from conftest import random_parts
+
+def assert_computed_again(flow_field, created) -> None:
+    """Check that a flow field is the same as the flow field computed again on the map
+
+    Args:
+        flow_field (pathfinding.FlowField): repaired flow field
+        created (simulation.Simulation): simulation of the map
+    """
+    expected = pathfinding.FlowField(created, flow_field.goals)
+    assert np.array_equal(flow_field.walkable, expected.walkable)
+    assert np.array_equal(flow_field.integration, expected.integration)
+    assert np.array_equal(flow_field.direction, expected.direction)
+
+@pytest.mark.parametrize("width, height", [(40, 40), (57, 33)])
+def test_repair_matches_compute(rng, make_simulation, width, height):
+    parts = random_parts(rng, width, height, 0.25)
+    parts[:2, :2] = 1 # The goals stay on "nothing"
+    created = make_simulation(parts)
+    game_map = created.get_map()
+    flow_field = created.get_pathfinding().get_flow_field([(0, 0), (1, 1)])
+
+    for i in range(60):
+        x, y = int(rng.integers(2, width - 1)), int(rng.integers(2, height - 1))
+        size_x, size_y = rng.integers(1, 6, 2)
+        if rng.random() < 0.5: # Walls built
+            game_map.set_region(x, y, int(size_x), int(size_y), game_map.get_elements("brick wall"))
+        else: # Parts destroyed
+            game_map.set_region(x, y, int(size_x), int(size_y), game_map.get_elements("nothing"))
+        game_map.flush_changes()
+        assert_computed_again(flow_field, created)
+
+def test_repair_cutting_the_goal(rng, make_simulation):
+    parts = random_parts(rng, 30, 30, 0.1)
+    parts[10:13, 10:13] = 1
+    created = make_simulation(parts)
+    game_map = created.get_map()
+    flow_field = created.get_pathfinding().get_flow_field([(11, 11)])
+
+    game_map.set_region(9, 9, 5, 1, game_map.get_elements("brick wall")) # Wall the goal in
+    game_map.set_region(9, 13, 5, 1, game_map.get_elements("brick wall"))
+    game_map.set_region(9, 10, 1, 3, game_map.get_elements("brick wall"))
+    game_map.set_region(13, 10, 1, 3, game_map.get_elements("brick wall"))
+    game_map.flush_changes()
+    assert_computed_again(flow_field, created)
+    assert np.count_nonzero(flow_field.integration != pathfinding.INFINITE) == 9 # Only the walled parts reach the goal
+
+    game_map.set_region(13, 11, 1, 1, game_map.get_elements("nothing")) # Open the wall again
+    game_map.flush_changes()
+    assert_computed_again(flow_field, created)
@@ -0,0 +1,105 @@
+# Test_player.py
+#
+# ------------- File used to test the player views -------------
+# Contains the tests of the Player class, for the ray-casts of the
+# turret and of the views, sharing their rays on the same grid, and of
+# the 3D projection, only drawing what nothing nearer covers.
+#
+
+# Import all necessary library
+import agmff
+import numpy as np
+import os
+import pygame
+import pytest
+import raycast
+import render
+import texture
+from conftest import random_parts
+
+def make_scene(tmp_path, monkeypatch, parts: np.ndarray, layout: list, y_offset: float, hits: list) -> render.RenderScene:
+    """Return a render scene whose rays all touch the same parts
+
+    Args:
+        tmp_path: directory of the map
+        monkeypatch: monkeypatch of the test
+        parts (np.ndarray): parts of the map
+        layout (list): layout of the vehicles
+        y_offset (float): y offset of the view
+        hits (list): (length, part) of each part touched by each ray
+
+    Returns:
+        render.RenderScene: render scene
+    """
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # The textures are found from the root of the project
+    path = str(tmp_path / "map.agmff")
+    agmff.write_v1(path, parts)
+    scene = render.RenderScene(path, layout, (parts.shape[1], parts.shape[0]), y_offset)
+    player_state = scene.get_player()
+    ray_cast_view = player_state.ray_cast_view
+    monkeypatch.setattr(player_state, "ray_cast_view", lambda angle, fov: [(i, ray_angle, [raycast.RayHit(length, (0, 0), part, 1, ray_angle, 0.5, (0, 0)) for length, part in hits]) for i, ray_angle, ray_hits in ray_cast_view(angle, fov)])
+    return scene
+
+def test_ray_cast_turret(rng, make_simulation):
+    created = make_simulation(random_parts(rng, 61, 61, 0.1))
+    player_state = created.get_player()
+    for angle in range(0, 360, 15):
+        player_state.turret_angle = angle
+        hits = raycast.ReferenceBackend().cast(created.get_map(), player_state.get_base_pos(), angle, player_state.get_y_offset(), 1)
+        assert player_state.ray_cast_turret() == (hits[0] if len(hits) > 0 else None)
+
+def test_gunner_view_reuses_the_rays_of_the_commander_view(rng, make_simulation, monkeypatch):
+    created = make_simulation(random_parts(rng, 61, 61, 0.1))
+    player_state = created.get_player()
+    backend = player_state.get_raycast_backend()
+    cast_many = backend.cast_many
+    cast_angles = []
+    monkeypatch.setattr(backend, "cast_many", lambda game_map, origin, angles, y_offset, max_layers: cast_angles.append(list(angles)) or cast_many(game_map, origin, angles, y_offset, max_layers))
+
+    for commander_fov, shooter_fov in [(45, 10), (45, 20), (30, 60)]:
+        player_state.set_fov(0, commander_fov)
+        player_state.set_fov(1, shooter_fov)
+        assert player_state.ray_angle_step == min(commander_fov, shooter_fov) / 255
+        cast_angles.clear()
+        commander_rays = player_state.ray_cast_view(0, commander_fov)
+        gunner_rays = player_state.ray_cast_view(4, shooter_fov) # Picture in picture, inside the commander view
+        assert len(cast_angles) == 2
+        shared = {angle for i, angle, hits in commander_rays} & {angle for i, angle, hits in gunner_rays}
+        assert len(shared) > 0 and len(cast_angles[1]) == len({angle for i, angle, hits in gunner_rays} - shared) # Only the rays missing from the commander view are cast
+        player_state.ray_cast_view(0, commander_fov)
+        player_state.ray_cast_view(4, shooter_fov)
+        assert len(cast_angles) == 2 # Both views are in the cache
+
+    cast_angles.clear()
+    player_state.set_fov(1, 60) # Same grid
+    player_state.ray_cast_view(0, 30)
+    assert cast_angles == []
+
+def test_full_column_stops_drawing(tmp_path, monkeypatch, rng):
+    scene = make_scene(tmp_path, monkeypatch, random_parts(rng, 61, 61, 0), [], 1, [(1.5, 4), (10, 4), (20, 2)]) # A wall filling every column, in front of a wall and a tree
+    drawn = pygame.surfarray.array3d(scene.render({})).copy()
+    uncovered_spans = raycast.get_uncovered_spans
+    calls = []
+    monkeypatch.setattr(raycast, "get_uncovered_spans", lambda coverage, top, bottom: calls.append((top, bottom)) or uncovered_spans(coverage, top, bottom))
+    assert np.array_equal(pygame.surfarray.array3d(scene.render({})), drawn)
+    assert len(calls) == 255 # Only the nearest wall of each column is drawn
+
+    front_only = make_scene(tmp_path, monkeypatch, random_parts(rng, 61, 61, 0), [], 1, [(1.5, 4)])
+    assert np.array_equal(pygame.surfarray.array3d(front_only.render({})), drawn)
+
+def test_partly_covered_sprite_is_clipped(tmp_path, monkeypatch, rng):
+    scene = make_scene(tmp_path, monkeypatch, random_parts(rng, 201, 201, 0), [{"x": 141, "y": 101}], 8, [(20, 4)]) # A Leopard 2 behind a wall, seen from above the wall
+    player_state = scene.get_player()
+    monkeypatch.setattr(scene.get_textures(), "get_texture", lambda part: None) # Only the sprites draw scaled columns
+    wall_top, wall_height = player_state.project(20, 5)
+    sprite_top, sprite_height = player_state.project(40, 3)
+    assert sprite_top < wall_top < sprite_top + sprite_height # The top of the sprite is seen above the wall
+
+    draw_scaled_column = texture.draw_scaled_column
+    spans = []
+    monkeypatch.setattr(texture, "draw_scaled_column", lambda surface, column, x, y, width, height, top = None, bottom = None: spans.append((y, height, top, bottom)) or draw_scaled_column(surface, column, x, y, width, height, top, bottom))
+    scene.render({})
+    assert len(spans) > 0
+    for y, height, top, bottom in spans: # Only the part of the sprite above the wall is drawn
+        assert (y, height) == pytest.approx((sprite_top, sprite_height))
+        assert (top, bottom) == pytest.approx((sprite_top, wall_top))
@@ -0,0 +1,111 @@
+# Test_raycast.py
+#
+# ------------- File used to test the ray-cast backends -------------
+# Contains the tests of the ray-cast backends, which must touch the
+# same parts as the reference backend on in-memory and streamed maps,
+# and whose walk stops once every farther part is hidden, on square and
+# non-square maps.
+#
+
+# Import all necessary library
+import agmff
+import map
+import math
+import numpy as np
+import pytest
+import raycast
+from conftest import random_parts
+
+@pytest.fixture
+def game_map(tmp_path, rng):
+    """Return a 61x61 map with many trees and brick walls
+    """
+    path = str(tmp_path / "map.agmff")
+    agmff.write_v1(path, random_parts(rng, 61, 61, 0.15))
+    return map.Map(None, path)
+
+ANGLES = [i * 360 / 97 for i in range(97)] + [0, 45, 90, 135, 180, 225, 270, 315] # Rays on the axis and diagonals too
+
+@pytest.mark.parametrize("max_layers", [1, 3, 6, 20])
+@pytest.mark.parametrize("y_offset", [-50, 0, 0.5, 1, 15])
+@pytest.mark.parametrize("name", ["numpy", "jit"])
+def test_backends_match_reference(game_map, name, y_offset, max_layers):
+    for origin in [(30.5, 30.5), (31, 30), (2.3, 57.9), (60.99, 0.01)]:
+        assert raycast.check_conformance(raycast.get_backend(name), game_map, origin, ANGLES, (y_offset,), max_layers) == []
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 32, 200])
+def test_numpy_chunk_sizes_match_reference(game_map, chunk_size):
+    assert raycast.check_conformance(raycast.NumpyBackend(chunk_size), game_map, (30.5, 30.5), ANGLES, (1, -50, 15), 6) == []
+
+@pytest.mark.parametrize("name", list(raycast.BACKENDS))
+def test_streamed_map_matches_reference(tmp_path, rng, name):
+    parts = random_parts(rng, 70, 50, 0.1)
+    path = str(tmp_path / "map.agmff")
+    agmff.write_v1(path, parts)
+    in_memory = map.Map(None, path)
+    agmff.write_v2(path, parts, 16)
+    streamed = map.Map(None, path)
+    try:
+        assert isinstance(streamed.get_parts(), agmff.TiledParts)
+        origin = (25.5, 35.5)
+        assert raycast.check_conformance(raycast.get_backend(name), streamed, origin, ANGLES, (1, 0.5, -50), 6, reference = raycast.ReferenceBackend()) == []
+        assert raycast.get_backend(name).cast_many(streamed, origin, ANGLES, 1, 6) == raycast.ReferenceBackend().cast_many(in_memory, origin, ANGLES, 1, 6)
+    finally:
+        streamed.get_parts().close()
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        raycast.get_backend("unknown")
+
+@pytest.mark.parametrize("y_offset", [-50, -3, 0, 0.5, 1, 5, 10, 15, 40])
+@pytest.mark.parametrize("name", list(raycast.BACKENDS))
+def test_early_termination_keeps_visible_parts(game_map, monkeypatch, name, y_offset):
+    backend = raycast.get_backend(name)
+    heights = game_map.get_element_registry().get_heights()
+    angles = [i * 7.3 for i in range(50)]
+    hits = backend.cast_many(game_map, (30.5, 30.5), angles, y_offset, 1000)
+    with monkeypatch.context() as patch:
+        patch.setattr(raycast, "get_farther_span", lambda y_offset, maximum_height, length: (-math.inf, math.inf)) # Never stop before the edge of the map
+        every_hits = backend.cast_many(game_map, (30.5, 30.5), angles, y_offset, 1000)
+
+    for angle, ray_hits, every_ray_hits in zip(angles, hits, every_hits):
+        assert [hit.cell for hit in ray_hits] == [hit.cell for hit in every_ray_hits[:len(ray_hits)]]
+        coverage = []
+        for i, hit in enumerate(every_ray_hits):
+            top, bottom = (y_offset - heights[hit.part]) / hit.length, y_offset / hit.length
+            if len(raycast.get_uncovered_spans(coverage, top, bottom)) > 0: # Visible part
+                assert i < len(ray_hits), (angle, hit.cell)
+            raycast.cover_span(coverage, top, bottom)
+
+@pytest.mark.parametrize("width, height", [(40, 90), (90, 40)])
+@pytest.mark.parametrize("name", list(raycast.BACKENDS))
+def test_rays_reach_the_edges_of_a_non_square_map(tmp_path, name, width, height):
+    parts = np.ones((height, width), np.int8)
+    parts[[0, -1], :] = parts[:, [0, -1]] = 4 # Brick walls all around the map
+    path = str(tmp_path / "map.agmff")
+    agmff.write_v1(path, parts)
+    game_map = map.Map(None, path)
+    size = game_map.get_ray_size()
+    assert size == (height, width) # The x pos is the first index of the parts
+
+    angles = [i * 3.7 for i in range(98)]
+    for angle, hits in zip(angles, raycast.get_backend(name).cast_many(game_map, (size[0] / 2 + 0.25, size[1] / 2 + 0.25), angles, 1, 6)):
+        assert len(hits) > 0, angle
+        for x, y in (hit.cell for hit in hits): # Only the walls around the map are touched
+            assert x in (0, size[0] - 1) or y in (0, size[1] - 1), angle
+
+@pytest.mark.parametrize("name", list(raycast.BACKENDS))
+def test_leaves_of_a_tree_behind_a_tree_are_kept(tmp_path, name):
+    parts = np.ones((61, 61), np.int8)
+    parts[[32, 34], 30] = 2 # A tree behind a tree, on the ray (the x pos is the first index of the parts)
+    path = str(tmp_path / "map.agmff")
+    agmff.write_v1(path, parts)
+    game_map = map.Map(None, path)
+    registry = game_map.get_element_registry()
+    y_offset = 5
+
+    hits = raycast.get_backend(name).cast(game_map, (30.5, 30.5), 0, y_offset, 6)
+    assert [hit.cell for hit in hits] == [(32, 30), (34, 30)]
+    near, far = hits
+    trunk_top = (y_offset - registry.get_heights()[2]) / near.length
+    assert (y_offset - registry.get_heights()[2] - registry.get_leaves_widths()[2]) / far.length < trunk_top # The leaves of the far tree are seen above the near trunk
@@ -0,0 +1,47 @@
+# Test_render.py
+#
+# ------------- File used to test the render without window -------------
+# Contains the tests of the RenderScene class, whose frames only depend
+# on their camera state, whatever the frames rendered before.
+#
+
+# Import all necessary library
+import agmff
+import numpy as np
+import os
+import pygame
+import pytest
+import render
+from conftest import random_parts
+
+@pytest.fixture
+def scene(tmp_path, rng, monkeypatch):
+    """Return a render scene of a 61x61 map, with small frames
+    """
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # The textures are found from the root of the project
+    path = str(tmp_path / "map.agmff")
+    agmff.write_v1(path, random_parts(rng, 61, 61, 0.1))
+    return render.RenderScene(path, [{"x": 33.5, "y": 30.5}, {"x": 30.5, "y": 36.5, "heading": 90}], (101, 101))
+
+def pixels(surface: pygame.Surface) -> np.ndarray:
+    """Return the pixels of a frame
+
+    Args:
+        surface (pygame.Surface): rendered frame
+
+    Returns:
+        np.ndarray: (width, height, 3) pixels of the frame
+    """
+    return pygame.surfarray.array3d(surface).copy()
+
+@pytest.mark.parametrize("view", [0, 1])
+def test_default_fov_is_restored(scene, view):
+    camera = {"view": view, "commander_view_angle": 30}
+    default_fovs = (scene.get_player().get_commander_view_fov(), scene.get_player().get_shooter_view_fov())
+    before = pixels(scene.render(camera))
+    zoomed = pixels(scene.render({**camera, "fov": default_fovs[view] / 2}))
+    other_view = pixels(scene.render({"view": 1 - view, "fov": 20}))
+    assert not np.array_equal(zoomed, before)
+    assert np.array_equal(pixels(scene.render(camera)), before) # Same frame, whatever the frames before
+    assert (scene.get_player().get_commander_view_fov(), scene.get_player().get_shooter_view_fov()) == default_fovs
+    assert np.array_equal(pixels(scene.render({"view": 1 - view, "fov": 20})), other_view)
@@ -0,0 +1,142 @@
+# Test_server.py
+#
+# ------------- File used to test the simulation server -------------
+# Contains the tests of the Server and Client classes, for the mirror
+# updated by the delta-compressed snapshots, and the slow or leaving
+# peers.
+#
+
+# Import all necessary library
+import numpy as np
+import pytest
+import server
+import simulation
+import socket
+import time
+from conftest import random_parts
+
+def connect(served, mirror) -> server.Client:
+    """Connect a client to a server, and wait until it is accepted
+
+    Args:
+        served (server.Server): server to connect to
+        mirror (simulation.Simulation): simulation updated by the client
+
+    Returns:
+        server.Client: connected client
+    """
+    client = server.Client(mirror, port = served.get_port())
+    deadline = time.perf_counter() + 5
+    while len(served.get_clients()) == 0 and time.perf_counter() < deadline: served.poll(0.05)
+    assert len(served.get_clients()) == 1
+    return client
+
+def receive_tick(served, client, tick: int) -> None:
+    """Receive the snapshots until a tick, while the server sends what is queued
+
+    Args:
+        served (server.Server): server sending the snapshots
+        client (server.Client): client receiving the snapshots
+        tick (int): tick to wait for
+    """
+    deadline = time.perf_counter() + 5
+    while client.get_tick() < tick and client.get_connected() and time.perf_counter() < deadline:
+        served.poll()
+        client.receive(0.01)
+    assert client.get_tick() == tick
+
+def assert_mirrored(served, client) -> None:
+    """Check that the mirror of a client is the same as the simulation of the server
+
+    Args:
+        served (server.Server): server of the simulation
+        client (server.Client): client of the mirror
+    """
+    entities = served.get_simulation().get_entities()
+    mirrored = client.get_mirror().get_entities()
+    for name in server.ENTITY_FIELDS:
+        assert np.array_equal(getattr(mirrored, name)[:len(entities.alive)], getattr(entities, name)), name
+    assert np.array_equal(client.get_mirror().get_map().get_parts(), served.get_simulation().get_map().get_parts())
+
+@pytest.fixture
+def served(rng, make_simulation):
+    """Return a server of a simulation on a 64x48 map, closed after the test
+    """
+    created = server.Server(make_simulation(random_parts(rng, 64, 48, 0.2)))
+    yield created
+    created.close()
+
+def test_snapshot_delta_round_trip(served):
+    client = connect(served, simulation.Simulation(load = False))
+    try:
+        served.step(1 / 60)
+        receive_tick(served, client, 1)
+        assert_mirrored(served, client)
+        full_size = client.received
+
+        game_map = served.get_simulation().get_map()
+        entities = served.get_simulation().get_entities()
+        entities.spawn(np.array([10, 20, 30]), 24, 0, np.array([0, 1, 2]))
+        game_map.set_region(5, 6, 3, 2, game_map.get_elements("brick wall"))
+        game_map.set_part(60, 40, game_map.get_elements("tree"))
+        for tick in range(2, 6):
+            served.step(1 / 60)
+            receive_tick(served, client, tick)
+            assert_mirrored(served, client)
+
+        before = client.received
+        served.step(1 / 60)
+        receive_tick(served, client, 6)
+        assert client.received - before < full_size # Only the changes are sent
+    finally:
+        client.close()
+
+def test_slow_client_never_blocks_the_tick(served, rng):
+    served.get_simulation().get_map().set_parts(512, 512, random_parts(rng, 512, 512, 0.5)) # Big incompressible first snapshot
+    client = connect(served, simulation.Simulation(load = False))
+    try:
+        connection = next(iter(served.get_clients()))
+        connection.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        client.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+
+        start = time.perf_counter()
+        for i in range(3): served.step(1 / 60) # The client reads nothing
+        assert time.perf_counter() - start < 5
+        assert len(served.get_clients()[connection]["outgoing"]) > 0 # The snapshots wait for the client
+
+        receive_tick(served, client, 3) # Sent as the client reads
+        assert_mirrored(served, client)
+        assert len(served.get_clients()[connection]["outgoing"]) == 0
+    finally:
+        client.close()
+
+def test_client_too_slow_is_disconnected(served, rng):
+    served.max_outgoing = 1024
+    served.get_simulation().get_map().set_parts(512, 512, random_parts(rng, 512, 512, 0.5))
+    client = connect(served, simulation.Simulation(load = False))
+    try:
+        next(iter(served.get_clients())).setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        client.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        served.step(1 / 60)
+        assert len(served.get_clients()) == 0
+
+        deadline = time.perf_counter() + 5
+        while client.get_connected() and time.perf_counter() < deadline: client.receive(0.01)
+        assert not client.get_connected() # The client sees the server leave
+    finally:
+        client.close()
+
+def test_server_leaving(served):
+    client = connect(served, simulation.Simulation(load = False))
+    try:
+        served.step(1 / 60)
+        receive_tick(served, client, 1)
+        for connection in list(served.get_clients()): served.disconnect(connection)
+
+        deadline = time.perf_counter() + 5
+        while client.get_connected() and time.perf_counter() < deadline:
+            assert client.receive(0.01) == 0 # No spin on the closed socket
+        assert not client.get_connected()
+        client.send_input({"left"}) # Ignored, without error
+    finally:
+        client.close()
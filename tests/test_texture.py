@@ -0,0 +1,30 @@
+# Test_texture.py
+#
+# ------------- File used to test the wall textures -------------
+# Contains the tests of the ColumnTexture class, for its mip levels and
+# the level of each column drawn, at the edges between two levels.
+#
+
+# Import all necessary library
+import pygame
+import pytest
+import texture
+
+def test_mip_levels_are_halved_until_one_pixel_high():
+    levels = texture.mip_levels(pygame.Surface((48, 20)))
+    assert [level.get_size() for level in levels] == [(48, 20), (24, 10), (12, 5), (6, 2), (3, 1)]
+    assert [level.get_size() for level in texture.mip_levels(pygame.Surface((1, 1)))] == [(1, 1)]
+
+@pytest.mark.parametrize("size", [(64, 64), (48, 20)])
+def test_column_of_the_smallest_level_still_as_high(size):
+    column_texture = texture.ColumnTexture(pygame.Surface(size))
+    levels = column_texture.get_levels()
+    for i, level in enumerate(levels):
+        height = level[0].get_height()
+        assert column_texture.get_column(0.5, height) is level[len(level) // 2] # As high as the level: this level
+        if i > 0: assert column_texture.get_column(0.5, height + 0.001) is levels[i - 1][len(levels[i - 1]) // 2] # Higher: the level above
+        assert column_texture.get_column(0, height) is level[0] # The edges of the texture give the first and the last column
+        assert column_texture.get_column(1, height) is level[-1]
+        assert column_texture.get_column(-0.5, height) is level[0] and column_texture.get_column(1.5, height) is level[-1]
+    assert column_texture.get_column(0.5, size[1] * 10) is levels[0][len(levels[0]) // 2] # Never above the full resolution
+    assert column_texture.get_column(0.5, 0) is levels[-1][len(levels[-1]) // 2]
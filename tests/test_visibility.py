@@ -0,0 +1,82 @@
+# Test_visibility.py
+#
+# ---------- File used to test the visibility field of the turret ----------
+# Contains the tests checking that the repaired visibility field is always
+# the field computed again on the whole map.
+#
+
+# Import all necessary library
+import numpy as np
+import pytest
+from conftest import random_parts
+
+def assert_computed_again(field, game_map) -> None:
+    """Check that a visibility field is the field computed again on the whole map
+
+    Args:
+        field (visibility.VisibilityField): visibility field to check
+        game_map (map.Map): map of the field
+    """
+    expected = field.build(game_map.get_map_WIDTH(), game_map.get_map_HEIGHT(), game_map.get_parts())
+    visible = expected["octants"] != 0
+    assert np.array_equal(field.get_visible(), visible)
+    assert np.array_equal(field.get_distances(), np.where(visible, expected["ranges"], np.inf).astype(np.float32))
+    assert np.array_equal(field.blocking, expected["blocking"])
+
+@pytest.mark.parametrize("width, height", [(64, 64), (81, 47)])
+def test_repair_matches_compute(make_simulation, rng, width, height):
+    simulation = make_simulation(random_parts(rng, width, height))
+    game_map = simulation.get_map()
+    field = simulation.get_visibility()
+    registry = game_map.get_element_registry()
+    numbers = [registry.get_number(name) for name in ("nothing", "tree", "brick wall", "player's tank")]
+    for trial in range(100): # Change random regions, near and far from the turret
+        region_width, region_height = rng.integers(1, 6, 2)
+        x, y = rng.integers(-2, width), rng.integers(-2, height)
+        if rng.random() < 0.5: game_map.set_region(x, y, region_width, region_height, rng.choice(numbers))
+        else: game_map.set_region(x, y, region_width, region_height, rng.choice(numbers, (region_height, region_width)))
+        game_map.flush_changes()
+        assert_computed_again(field, game_map)
+
+def test_repair_next_to_the_turret(make_simulation, rng):
+    simulation = make_simulation(random_parts(rng, 48, 48, 0.1))
+    game_map = simulation.get_map()
+    field = simulation.get_visibility()
+    origin_x, origin_y = field.get_origin()
+    for offset_x in range(-2, 3):
+        for offset_y in range(-2, 3): # Every part around the turret, on the sides of the octants
+            if (offset_x, offset_y) == (0, 0): continue
+            part = game_map.get_part(origin_y + offset_y, origin_x + offset_x)
+            game_map.set_part(origin_y + offset_y, origin_x + offset_x, game_map.get_elements("tree") if part == game_map.get_elements("nothing") else game_map.get_elements("nothing"))
+            game_map.flush_changes()
+            assert_computed_again(field, game_map)
+
+def test_swap_with_built_field_is_not_computed_again(make_simulation, rng):
+    simulation = make_simulation(random_parts(rng, 64, 64))
+    game_map = simulation.get_map()
+    field = simulation.get_visibility()
+    parts = random_parts(rng, 64, 64, 0.1)
+    game_map.set_parts(64, 64, parts, game_map.prepare(64, 64, parts))
+    computed = []
+    field.compute = lambda: computed.append(True) # The flush must not compute the field again
+    game_map.flush_changes()
+    assert computed == []
+    del field.compute
+    assert_computed_again(field, game_map)
+
+def test_unchanged_region_keeps_the_field(make_simulation, rng):
+    simulation = make_simulation(random_parts(rng, 64, 64))
+    game_map = simulation.get_map()
+    bitmap = simulation.get_visibility().get_bitmap()
+    game_map.set_region(0, 0, 64, 64, game_map.get_parts().copy()) # Same parts
+    game_map.flush_changes()
+    assert simulation.get_visibility().get_bitmap() is bitmap
+
+def test_visible_region(make_simulation, rng):
+    simulation = make_simulation(random_parts(rng, 81, 47, 0.1))
+    field = simulation.get_visibility()
+    visible = field.get_visible()
+    for trial in range(100): # Regions starting and stopping anywhere in the bytes of the bitmap
+        rows = slice(*sorted(rng.integers(0, 48, 2)), int(rng.integers(1, 10)))
+        columns = slice(*sorted(rng.integers(0, 82, 2)), int(rng.integers(1, 10)))
+        assert np.array_equal(field.get_visible_region(rows, columns), visible[rows, columns])
@@ -0,0 +1,264 @@
+# Texture.py
+#
+# ------------- File used to handle the walls textures ------------
+# Contains the ColumnTexture class to handle a wall texture.
+# The ColumnTexture class provides a mip chain of the texture, sliced
+# into columns once, to draw a wall column at any projected height.
+# Contains the TextureRegistry class to store the textures of the elements.
+# Contains the functions to read and write the baked textures (see bake.py).
+#
+
+# Import all necessary library
+import math
+import numpy as np
+import os
+import pygame
+
+def draw_scaled_column(surface: pygame.Surface, column: pygame.Surface, x: int, y: float, width: int, height: float, top: float = None, bottom: float = None) -> None:
+    """Draw a texture column scaled to a projected height, only scaling the part visible on the surface
+
+    Args:
+        surface (pygame.Surface): surface where the column is drawn
+        column (pygame.Surface): texture column to draw
+        x (int): x pos of the column on the surface
+        y (float): y pos of the top of the column on the surface
+        width (int): width of the column on the surface
+        height (float): projected height of the column on the surface
+        top (float, optional): y pos where the drawn part of the column starts. Defaults to the top of the column.
+        bottom (float, optional): y pos where the drawn part of the column stops. Defaults to the bottom of the column.
+    """
+    top = max(y if top is None else top, y, 0)
+    bottom = min(y + height if bottom is None else bottom, y + height, surface.get_height())
+    if bottom - top < 1 or width < 1: return
+
+    column_height = column.get_height()
+    v0 = min(math.floor((top - y) / height * column_height), column_height - 1) # Only the visible rows of the column are scaled
+    v1 = min(max(v0 + 1, math.ceil((bottom - y) / height * column_height)), column_height)
+    column = column.subsurface((0, v0, column.get_width(), v1 - v0))
+    surface.blit(pygame.transform.scale(column, (width, math.ceil(bottom - top))), (x, math.floor(top)))
+
+def levels_to_arrays(levels: list) -> dict:
+    """Return the pixels of each mip level, each column contiguous, to be saved in a baked texture
+
+    Args:
+        levels (list): surface of each mip level
+
+    Returns:
+        dict: (width, height, 4) RGBA array of each level, by "level_" + number of the level
+    """
+    arrays = {}
+    for i, level in enumerate(levels):
+        pixels = np.empty((level.get_width(), level.get_height(), 4), np.uint8)
+        pixels[:, :, :3] = pygame.surfarray.array3d(level)
+        pixels[:, :, 3] = pygame.surfarray.array_alpha(level)
+        arrays["level_" + str(i)] = pixels
+    return arrays
+
+def load_baked_levels(path: str) -> list:
+    """Return the surface of each mip level of a baked texture (can be called from another thread)
+
+    Args:
+        path (str): path of the baked texture (.npz)
+
+    Returns:
+        list: surface of each mip level, from the full resolution to 1 pixel high
+    """
+    levels = []
+    with np.load(path) as baked:
+        alpha = bool(baked["alpha"])
+        for i in range(int(baked["levels"])):
+            pixels = baked["level_" + str(i)]
+            if alpha: # Rows are contiguous in a pygame buffer, columns in the baked array
+                levels.append(pygame.image.frombytes(np.ascontiguousarray(pixels.transpose(1, 0, 2)).tobytes(), pixels.shape[:2], "RGBA"))
+            else:
+                levels.append(pygame.surfarray.make_surface(pixels[:, :, :3]))
+    return levels
+
+def mip_levels(texture: pygame.Surface) -> list:
+    """Return the mip levels of a texture, halved until they are 1 pixel high
+
+    Args:
+        texture (pygame.Surface): full resolution texture
+
+    Returns:
+        list: surface of each mip level, from the full resolution to 1 pixel high
+    """
+    levels = [texture]
+    while levels[-1].get_height() > 1: # Halve the texture until it is 1 pixel high
+        level = levels[-1]
+        levels.append(pygame.transform.smoothscale(level, (max(1, level.get_width() // 2), max(1, level.get_height() // 2))))
+    return levels
+
+class ColumnTexture:
+    """Class used to handle a wall texture, sliced into columns with a mip chain
+    """
+
+    def __init__(self, texture: pygame.Surface, levels: list = None) -> None:
+        """Construct a column texture, with every mip level sliced into columns
+
+        Args:
+            texture (pygame.Surface): full resolution texture
+            levels (list, optional): surface of each mip level already computed (baked). Defaults to the mip levels of the texture.
+        """
+        self.levels = [] # Columns of each mip level, from the full resolution to 1 pixel high
+        self.levels_height = [] # Height of each mip level
+        self.texture = texture
+
+        for level in (mip_levels(texture) if levels is None else levels): # Slice each level into columns
+            self.levels.append([level.subsurface((i, 0, 1, level.get_height())) for i in range(level.get_width())])
+            self.levels_height.append(level.get_height())
+
+    def draw_column(self, surface: pygame.Surface, texture_x: float, x: int, y: float, width: int, height: float, top: float = None, bottom: float = None) -> None:
+        """Draw a column of the texture on a surface, only scaling its visible part
+
+        Args:
+            surface (pygame.Surface): surface where the column is drawn
+            texture_x (float): horizontal pos in the texture, between 0 and 1
+            x (int): x pos of the column on the surface
+            y (float): y pos of the top of the column on the surface
+            width (int): width of the column on the surface
+            height (float): projected height of the column on the surface
+            top (float, optional): y pos where the drawn part of the column starts. Defaults to the top of the column.
+            bottom (float, optional): y pos where the drawn part of the column stops. Defaults to the bottom of the column.
+        """
+        draw_scaled_column(surface, self.get_column(texture_x, height), x, y, width, height, top, bottom)
+
+    def get_column(self, texture_x: float, height: float) -> pygame.Surface:
+        """Return a column of the smallest mip level still as high as a projected height
+
+        Args:
+            texture_x (float): horizontal pos in the texture, between 0 and 1
+            height (float): projected height of the column
+
+        Returns:
+            pygame.Surface: column of the texture
+        """
+        level = len(self.levels) - 1
+        while level > 0 and self.levels_height[level] < height: level -= 1 # Distant walls use small levels
+        columns = self.levels[level]
+        return columns[min(max(math.floor(texture_x * len(columns)), 0), len(columns) - 1)]
+
+    def get_levels(self) -> list:
+        """Return the columns of each mip level
+
+        Returns:
+            list: columns of each mip level
+        """
+        return self.levels
+
+    def get_texture(self) -> pygame.Surface:
+        """Return the full resolution texture
+
+        Returns:
+            pygame.Surface: full resolution texture
+        """
+        return self.texture
+
+class TextureRegistry:
+    """Class used to store the texture of each element of the map
+    """
+
+    def __init__(self, game) -> None:
+        """Construct a texture registry, with procedural textures until the textures files are loaded
+
+        Args:
+            game: main game object
+        """
+        self.game = game
+
+        self.generators = {"brick wall": self.generate_brick_texture, "tree": self.generate_trunk_texture} # Function generating the texture of each element, used until its file is loaded
+        self.textures = [] # Each texture, by texture id of the element registry
+
+        for name, path in self.game.get_map().get_element_registry().get_textures():
+            self.textures.append(self.generators[name]() if name in self.generators else None)
+
+    def decode_baked_texture(self, baked_path: str) -> ColumnTexture:
+        """Load a baked texture, with its mip chain already computed (can be called from another thread)
+
+        Args:
+            baked_path (str): path of the baked texture
+
+        Returns:
+            ColumnTexture: loaded texture
+        """
+        levels = load_baked_levels(baked_path)
+        return ColumnTexture(levels[0], levels)
+
+    def decode_texture(self, texture_path: str) -> ColumnTexture:
+        """Decode a texture file and build its mip chain (can be called from another thread)
+
+        Args:
+            texture_path (str): path of the texture to decode
+
+        Returns:
+            ColumnTexture: decoded texture
+        """
+        return ColumnTexture(pygame.image.load(texture_path))
+
+    def generate_brick_texture(self, size: int = 64) -> ColumnTexture:
+        """Generate a brick texture
+
+        Args:
+            size (int, optional): width and height of the texture. Defaults to 64.
+
+        Returns:
+            ColumnTexture: brick texture
+        """
+        texture = pygame.Surface((size, size))
+        texture.fill((128, 128, 128)) # Mortar
+        brick_height = size // 8
+        for row in range(8): # Offset one row of bricks out of two
+            offset = (size // 4) * (row % 2)
+            for brick in range(-1, 2):
+                pygame.draw.rect(texture, (178, 34, 34), (brick * size // 2 + offset + 1, row * brick_height + 1, size // 2 - 2, brick_height - 2))
+        return ColumnTexture(texture)
+
+    def generate_trunk_texture(self, size: int = 16) -> ColumnTexture:
+        """Generate a trunk texture, dark on its borders
+
+        Args:
+            size (int, optional): width and height of the texture. Defaults to 16.
+
+        Returns:
+            ColumnTexture: trunk texture
+        """
+        texture = pygame.Surface((size, size))
+        texture.fill((51, 25, 0))
+        pygame.draw.rect(texture, (102, 51, 0), (math.ceil(size * 0.2), 0, size - 2 * math.ceil(size * 0.2), size))
+        return ColumnTexture(texture)
+
+    def get_texture(self, part: int) -> ColumnTexture:
+        """Return the texture of an element
+
+        Args:
+            part (int): number of the element
+
+        Returns:
+            ColumnTexture: texture of the element, or None if the element has no texture
+        """
+        texture_id = self.game.get_map().get_element_registry().texture_ids[part]
+        if texture_id < 0: return None
+        return self.textures[texture_id]
+
+    def load_textures(self, loader) -> None:
+        """Load the texture file of each element in background, or its baked texture if it is up to date
+
+        Args:
+            loader (loader.Loader): background loader of the game
+        """
+        for texture_id, (name, path) in enumerate(self.game.get_map().get_element_registry().get_textures()):
+            if path == "": continue
+            baked_path = loader.get_baked(path)
+            if baked_path is not None: # The baked texture is loaded without decoding the image
+                loader.load(self.decode_baked_texture, (baked_path,), lambda texture, texture_id = texture_id: self.register(texture_id, texture))
+            elif os.path.exists(path):
+                loader.load(self.decode_texture, (path,), lambda texture, texture_id = texture_id: self.register(texture_id, texture))
+
+    def register(self, texture_id: int, texture: ColumnTexture) -> None:
+        """Register a texture
+
+        Args:
+            texture_id (int): texture id of the element registry
+            texture (ColumnTexture): texture
+        """
+        self.textures[texture_id] = texture
@@ -0,0 +1,392 @@
+# Visibility.py
+#
+# ------ File used to know the parts seen from the player tank -----
+# Contains the VisibilityField class to know the parts visible from
+# the turret. The VisibilityField class provides a visibility bitmap
+# and a distance field, computed by recursive shadowcasting once by
+# map (in the loader thread for a map loaded in background), and only
+# computed again in the shadow behind the parts changed in game.
+#
+
+# Import all necessary library
+import math
+import numpy as np
+import sys
+
+OCTANTS = ((1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1), (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1)) # Multipliers (xx, xy, yx, yy) turning the scan of the first octant into each octant
+
+def cast_light(blocking: list, lit: list, row: int, start: float, end: float, radius: int, origin: tuple, shape: tuple, xx: int, xy: int, yx: int, yy: int) -> None:
+    """Find the parts visible in an octant, from a row, between two slopes (recursive shadowcasting)
+
+    Args:
+        blocking (list): 2D list of if each part stops the sight
+        lit (list): list where the flat index of each visible part is added
+        row (int): first row scanned
+        start (float): slope where the scan starts
+        end (float): slope where the scan stops
+        radius (int): last row scanned
+        origin (tuple): (x, y) pos of the part of the turret
+        shape (tuple): shape of the 2D array of the parts
+        xx, xy, yx, yy (int): multipliers of the octant
+    """
+    if start < end: return
+    origin_x, origin_y = origin
+    size_x, size_y = shape
+    new_start = start
+    for j in range(row, radius + 1): # Scan each row of the octant, away from the turret
+        dx, dy = max(-j, -int(start * (j + 0.5) + 0.5) - 1) - 1, -j # Skip the parts above the start slope (one part early, the slopes below decide)
+        blocked = False
+        while dx <= 0:
+            dx += 1
+            left_slope, right_slope = (dx - 0.5) / (dy + 0.5), (dx + 0.5) / (dy - 0.5)
+            if start < right_slope: continue
+            if end > left_slope: break
+
+            x, y = origin_x + dx * xx + dy * xy, origin_y + dx * yx + dy * yy
+            inside = 0 <= x < size_x and 0 <= y < size_y
+            if inside: lit.append(x * size_y + y)
+            opaque = inside and blocking[x][y]
+            if blocked:
+                if opaque: # Still in the shadow of the last blocking parts
+                    new_start = right_slope
+                    continue
+                blocked = False
+                start = new_start
+            elif opaque and j < radius: # The blocking parts cast a shadow, scan the light before them
+                blocked = True
+                cast_light(blocking, lit, j + 1, start, left_slope, radius, origin, shape, xx, xy, yx, yy)
+                new_start = right_slope
+        if blocked: break
+
+def get_slopes(column: np.ndarray, row: np.ndarray) -> tuple:
+    """Return the slopes covered by parts of the first octant, clipped to the octant (same slopes as cast_light)
+
+    Args:
+        column (np.ndarray): offset of each part from the diagonal side of the octant toward its straight side (-dx in cast_light)
+        row (np.ndarray): row of each part (-dy in cast_light, at least 1)
+
+    Returns:
+        tuple: lowest and highest slope covered by each part
+    """
+    return np.maximum((column - 0.5) / (row + 0.5), 0.0), np.minimum((column + 0.5) / (row - 0.5), 1.0)
+
+class VisibilityField:
+    """Class used to know the parts visible from the turret, and their distance
+    """
+
+    def __init__(self, game) -> None:
+        """Construct a visibility field, computed on the whole map
+
+        Args:
+            game: main game object
+        """
+        self.game = game
+
+        self.bitmap = None # Visibility of each part, 8 parts by byte along the second index (like np.packbits)
+        self.blocking = None # If each part stops the sight
+        self.blocking_rows = None # Same as blocking as nested lists, faster to read part by part, changed in place
+        self.distances = None # Distance between the turret and each visible part, inf for a hidden part
+        self.eye = (0, 0) # (x, y) pos of the turret
+        self.octants = None # Bits of the octants where each part is visible (a part on the side of two octants is scanned by both)
+        self.origin = (0, 0) # (x, y) pos of the part of the turret (x is the first index of the parts, like the ray-cast)
+        self.ranges = None # Distance between the turret and the center of each part
+        self.shape = (0, 0) # Shape of the 2D array of the parts
+
+        self.compute()
+        self.game.get_map().subscribe(self.repair)
+        self.game.get_map().add_builder(self.build, self.install)
+
+    def build(self, map_width: int, map_height: int, parts) -> dict:
+        """Build the whole visibility field of new parts, without modifying the field (can be called from another thread)
+
+        Args:
+            map_width (int): width of the map
+            map_height (int): height of the map
+            parts: 2D array of every parts (or agmff.TiledParts)
+
+        Returns:
+            dict: every array of the field, to install
+        """
+        shape = (map_height, map_width)
+        eye = self.game.get_player().get_base_pos()
+        origin = (min(max(math.floor(eye[0]), 0), shape[0] - 1), min(max(math.floor(eye[1]), 0), shape[1] - 1))
+        blocking = self.get_blocking((slice(None), slice(None)), parts)
+        blocking_rows = blocking.tolist()
+        radius = max(origin[0], shape[0] - 1 - origin[0], origin[1], shape[1] - 1 - origin[1])
+
+        octants = np.zeros(shape, np.uint8)
+        recursion_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(recursion_limit, radius + 100)) # One recursion by shadow, at most one by row
+        try:
+            for octant, multipliers in enumerate(OCTANTS):
+                lit = []
+                cast_light(blocking_rows, lit, 1, 1.0, 0.0, radius, origin, shape, *multipliers)
+                octants.ravel()[np.array(lit, np.int64)] |= 1 << octant
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+        octants[origin] = 0xFF # The turret sees its own part
+
+        offset_x = np.arange(shape[0])[:, None] + 0.5 - eye[0]
+        offset_y = np.arange(shape[1])[None, :] + 0.5 - eye[1]
+        ranges = np.hypot(offset_x, offset_y).astype(np.float32) # From the center of each part to the turret
+        return {"blocking": blocking, "blocking_rows": blocking_rows, "eye": eye, "octants": octants, "origin": origin, "ranges": ranges, "shape": shape}
+
+    def compute(self) -> None:
+        """Compute the whole visibility field
+        """
+        game_map = self.game.get_map()
+        self.install(self.build(game_map.get_map_WIDTH(), game_map.get_map_HEIGHT(), game_map.get_parts()))
+
+    def get_bitmap(self) -> np.ndarray:
+        """Return the visibility bitmap
+
+        Returns:
+            np.ndarray: visibility of each part, 8 parts by byte along the second index (like np.packbits)
+        """
+        return self.bitmap
+
+    def get_blocking(self, rows: tuple, parts = None) -> np.ndarray:
+        """Return if the parts of a region stop the sight
+
+        Args:
+            rows (tuple): slices of the region in the 2D array of the parts
+            parts (optional): 2D array of every parts. Defaults to the parts of the map.
+
+        Returns:
+            np.ndarray: if each part stops the sight
+        """
+        if parts is None: parts = self.game.get_map().get_parts()
+        parts = np.asarray(parts[rows])
+        return self.game.get_map().get_element_registry().get_solid()[parts.view(np.uint8)]
+
+    def get_distance(self, x: float, y: float) -> float:
+        """Return the distance between the turret and a visible pos
+
+        Args:
+            x (float): x pos (first index of the parts, like the ray-cast)
+            y (float): y pos
+
+        Returns:
+            float: distance between the turret and the part of the pos, inf if the part is hidden or out of the map
+        """
+        x, y = math.floor(x), math.floor(y)
+        if x < 0 or y < 0 or x >= self.shape[0] or y >= self.shape[1]: return math.inf
+        return float(self.distances[x, y])
+
+    def get_distances(self) -> np.ndarray:
+        """Return the distance field
+
+        Returns:
+            np.ndarray: distance between the turret and each visible part, inf for a hidden part
+        """
+        return self.distances
+
+    def get_distances_at(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Return the distance between the turret and many pos at once
+
+        Args:
+            x (np.ndarray): x pos (first index of the parts, like the ray-cast)
+            y (np.ndarray): y pos
+
+        Returns:
+            np.ndarray: distance between the turret and the part of each pos, inf if the part is hidden or out of the map
+        """
+        x, y = np.floor(x).astype(np.int64), np.floor(y).astype(np.int64)
+        inside = (x >= 0) & (y >= 0) & (x < self.shape[0]) & (y < self.shape[1])
+        result = np.full(x.shape, np.inf, np.float32)
+        result[inside] = self.distances[x[inside], y[inside]]
+        return result
+
+    def get_eye(self) -> tuple:
+        """Return the pos of the turret
+
+        Returns:
+            tuple: (x, y) pos of the turret
+        """
+        return self.eye
+
+    def get_origin(self) -> tuple:
+        """Return the part of the turret
+
+        Returns:
+            tuple: (x, y) pos of the part of the turret
+        """
+        return self.origin
+
+    def get_visible(self) -> np.ndarray:
+        """Return the visibility of each part, unpacked from the bitmap
+
+        Returns:
+            np.ndarray: if each part is visible from the turret
+        """
+        return np.unpackbits(self.bitmap, axis = 1, count = self.shape[1]).astype(np.bool_)
+
+    def get_visible_region(self, rows: slice, columns: slice) -> np.ndarray:
+        """Return the visibility of a region of the parts, only unpacked from the bytes of the region
+
+        Args:
+            rows (slice): first indexes of the region (x pos, like the ray-cast)
+            columns (slice): second indexes of the region (y pos)
+
+        Returns:
+            np.ndarray: if each part of the region is visible from the turret
+        """
+        start, stop, step = columns.indices(self.shape[1])
+        if step < 0: return self.get_visible()[rows, columns]
+        first_bit = start & ~7 # Column of the first bit of the first byte read
+        bits = np.unpackbits(self.bitmap[rows, start >> 3:((stop - 1) >> 3) + 1], axis = 1)
+        return bits[:, start - first_bit:stop - first_bit:step].astype(np.bool_)
+
+    def get_visible_at(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Return if many pos are visible from the turret at once
+
+        Args:
+            x (np.ndarray): x pos (first index of the parts, like the ray-cast)
+            y (np.ndarray): y pos
+
+        Returns:
+            np.ndarray: if the part of each pos is visible (False out of the map)
+        """
+        x, y = np.floor(x).astype(np.int64), np.floor(y).astype(np.int64)
+        inside = (x >= 0) & (y >= 0) & (x < self.shape[0]) & (y < self.shape[1])
+        result = np.zeros(x.shape, np.bool_)
+        result[inside] = (self.bitmap[x[inside], y[inside] >> 3] >> (7 - (y[inside] & 7))) & 1
+        return result
+
+    def install(self, field: dict) -> None:
+        """Install a visibility field built by build
+
+        Args:
+            field (dict): every array of the field
+        """
+        self.blocking = field["blocking"]
+        self.blocking_rows = field["blocking_rows"]
+        self.eye = field["eye"]
+        self.octants = field["octants"]
+        self.origin = field["origin"]
+        self.ranges = field["ranges"]
+        self.shape = field["shape"]
+
+        visible = self.octants != 0
+        self.bitmap = np.packbits(visible, axis = 1)
+        self.distances = np.where(visible, self.ranges, np.inf).astype(np.float32)
+
+    def is_visible(self, x: float, y: float) -> bool:
+        """Return if a pos is visible from the turret
+
+        Args:
+            x (float): x pos (first index of the parts, like the ray-cast)
+            y (float): y pos
+
+        Returns:
+            bool: if the part of the pos is visible (False out of the map)
+        """
+        x, y = math.floor(x), math.floor(y)
+        if x < 0 or y < 0 or x >= self.shape[0] or y >= self.shape[1]: return False
+        return bool((self.bitmap[x, y >> 3] >> (7 - (y & 7))) & 1)
+
+    def repair(self, region: tuple) -> None:
+        """Compute the visibility field again behind the parts of a changed region of the map which stop the sight differently
+
+        Args:
+            region (tuple): (x, y, width, height) region of the map changed (x, y like Map.get_part)
+        """
+        x, y, width, height = region
+        game_map = self.game.get_map()
+        if self.shape != (game_map.get_map_HEIGHT(), game_map.get_map_WIDTH()) or tuple(self.eye) != tuple(self.game.get_player().get_base_pos()):
+            self.compute() # Another map, or another turret
+            game_map.get_minimap().invalidate()
+            return
+
+        rows = (slice(y, y + height), slice(x, x + width)) # Map.get_part(x, y) is the part [y, x]
+        blocking = self.get_blocking(rows)
+        changed_x, changed_y = np.nonzero(blocking != self.blocking[rows])
+        if len(changed_x) == 0: return # Nothing stops the sight differently (like a map swapped in with its field already built)
+
+        if width * height >= self.blocking.size: # The whole map changed
+            self.compute()
+            game_map.get_minimap().invalidate()
+            return
+
+        changed_x += y
+        changed_y += x
+        self.blocking[rows] = blocking
+        for part_x, part_y in zip(changed_x.tolist(), changed_y.tolist()): self.blocking_rows[part_x][part_y] = bool(self.blocking[part_x, part_y])
+
+        bounds = None # (x0, y0, x1, y1) box of the parts computed again
+        recursion_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(recursion_limit, max(self.shape) + 100))
+        try:
+            for octant in range(len(OCTANTS)):
+                box = self.repair_octant(octant, changed_x, changed_y)
+                if box is not None: bounds = box if bounds is None else (min(bounds[0], box[0]), min(bounds[1], box[1]), max(bounds[2], box[2]), max(bounds[3], box[3]))
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+        if bounds is None: return
+
+        x0, y0, x1, y1 = bounds
+        old_visible = self.get_visible_region(slice(x0, x1), slice(y0, y1))
+        visible = self.octants[x0:x1, y0:y1] != 0
+        self.bitmap[x0:x1] = np.packbits(self.octants[x0:x1] != 0, axis = 1)
+        self.distances[x0:x1, y0:y1] = np.where(visible, self.ranges[x0:x1, y0:y1], np.inf)
+
+        changed_x, changed_y = np.nonzero(visible != old_visible)
+        if len(changed_x) == 0: return
+        game_map.get_minimap().invalidate((y0 + int(changed_y.min()), x0 + int(changed_x.min()), int(changed_y.max() - changed_y.min()) + 1, int(changed_x.max() - changed_x.min()) + 1)) # The fog of the minimap changed
+
+    def repair_octant(self, octant: int, changed_x: np.ndarray, changed_y: np.ndarray) -> tuple:
+        """Compute an octant again in the shadow of the parts which stop the sight differently
+
+        A part only changes the parts farther than it, covering some of its slopes, so the octant is
+        scanned again between these slopes, widened by the widest part in these rows, and only the
+        parts whose slopes are all inside the scan are written back.
+
+        Args:
+            octant (int): index of the octant
+            changed_x (np.ndarray): x pos of each changed part
+            changed_y (np.ndarray): y pos of each changed part
+
+        Returns:
+            tuple: (x0, y0, x1, y1) box of the parts computed again, or None
+        """
+        xx, xy, yx, yy = OCTANTS[octant]
+        offset_x, offset_y = changed_x - self.origin[0], changed_y - self.origin[1]
+        dx, dy = offset_x * xx + offset_y * yx, offset_x * xy + offset_y * yy # Coordinates in the first octant
+        inside = (dy <= dx) & (dx <= 0) & (dy < 0)
+        if not np.any(inside): return None
+
+        low, high = get_slopes(-dx[inside], -dy[inside])
+        first_row = int(-dy[inside].max()) + 1 # Only the farther rows may change
+        margin = (float(high.max()) * (first_row + 0.5) + 0.5 + first_row) / (first_row * first_row - 0.25) # Widest slopes covered by a part from this row touching these slopes
+        start, end = min(float(high.max()) + margin, 1.0), max(float(low.min()) - margin, 0.0)
+        radius = max(self.origin[0], self.shape[0] - 1 - self.origin[0], self.origin[1], self.shape[1] - 1 - self.origin[1])
+        if first_row > radius: return None
+
+        corners_x, corners_y = [], [] # Box of the scanned cone
+        for row in (first_row, radius):
+            for slope in (start, end):
+                corners_x.append(self.origin[0] - slope * row * xx - row * xy)
+                corners_y.append(self.origin[1] - slope * row * yx - row * yy)
+        x0, x1 = max(math.floor(min(corners_x)) - 1, 0), min(math.ceil(max(corners_x)) + 2, self.shape[0])
+        y0, y1 = max(math.floor(min(corners_y)) - 1, 0), min(math.ceil(max(corners_y)) + 2, self.shape[1])
+        if x1 <= x0 or y1 <= y0: return None
+
+        lit = []
+        cast_light(self.blocking_rows, lit, 1, start, end, radius, self.origin, self.shape, xx, xy, yx, yy)
+        lit = np.array(lit, np.int64)
+        lit_x, lit_y = lit // self.shape[1], lit % self.shape[1]
+        kept = (lit_x >= x0) & (lit_x < x1) & (lit_y >= y0) & (lit_y < y1)
+        visible = np.zeros((x1 - x0, y1 - y0), np.bool_)
+        visible[lit_x[kept] - x0, lit_y[kept] - y0] = True
+
+        offset_x = np.arange(x0, x1)[:, None] - self.origin[0]
+        offset_y = np.arange(y0, y1)[None, :] - self.origin[1]
+        dx, dy = offset_x * xx + offset_y * yx, offset_x * xy + offset_y * yy
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            low, high = get_slopes(-dx, -dy)
+        written = (dy <= dx) & (dx <= 0) & (-dy >= first_row) & (low >= end) & (high <= start) # Parts only seen through the scanned slopes
+
+        bit = np.uint8(1 << octant)
+        octants = self.octants[x0:x1, y0:y1]
+        octants[written] = (octants[written] & ~bit) | np.where(visible[written], bit, np.uint8(0))
+        return x0, y0, x1, y1